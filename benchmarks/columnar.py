@@ -0,0 +1,54 @@
+"""
+Schedule-wide operations on Task tree vs ColumnarSchedule columns -
+flag filtering and date rollups.
+
+Run as "python -m benchmarks.columnar [TASKS_COUNT]"
+"""
+
+import sys
+import time
+
+from schedules_tools import models
+from schedules_tools.columnar import ColumnarSchedule
+
+from benchmarks.task_memory import build_schedule
+
+
+DEFAULT_TASKS_COUNT = 100000
+
+
+def rollup_tree(tasks):
+    start, finish = None, None
+    for task in tasks:
+        sub_start, sub_finish = rollup_tree(task.tasks)
+        task_start = min(filter(None, (task.dStart, sub_start)))
+        task_finish = max(filter(None, (task.dFinish, sub_finish)))
+        start = task_start if start is None else min(start, task_start)
+        finish = task_finish if finish is None else max(finish, task_finish)
+
+    return start, finish
+
+
+def measure(label, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    print('{:<35} {:8.3f} s'.format(label, time.perf_counter() - start))
+
+
+def main():
+    tasks_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TASKS_COUNT
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+    schedule = build_schedule(models.Task, tasks_count)
+    measure('build columns', ColumnarSchedule.from_schedule, schedule)
+    columnar = ColumnarSchedule.from_schedule(schedule)
+
+    measure('rollup dates (tree)', rollup_tree, schedule.tasks)
+    measure('rollup dates (columns)', columnar.rollup_dates)
+
+    measure('filter flags (columns)', columnar.filter_flags_mask, ['pm'], ['dev'])
+    measure('filter flags (tree)', schedule.filter_flags, ['pm'], ['dev'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+ScheduleDiff on wide sibling lists (flattened schedules) - scanning all
+candidates for every task (previous implementation) vs indexed matching.
+
+Run as "python -m benchmarks.diff_matching [TASKS_COUNT]"
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from schedules_tools import models
+from schedules_tools.diff import (
+    REPORT_CHANGED, REPORT_NO_CHANGE, REPORT_REMOVED, TASK_SCORE_THRESHOLD,
+    ScheduleDiff)
+
+
+DEFAULT_TASKS_COUNT = 2000
+
+
+class ScanScheduleDiff(ScheduleDiff):
+    def find_best_match(self, t1, possible_matches, start_at_index=0, tasks_index=None):
+        match_index = None
+        best_match = {
+            'state': REPORT_REMOVED,
+            'changes': [],
+            'name_score': 0,
+            'score': TASK_SCORE_THRESHOLD
+        }
+
+        if start_at_index > 0:
+            possible_matches = possible_matches[start_at_index:]
+
+        for i, t2 in enumerate(possible_matches, start_at_index):
+            res = self.eval_tasks(t1, t2, i, name_threshold=best_match['name_score'])
+
+            if (res['state'] is REPORT_CHANGED
+                    and res['score'] > best_match['score']):
+
+                match_index = i
+                best_match = res
+
+            if res['state'] is REPORT_NO_CHANGE:
+                match_index = i
+                best_match = res
+                break
+
+        return match_index, best_match
+
+
+def build_schedules(tasks_count, seed=42):
+    rand = random.Random(seed)
+    schedule_a = models.Schedule()
+    schedule_b = models.Schedule()
+
+    for i in range(tasks_count):
+        task = models.Task(schedule_a)
+        task.name = 'Task %d %s' % (i, rand.choice(['dev', 'qe', 'docs', 'release']))
+        task.dStart = datetime(2020, 1, 1) + timedelta(days=rand.randint(0, 300))
+        task.dFinish = task.dStart + timedelta(days=rand.randint(0, 10))
+        schedule_a.tasks.append(task)
+
+        change = rand.random()
+        if change < 0.05:
+            # removed
+            continue
+
+        task_b = models.Task(schedule_b)
+        task_b.name = task.name
+        task_b.dStart = task.dStart
+        task_b.dFinish = task.dFinish
+
+        if change < 0.10:
+            task_b.name = task.name + ' (renamed)'
+        elif change < 0.15:
+            task_b.dFinish += timedelta(days=1)
+        elif change < 0.20:
+            added = models.Task(schedule_b)
+            added.name = 'Added %d' % i
+            added.dStart = added.dFinish = task.dStart
+            schedule_b.tasks.append(added)
+
+        schedule_b.tasks.append(task_b)
+
+    return schedule_a, schedule_b
+
+
+def measure(label, diff_cls, schedule_a, schedule_b):
+    start = time.perf_counter()
+    result = diff_cls(schedule_a, schedule_b).dump_json(sort_keys=True)
+    print('{:<25} {:8.3f} s'.format(label, time.perf_counter() - start))
+    return result
+
+
+def main():
+    tasks_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TASKS_COUNT
+    schedule_a, schedule_b = build_schedules(tasks_count)
+
+    before = measure('scan (before)', ScanScheduleDiff, schedule_a, schedule_b)
+    after = measure('indexed (after)', ScheduleDiff, schedule_a, schedule_b)
+
+    assert before == after, 'Diff results differ'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+JSON handler export and import - whole document built in memory and
+indented by json module (previous implementation) vs streaming writer
+(indented and compact) with available JSON backends.
+
+Peak memory is traced by tracemalloc in a separate run of each step.
+
+Run as "python -m benchmarks.json_handler [TASKS_COUNT]"
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.stbin import generate_schedule
+from schedules_tools.schedule_handlers.jsonstruct import (
+    JSON_BACKENDS, ScheduleHandler_json)
+
+
+DEFAULT_TASKS_COUNT = 100000
+
+
+def export_before(schedule, path):
+    handler = ScheduleHandler_json(schedule=schedule)
+    content = json.dumps(handler.export_schedule_as_dict(), sort_keys=True,
+                         indent=4, separators=(',', ': '))
+    handler._write_to_file(content, path)
+
+
+def import_before(path):
+    with open(path) as fd:
+        jsonobj = json.load(fd)
+
+    handler = ScheduleHandler_json(handle=path)
+    handler.cache_parsed_source(path, jsonobj)
+    return handler.import_schedule()
+
+
+def run(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def measure(label, export_fn, import_fn, schedule, path):
+    export_time, export_peak = run(export_fn, schedule, path)
+    import_time, import_peak = run(import_fn, path)
+
+    print('{:<24} export {:6.3f} s {:7.1f} MB  import {:6.3f} s {:7.1f} MB  '
+          'file {:6.1f} MB'.format(label, export_time, export_peak / 2 ** 20,
+                                   import_time, import_peak / 2 ** 20,
+                                   os.path.getsize(path) / 2 ** 20))
+
+
+def main():
+    tasks_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TASKS_COUNT
+    os.environ['TZ'] = 'UTC'
+    time.tzset()
+
+    schedule = generate_schedule(tasks_count)
+    print('Generated {} tasks, memory is peak of traced allocations'.format(
+        tasks_count))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'schedule.json')
+
+        measure('in memory (before)', export_before, import_before, schedule, path)
+
+        for backend in reversed(list(JSON_BACKENDS)):
+            for compact in (False, True):
+                options = {'json_backend': backend, 'json_compact': compact}
+                if not compact and backend != 'json':
+                    # indented output is always written by json module
+                    continue
+
+                measure('{}, {}'.format(backend, 'compact' if compact else 'indented'),
+                        lambda schedule, path: ScheduleHandler_json(
+                            schedule=schedule, options=options).export_schedule(path),
+                        lambda path: ScheduleHandler_json(
+                            handle=path, options=options).import_schedule(),
+                        schedule, path)
+
+
+if __name__ == '__main__':
+    main()
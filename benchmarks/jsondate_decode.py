@@ -0,0 +1,94 @@
+"""
+Decoding of large diff dumps (ScheduleDiff.dump_json) with dates -
+previous jsondate decoder (strptime tried on every value) vs schema-aware
+decoder (known date keys, precompiled patterns, fromisoformat).
+
+Run as "python -m benchmarks.jsondate_decode [TASKS_COUNT]"
+"""
+
+import datetime
+import gc
+import json
+import os
+import random
+import sys
+import time
+
+from benchmarks.stbin import generate_schedule
+from schedules_tools import jsondate
+from schedules_tools.diff import ScheduleDiff
+
+
+DEFAULT_TASKS_COUNT = 20000
+
+
+def legacy_datetime_decoder(dict_):
+    """jsondate._datetime_decoder before schema-aware decoding"""
+    for key, value in dict_.items():
+        # The built-in `json` library will `unicode` strings, except for empty
+        # strings which are of type `str`. `jsondate` patches this for
+        # consistency so that `unicode` is always returned.
+        if value == '':
+            dict_[key] = u''
+            continue
+
+        try:
+            datetime_obj = datetime.datetime.strptime(value, jsondate.ISO8601_FMT)
+            dict_[key] = datetime_obj
+        except (ValueError, TypeError):
+            try:
+                date_obj = datetime.datetime.strptime(value, jsondate.DATE_FMT)
+                dict_[key] = date_obj.date()
+            except (ValueError, TypeError):
+                continue
+
+    return dict_
+
+
+def modify_schedule(schedule, seed):
+    rand = random.Random(seed)
+
+    def modify(tasks):
+        for task in tasks:
+            if rand.random() < 0.1:
+                task.dFinish += datetime.timedelta(days=rand.randint(1, 10))
+            if rand.random() < 0.05:
+                task.name += ' (changed)'
+            modify(task.tasks)
+
+    modify(schedule.tasks)
+    return schedule
+
+
+def measure(label, loads, dump):
+    gc.collect()
+    start = time.perf_counter()
+    loaded = loads(dump)
+    elapsed = time.perf_counter() - start
+
+    print('{:<24} {:7.3f} s'.format(label, elapsed))
+    return loaded
+
+
+def main():
+    tasks_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TASKS_COUNT
+    os.environ['TZ'] = 'UTC'
+    time.tzset()
+
+    schedule_a = generate_schedule(tasks_count)
+    schedule_b = modify_schedule(generate_schedule(tasks_count), seed=7)
+    dump = ScheduleDiff(schedule_a, schedule_b).dump_json()
+    print('Diff of {} tasks, {:.1f} MB dump'.format(tasks_count, len(dump) / 2 ** 20))
+
+    before = measure('strptime (before)', lambda s: json.loads(
+        s, object_hook=legacy_datetime_decoder), dump)
+    measure('all keys (after)', lambda s: jsondate.loads(
+        s, date_keys=None), dump)
+    after = measure('date keys (after)', jsondate.loads, dump)
+    measure('no dates decoded', json.loads, dump)
+
+    assert before == after, 'decoded dumps differ'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Per-task cost of loading MSP Task elements - XPath lookups (previous
+implementation) vs single pass over children with tag dispatch table.
+
+Run as "python -m benchmarks.msp_import [TASKS_COUNT]"
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from lxml import etree
+
+from schedules_tools import models
+from schedules_tools.schedule_handlers.msp import (
+    MSP_NAMESPACE, ScheduleHandler_msp)
+
+
+DEFAULT_TASKS_COUNT = 50000
+
+
+def generate_msp_file(path, tasks_count, seed=42, namespace=MSP_NAMESPACE):
+    rand = random.Random(seed)
+
+    with open(path, 'w') as fd:
+        fd.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        fd.write('<Project xmlns="%s">\n' % namespace if namespace else '<Project>\n')
+        fd.write('<Name>Benchmark %d</Name>\n' % tasks_count)
+        fd.write('<ExtendedAttributes><ExtendedAttribute><FieldID>188743731</FieldID>'
+                 '<FieldName>Flags</FieldName></ExtendedAttribute></ExtendedAttributes>\n')
+        fd.write('<Tasks>\n')
+
+        level = 1
+        for i in range(1, tasks_count + 1):
+            level = max(1, min(level + rand.choice([-1, 0, 0, 1]), 8))
+            day = rand.randint(1, 28)
+            fd.write(
+                '<Task><UID>{i}</UID><ID>{i}</ID><Name>Task {i}</Name><Type>1</Type>'
+                '<IsNull>0</IsNull><WBS>{i}</WBS><OutlineLevel>{level}</OutlineLevel>'
+                '<Priority>500</Priority><Start>2020-{m:02d}-{d:02d}T08:00:00</Start>'
+                '<Finish>2020-{m:02d}-{d:02d}T17:00:00</Finish><Duration>PT8H0M0S</Duration>'
+                '<Milestone>{milestone}</Milestone><Summary>0</Summary>'
+                '<PercentComplete>{complete}</PercentComplete>'
+                '<ActualStart>2020-{m:02d}-{d:02d}T08:00:00</ActualStart>'
+                '<Notes>note {i}</Notes>'
+                '<ExtendedAttribute><FieldID>188743731</FieldID><Value>qe,dev</Value>'
+                '</ExtendedAttribute>'
+                '<ExtendedAttribute><FieldID>188743737</FieldID>'
+                '<Value>Link: https://example.com/{i}</Value></ExtendedAttribute>'
+                '</Task>\n'.format(i=i, level=level, m=rand.randint(1, 12), d=day,
+                                   milestone=int(rand.random() < 0.1),
+                                   complete=rand.randint(0, 100)))
+
+        fd.write('</Tasks>\n</Project>\n')
+
+
+def task_load_msp_node_xpath(task, eTask):
+    """Previous implementation - XPath lookup for every field"""
+    task.index = int(eTask.xpath('ID')[0].text)
+    task.name = eTask.xpath('Name')[0].text.strip()
+    task.priority = int(eTask.xpath('Priority')[0].text)
+
+    nlStart = eTask.xpath('Start')
+    task.dStart = datetime.strptime(nlStart[0].text, task._date_format)
+    task.dFinish = task.dStart
+
+    nlFinish = eTask.xpath('Finish')
+    if nlFinish:
+        task.dFinish = datetime.strptime(nlFinish[0].text, task._date_format)
+
+    nlAcStart = eTask.xpath('ActualStart')
+    if nlAcStart:
+        task.dStart = datetime.strptime(nlAcStart[0].text, task._date_format)
+
+    nlAcFinish = eTask.xpath('ActualFinish')
+    if nlAcFinish:
+        task.dFinish = datetime.strptime(nlAcFinish[0].text, task._date_format)
+
+    task.dFinish = max(task.dFinish, task.dStart)
+    task.milestone = eTask.xpath('Milestone')[0].text == '1'
+
+    ePercentComplete_list = eTask.xpath('PercentComplete')
+    if ePercentComplete_list:
+        task.p_complete = float(eTask.xpath('PercentComplete')[0].text)
+
+    notes = eTask.xpath('Notes')
+    if notes:
+        task.note = notes[0].text.strip()
+
+    flag_ext_attr = eTask.xpath(
+        'ExtendedAttribute[FieldID = {}]'.format(task._schedule.flags_attr_id))
+    if flag_ext_attr:
+        flags_value = flag_ext_attr[0].xpath('Value')[0].text
+        if flags_value:
+            task.flags = [f for f in flags_value.strip(' ,\n').split(',') if ' ' not in f]
+            task._schedule.used_flags |= set(task.flags)
+
+    for ext_attr in eTask.xpath('ExtendedAttribute/Value'):
+        task.parse_extended_attr(ext_attr.text)
+    return True
+
+
+def measure(label, fn, eTasks, schedule):
+    start = time.perf_counter()
+    for eTask in eTasks:
+        fn(models.Task(schedule), eTask)
+    elapsed = time.perf_counter() - start
+
+    print('{:<30} {:8.3f} s  {:8.2f} us/task'.format(
+        label, elapsed, elapsed / len(eTasks) * 1e6))
+
+
+def main():
+    tasks_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TASKS_COUNT
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        msp_file = os.path.join(tmp_dir, 'benchmark.xml')
+        # loaders are compared on a tree without namespace (as XPath loader used to get)
+        generate_msp_file(msp_file, tasks_count, namespace=None)
+        print('Generated {} tasks ({:.1f} MB)'.format(
+            tasks_count, os.path.getsize(msp_file) / 2 ** 20))
+
+        eTasks = etree.parse(msp_file).getroot().findall('Tasks/Task')
+
+        handler = ScheduleHandler_msp(handle=msp_file)
+        handler.schedule = models.Schedule()
+        handler.schedule.flags_attr_id = 188743731
+        handler._phase_tasks = []
+
+        measure('xpath lookups (before)', task_load_msp_node_xpath,
+                eTasks, handler.schedule)
+        measure('single pass dispatch (after)', handler.task_load_msp_node,
+                eTasks, handler.schedule)
+
+        start = time.perf_counter()
+        ScheduleHandler_msp(handle=msp_file).import_schedule()
+        elapsed = time.perf_counter() - start
+        print('{:<30} {:8.3f} s  {:8.2f} us/task'.format(
+            'whole import_schedule', elapsed, elapsed / tasks_count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
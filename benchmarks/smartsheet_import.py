@@ -0,0 +1,209 @@
+"""
+Loading rows of large SmartSheet sheet into schedule - previous row by
+row loading (cell dicts, strptime per date, parents stack) vs loading
+by columns (cached date parsing, hierarchy from parent_id).
+
+Sheet is served by in-memory fake client, download and parsing of API
+response (SDK models) isn't measured.
+
+Run as "python -m benchmarks.smartsheet_import [ROWS_COUNT]"
+"""
+
+import datetime
+import gc
+import numbers
+import os
+import random
+import re
+import sys
+import time
+
+from schedules_tools import models
+from schedules_tools.schedule_handlers.smart_sheet import (
+    COLUMN_DURATION, COLUMN_FINISH, COLUMN_FLAGS, COLUMN_LINK, COLUMN_NOTE,
+    COLUMN_P_COMPLETE, COLUMN_PRIORITY, COLUMN_START, COLUMN_TASK_NAME,
+    ScheduleHandler_smartsheet)
+from schedules_tools.tests.smartsheet_fake import DEFAULT_COLUMNS, FakeSmartsheet
+
+
+DEFAULT_ROWS_COUNT = 20000
+
+
+class LegacyScheduleHandler(ScheduleHandler_smartsheet):
+    """Row by row loading before columnar ingestion"""
+
+    def _load_rows(self, columns, rows):
+        parents_stack = []
+
+        for column in columns:
+            index = self.columns_mapping_name.get(column.title, None)
+            if index is None:
+                continue
+            self.columns_mapping_id[column.id] = index
+
+        for row in rows:
+            self._load_task(row, parents_stack)
+
+    def _load_task(self, row, parents_stack):
+        task = models.Task(self.schedule)
+        cells, unknown_cells = self._load_task_cells(row)
+
+        task.index = row.row_number
+
+        if not all([c in cells and cells[c]
+                    for c in (COLUMN_TASK_NAME, COLUMN_START, COLUMN_FINISH)]):
+            return
+
+        task.name = str(cells[COLUMN_TASK_NAME])
+        task.dStart = self._parse_date(cells[COLUMN_START])
+        task.dFinish = self._parse_date(cells[COLUMN_FINISH])
+
+        if not (task.dStart and task.dFinish):
+            return
+
+        self.schedule.dStart = min(self.schedule.dStart, task.dStart)
+        self.schedule.dFinish = max(self.schedule.dFinish, task.dFinish)
+
+        if COLUMN_NOTE in cells and cells[COLUMN_NOTE]:
+            task.note = str(cells[COLUMN_NOTE])
+
+        if COLUMN_PRIORITY in cells:
+            task.priority = cells[COLUMN_PRIORITY]
+
+        if COLUMN_DURATION in cells:
+            match = re.findall(self._re_number, cells[COLUMN_DURATION])
+            if match:
+                task.milestone = int(match[0]) == 0
+
+        if (COLUMN_P_COMPLETE in cells and cells[COLUMN_P_COMPLETE] is not None
+                and isinstance(cells[COLUMN_P_COMPLETE], numbers.Number)):
+            task.p_complete = round(cells[COLUMN_P_COMPLETE] * 100, 1)
+
+        if COLUMN_FLAGS in cells and cells[COLUMN_FLAGS]:
+            task.parse_extended_attr(cells[COLUMN_FLAGS])
+            if not task.flags:
+                task.parse_extended_attr(cells[COLUMN_FLAGS],
+                                         key=models.ATTR_PREFIX_FLAG)
+
+        if COLUMN_LINK in cells and cells[COLUMN_LINK]:
+            task.parse_extended_attr(cells[COLUMN_LINK])
+            if not task.link:
+                task.parse_extended_attr(cells[COLUMN_LINK],
+                                         key=models.ATTR_PREFIX_LINK)
+        for cell in unknown_cells:
+            task.parse_extended_attr(cell)
+
+        curr_stack_item = {
+            'rowid': row.id,
+            'task': task
+        }
+
+        if not parents_stack:
+            self.schedule.tasks = [task]
+            parents_stack.insert(0, curr_stack_item)
+
+        elif row.parent_id == parents_stack[0]['rowid']:
+            parents_stack[0]['task'].tasks.append(task)
+            parents_stack.insert(0, curr_stack_item)
+
+        elif row.parent_id != parents_stack[0]['rowid']:
+            while parents_stack and row.parent_id != parents_stack[0]['rowid']:
+                parents_stack.pop(0)
+
+            if parents_stack:
+                parents_stack[0]['task'].tasks.append(task)
+            else:
+                self.schedule.tasks.append(task)
+
+            parents_stack.insert(0, curr_stack_item)
+        task.level = len(parents_stack)
+
+    def _load_task_cells(self, row):
+        mapped_cells = {}
+        unknown_values = []
+        used_cells = set()
+
+        for cell in row.cells:
+            cell_name = self.columns_mapping_id.get(cell.column_id, None)
+            if not cell_name:
+                if cell.value is not None:
+                    unknown_values.append(cell.value)
+                continue
+            if cell_name not in used_cells and cell.value:
+                mapped_cells[cell_name] = cell.value
+                used_cells.add(cell_name)
+
+        return mapped_cells, unknown_values
+
+
+def generate_sheet(client, rows_count, seed=42):
+    rand = random.Random(seed)
+    sheet = client.add_sheet('Benchmark {}'.format(rows_count),
+                             DEFAULT_COLUMNS + ['Flags', 'Link', 'Team'])
+
+    parents = [None]
+    for i in range(rows_count):
+        level = rand.randint(1, len(parents))
+        row_id = next(client.ids)
+        start = datetime.datetime(2020, rand.randint(1, 12), rand.randint(1, 28), 8)
+        finish = start + datetime.timedelta(days=rand.randint(0, 30), hours=9)
+        cells = {
+            'Task Name': 'Task {}'.format(i),
+            'Duration': rand.choice(['0', '~0', '1d', '5d', '14d']),
+            'Start': start.strftime('%Y-%m-%dT%H:%M:%S'),
+            'Finish': finish.strftime('%Y-%m-%dT%H:%M:%S'),
+            '% Complete': rand.choice([0, 0.25, 0.5, 1]),
+            'Comments': rand.choice([None, 'note {}'.format(i)]),
+            'Flags': rand.choice([None, 'qe', 'Flags: qe, dev']),
+            'Link': rand.choice([None, 'https://example.com/{}'.format(i)]),
+            'Team': rand.choice([None, 'Flags: pm', 'Note: extra']),
+        }
+        sheet.rows.append({'id': row_id, 'parent_id': parents[level - 1],
+                           'cells': cells})
+
+        del parents[level:]
+        if level < 8:
+            parents.append(row_id)
+
+    return sheet
+
+
+def measure(label, handler_cls, sheet_model, **options):
+    handler = handler_cls(handle=sheet_model.id, options=options)
+    handler._sheet_instance = sheet_model
+
+    gc.collect()
+    start = time.perf_counter()
+    schedule = handler.import_schedule()
+    elapsed = time.perf_counter() - start
+
+    print('{:<28} {:7.3f} s'.format(label, elapsed))
+    return schedule
+
+
+def main():
+    rows_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS_COUNT
+    os.environ['TZ'] = 'UTC'
+    time.tzset()
+
+    client = FakeSmartsheet()
+    sheet = generate_sheet(client, rows_count)
+
+    start = time.perf_counter()
+    sheet_model = sheet.to_model()
+    print('Sheet of {} rows, SDK models built in {:.3f} s'.format(
+        rows_count, time.perf_counter() - start))
+
+    for options in ({}, {'trim_time': True}):
+        suffix = ', trim_time' if options else ''
+        before = measure('rows (before)' + suffix, LegacyScheduleHandler,
+                         sheet_model, **options)
+        after = measure('columns (after)' + suffix, ScheduleHandler_smartsheet,
+                        sheet_model, **options)
+
+        assert before.dump_as_dict() == after.dump_as_dict(), \
+            'imported schedules differ'
+
+
+if __name__ == '__main__':
+    main()
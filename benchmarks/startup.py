@@ -0,0 +1,65 @@
+"""
+Cold start of schedule conversion - discovery importing all handler
+modules (previous behavior) vs discovery through on-disk handlers index.
+
+Every run is a new python process, which builds CLI argument parser
+and converts small JSON schedule (with given source format) to HTML.
+
+Run as "python -m benchmarks.startup [RUNS_COUNT]"
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+DEFAULT_RUNS_COUNT = 10
+SOURCE = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir,
+                      'schedules_tools', 'tests', 'schedule_files',
+                      'import-schedule-json.json')
+
+SCRIPT = '''
+import sys
+from schedules_tools import converter, discovery
+
+if sys.argv[1]:
+    discovery.use_handlers_index(sys.argv[1])
+
+converter.get_handlers_args_parser()
+schedule_converter = converter.ScheduleConverter()
+schedule_converter.import_schedule(sys.argv[2], schedule_src_format='json')
+schedule_converter.export_schedule(sys.argv[3], 'html')
+'''
+
+
+def measure(label, runs_count, index_path='', remove_index=False):
+    target_fd, target = tempfile.mkstemp(suffix='.html')
+    os.close(target_fd)
+    total = 0
+
+    for _ in range(runs_count):
+        if remove_index and os.path.exists(index_path):
+            os.unlink(index_path)
+
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', SCRIPT, index_path,
+                               SOURCE, target])
+        total += time.perf_counter() - start
+
+    os.unlink(target)
+    print('{:<25} {:8.1f} ms/run'.format(label, total / runs_count * 1000))
+
+
+def main():
+    runs_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RUNS_COUNT
+    index_path = os.path.join(tempfile.mkdtemp(), 'handlers-index.json')
+
+    measure('import all (before)', runs_count)
+    measure('index, cold', runs_count, index_path, remove_index=True)
+    measure('index, warm (after)', runs_count, index_path)
+
+
+if __name__ == '__main__':
+    main()
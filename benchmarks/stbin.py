@@ -0,0 +1,89 @@
+"""
+Export and import of intermediate schedule snapshot - JSON handler (previous
+round-trippable format) vs binary stbin handler (read and mmap).
+
+Run as "python -m benchmarks.stbin [TASKS_COUNT]"
+"""
+
+import datetime
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+
+from schedules_tools import models
+from schedules_tools.schedule_handlers.jsonstruct import ScheduleHandler_json
+from schedules_tools.schedule_handlers.stbin import ScheduleHandler_stbin
+
+
+DEFAULT_TASKS_COUNT = 100000
+
+
+def generate_schedule(tasks_count, seed=42):
+    rand = random.Random(seed)
+    schedule = models.Schedule()
+    schedule.name = 'Benchmark {}'.format(tasks_count)
+    schedule.slug = 'benchmark'
+    schedule.dStart = datetime.datetime(2020, 1, 1)
+    schedule.dFinish = datetime.datetime(2020, 12, 31)
+
+    parents = [schedule]
+    for i in range(tasks_count):
+        level = rand.randint(1, len(parents))
+        task = models.Task(schedule, level=level)
+        task.index = i + 1
+        task.name = 'Task {}'.format(i)
+        task.slug = 'task_{}'.format(i)
+        task.dStart = datetime.datetime(2020, rand.randint(1, 12), rand.randint(1, 28))
+        task.dFinish = task.dStart + datetime.timedelta(days=rand.randint(0, 30))
+        task.milestone = rand.random() < 0.1
+        task.p_complete = float(rand.randint(0, 100))
+        task.flags = rand.choice([[], ['qe'], ['qe', 'dev']])
+        schedule.used_flags |= set(task.flags)
+
+        parents[level - 1].tasks.append(task)
+        del parents[level:]
+        if level < 8:
+            parents.append(task)
+
+    return schedule
+
+
+def measure(label, handler_cls, path, schedule, **options):
+    gc.collect()
+    start = time.perf_counter()
+    handler_cls(schedule=schedule).export_schedule(path)
+    export_time = time.perf_counter() - start
+
+    gc.collect()
+    start = time.perf_counter()
+    imported = handler_cls(handle=path, options=options).import_schedule()
+    import_time = time.perf_counter() - start
+    del imported
+
+    print('{:<20} export {:7.3f} s  import {:7.3f} s  {:7.1f} MB'.format(
+        label, export_time, import_time, os.path.getsize(path) / 2 ** 20))
+
+
+def main():
+    tasks_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TASKS_COUNT
+    os.environ['TZ'] = 'UTC'
+    time.tzset()
+
+    schedule = generate_schedule(tasks_count)
+    print('Generated {} tasks'.format(tasks_count))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        measure('json (before)', ScheduleHandler_json,
+                os.path.join(tmp_dir, 'schedule.json'), schedule)
+        measure('stbin (after)', ScheduleHandler_stbin,
+                os.path.join(tmp_dir, 'schedule.stbin'), schedule)
+        measure('stbin, mmap (after)', ScheduleHandler_stbin,
+                os.path.join(tmp_dir, 'schedule.stbin'), schedule,
+                stbin_mmap=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Memory of worker processes serving the same schedules - full import of
+stbin snapshots (previous behavior) vs read-only views over memory-mapped
+snapshots.
+
+Every worker loads all schedules and checks task names in each of them
+(walks whole tree). Memory is PSS (proportional set size) from
+/proc/self/smaps_rollup - pages shared by workers are split among them.
+
+Run as "python -m benchmarks.stbin_view [WORKERS_COUNT] [SCHEDULES_COUNT]"
+"""
+
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from benchmarks.stbin import generate_schedule
+from schedules_tools.schedule_handlers.stbin import ScheduleHandler_stbin
+
+
+DEFAULT_WORKERS_COUNT = 4
+DEFAULT_SCHEDULES_COUNT = 20
+TASKS_COUNT = 5000
+
+
+def get_pss():
+    """PSS of current process in kB, RSS where PSS isn't available"""
+    for path, field in (('/proc/self/smaps_rollup', 'Pss:'),
+                        ('/proc/self/status', 'VmRSS:')):
+        try:
+            with open(path) as fd:
+                for line in fd:
+                    if line.startswith(field):
+                        return int(line.split()[1])
+        except IOError:
+            continue
+
+    return 0
+
+
+def serve(args):
+    paths, options = args
+    pss_before = get_pss()
+
+    start = time.perf_counter()
+    schedules = [ScheduleHandler_stbin(handle=path, options=options).import_schedule()
+                 for path in paths]
+    for schedule in schedules:
+        schedule.check_for_taskname({'Task 1': False, 'Missing': True})
+    elapsed = time.perf_counter() - start
+
+    return get_pss() - pss_before, elapsed
+
+
+def measure(label, paths, workers_count, **options):
+    with Pool(workers_count) as pool:
+        results = pool.map(serve, [(paths, options)] * workers_count)
+
+    pss = sum(result[0] for result in results) / 1024
+    elapsed = max(result[1] for result in results)
+    print('{:<20} {:8.1f} MB PSS of {} workers  {:7.3f} s'.format(
+        label, pss, workers_count, elapsed))
+
+
+def main():
+    workers_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_WORKERS_COUNT
+    schedules_count = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SCHEDULES_COUNT
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        schedule = generate_schedule(TASKS_COUNT)
+        paths = []
+        for i in range(schedules_count):
+            paths.append(os.path.join(tmp_dir, 'schedule-{}.stbin'.format(i)))
+            ScheduleHandler_stbin(schedule=schedule).export_schedule(paths[-1])
+
+        print('{} schedules of {} tasks'.format(schedules_count, TASKS_COUNT))
+        measure('import (before)', paths, workers_count)
+        measure('view (after)', paths, workers_count, stbin_view=True)
+
+
+if __name__ == '__main__':
+    main()
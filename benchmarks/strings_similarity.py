@@ -0,0 +1,59 @@
+"""
+Similarity of one task name to many candidate names - strings_similarity
+per candidate vs StringsSimilarityIndex (numpy batch, if installed).
+
+Run as "python -m benchmarks.strings_similarity [CANDIDATES_COUNT]"
+"""
+
+import random
+import sys
+import time
+
+from schedules_tools import diff
+from schedules_tools.diff import StringsSimilarityIndex, strings_similarity
+
+
+DEFAULT_CANDIDATES_COUNT = 5000
+NAMES_COUNT = 50
+WORDS = ('planning', 'development', 'testing', 'release', 'docs', 'translation',
+         'review', 'security', 'build', 'packaging', 'beta', 'launch', 'support')
+
+
+def random_name(rand):
+    return '%s %s %d' % (rand.choice(WORDS).title(), rand.choice(WORDS), rand.randint(1, 99))
+
+
+def measure(label, func, names):
+    start = time.perf_counter()
+    result = [func(name) for name in names]
+    elapsed = time.perf_counter() - start
+    print('{:<30} {:8.3f} s  {:8.2f} ms/name'.format(label, elapsed, elapsed / len(names) * 1e3))
+    return result
+
+
+def main():
+    candidates_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CANDIDATES_COUNT
+    rand = random.Random(42)
+    candidates = [random_name(rand) for _ in range(candidates_count)]
+    names = [random_name(rand) for _ in range(NAMES_COUNT)]
+
+    if not diff.numpy_available:
+        print('numpy not installed - batch falls back to strings_similarity')
+
+    for winkler in (True, False):
+        print('winkler={}'.format(winkler))
+        before = measure('strings_similarity per pair',
+                         lambda name: [strings_similarity(name, candidate, winkler=winkler)
+                                       for candidate in candidates],
+                         names)
+
+        similarity_index = StringsSimilarityIndex(candidates)
+        after = measure('StringsSimilarityIndex',
+                        lambda name: similarity_index.similarities(name, winkler=winkler),
+                        names)
+
+        assert before == after, 'Scores differ'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Memory footprint of task tree - Task vs slotted CompactTask.
+
+Builds a tree of generated tasks (the way handlers fill them during import)
+and reports traced bytes per task.
+
+Run as "python -m benchmarks.task_memory [TASKS_COUNT]"
+"""
+
+import random
+import sys
+import tracemalloc
+from datetime import datetime
+
+from schedules_tools import models
+
+
+DEFAULT_TASKS_COUNT = 100000
+FLAG_CHOICES = (['qe'], ['dev'], ['qe', 'dev'], ['pm', 'qe'], [])
+
+
+def build_schedule(task_cls, tasks_count, seed=42):
+    rand = random.Random(seed)
+    schedule = models.Schedule()
+    schedule.task_cls = task_cls
+
+    parents = [schedule.tasks]
+    for i in range(1, tasks_count + 1):
+        level = max(1, min(len(parents) + rand.choice([-1, 0, 0, 1]), 8))
+        del parents[level:]
+
+        day = rand.randint(1, 28)
+        task = task_cls(schedule, level=level)
+        task.index = i
+        task.name = 'Task %d' % i
+        task.slug = 'task_%d' % i
+        task.note = 'note %d' % i
+        task.dStart = datetime(2020, 1, day, 8)
+        task.dFinish = datetime(2020, 1, day, 17)
+        task.p_complete = float(rand.randint(0, 100))
+        # handlers create new flags list for every task
+        task.flags = list(rand.choice(FLAG_CHOICES))
+
+        parents[-1].append(task)
+        parents.append(task.tasks)
+
+    return schedule
+
+
+def measure(task_cls, tasks_count):
+    tracemalloc.start()
+    schedule = build_schedule(task_cls, tasks_count)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('{:<15} {:8.1f} MB  {:6.0f} B/task'.format(
+        task_cls.__name__, used / 2 ** 20, used / tasks_count))
+    return schedule
+
+
+def main():
+    tasks_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TASKS_COUNT
+
+    for task_cls in (models.Task, models.CompactTask):
+        measure(task_cls, tasks_count)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from datetime import datetime
+import os
 
 
 # General exception type for subclassing
@@ -14,3 +15,11 @@ class SchedulesToolsException(Exception):
 
 class CmdException(SchedulesToolsException):
     pass
+
+
+def get_cache_dir():
+    """Directory for persistent caches of schedules tools (XDG_CACHE_HOME)"""
+    cache_dir = (os.environ.get('XDG_CACHE_HOME')
+                 or os.path.join(os.path.expanduser('~'), '.cache'))
+
+    return os.path.join(cache_dir, 'schedules-tools')
@@ -0,0 +1,273 @@
+"""
+Batch conversion of many schedules
+
+Every job imports its source once, filters the schedule and exports it
+to all requested target formats. Jobs run in a pool of worker processes,
+failure of a job doesn't abort the batch.
+
+Manifest (YAML) example:
+
+    workers: 4            # optional, number of worker processes
+    options:              # optional, schedule-convert options for all jobs
+      tz: UTC
+    jobs:
+      - source: schedules/rhel.xml
+        targets:
+          html: out/rhel.html
+          ics: out/rhel.ics
+          json:           # empty target - source name with format extension
+        flag_hide: [hidden]
+        sort: date_start
+
+Job keys other than source and targets are schedule-convert options
+(names as the argument destinations, e.g. source_format, flat, flag_show)
+and override manifest options.
+"""
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from schedules_tools import SchedulesToolsException, discovery
+from schedules_tools.converter import (
+    SORT_FIELDS, ScheduleConverter, filter_schedule, get_conversion_cache,
+    get_handlers_args_parser)
+
+
+log = logging.getLogger(__name__)
+
+
+class BatchManifestException(SchedulesToolsException):
+    pass
+
+
+class BatchJobResult(object):
+    """
+    Outcome of one batch job
+
+    Attributes:
+        source: job source handle
+        targets: dict of target format -> exported target
+        errors: list of error messages, empty for successful job
+        timings: dict of step ('import', target format) -> seconds
+        cache_stats: conversion cache statistics, None without cache
+    """
+    source = None
+    targets = None
+    errors = None
+    timings = None
+    cache_stats = None
+
+    def __init__(self, source):
+        self.source = source
+        self.targets = {}
+        self.errors = []
+        self.timings = {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def total_time(self):
+        return sum(self.timings.values())
+
+    def __str__(self):
+        timings = ', '.join('{} {:.3f}s'.format(step, seconds)
+                            for step, seconds in self.timings.items())
+        status = 'OK' if self.ok else 'FAILED'
+
+        return '{} {} ({})'.format(status, self.source, timings)
+
+
+def get_default_options():
+    """schedule-convert options with their default values"""
+    return vars(get_handlers_args_parser().parse_args([]))
+
+
+def load_manifest(filename):
+    """
+    Load batch manifest
+
+    Returns:
+        tuple of (jobs, options, workers) - workers is None if not set
+    """
+    with open(filename) as fd:
+        manifest = yaml.safe_load(fd)
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('jobs'), list):
+        raise BatchManifestException('Manifest has to contain list of jobs',
+                                     source=filename)
+
+    for job in manifest['jobs']:
+        if not isinstance(job, dict) or not job.get('source') or not job.get('targets'):
+            raise BatchManifestException(
+                'Every job needs source and targets: {}'.format(job),
+                source=filename)
+
+    return (manifest['jobs'], manifest.get('options') or {},
+            manifest.get('workers'))
+
+
+def _job_options(job, options):
+    job_options = get_default_options()
+    job_options.update(options)
+    job_options.update((key, val) for key, val in job.items()
+                       if key not in ('source', 'targets'))
+
+    # manifest uses the same sort values as CLI
+    if job_options.get('sort') in SORT_FIELDS:
+        job_options['sort'] = SORT_FIELDS[job_options['sort']]
+
+    return job_options
+
+
+def run_job(job, options=None):
+    """
+    Import job source, filter it and export to all job targets
+
+    Args:
+        job: dict with source, targets (format -> target) and options
+        options: options shared by all jobs
+
+    Returns:
+        BatchJobResult
+    """
+    result = BatchJobResult(job['source'])
+
+    # timezone and handlers paths are set just for the job
+    orig_tz = os.environ.get('TZ')
+    orig_search_paths = list(discovery.search_paths)
+
+    try:
+        job_options = _job_options(job, options or {})
+
+        # set timezone - it's desirable that all calculations are made in same TZ
+        os.environ['TZ'] = job_options['tz']
+        time.tzset()
+
+        for path in job_options.pop('handlers_path'):
+            if path not in discovery.search_paths:
+                discovery.search_paths.append(path)
+
+        converter = ScheduleConverter(cache=get_conversion_cache(job_options))
+
+        start = time.perf_counter()
+        schedule = converter.import_schedule(
+            handle=job['source'],
+            schedule_src_format=job_options.get('source_format'),
+            storage_src_format=job_options.get('source_storage_format'),
+            options=job_options)
+        result.timings['import'] = time.perf_counter() - start
+
+        if schedule.errors_import:
+            for err in schedule.errors_import:
+                result.errors.append('{} Handle: {}\n{}'.format(
+                    err[0], err[2], '\n'.join(err[1])))
+            return result
+
+        converter.schedule = filter_schedule(schedule, job_options)
+
+        exports = converter.export_schedules(job['targets'],
+                                             default_output=job['source'],
+                                             options=job_options)
+
+        for target_format, export in exports.items():
+            result.timings[target_format] = export['time']
+            if export['error']:
+                error = export['error']
+                result.errors.append('Export to {} failed\n{}'.format(
+                    target_format, ''.join(traceback.format_exception(
+                        type(error), error, error.__traceback__))))
+            else:
+                result.targets[target_format] = export['output']
+
+        if converter.cache is not None:
+            result.cache_stats = converter.cache.stats
+
+    except Exception:
+        result.errors.append(traceback.format_exc())
+
+    finally:
+        if orig_tz is None:
+            os.environ.pop('TZ', None)
+        else:
+            os.environ['TZ'] = orig_tz
+        time.tzset()
+
+        discovery.search_paths[:] = orig_search_paths
+
+    return result
+
+
+def run_batch(jobs, options=None, workers=None):
+    """
+    Run conversion jobs in pool of worker processes
+
+    Args:
+        jobs: list of job dicts (as in manifest)
+        options: schedule-convert options shared by all jobs
+        workers: number of worker processes (default is number of CPUs),
+                 jobs run in current process if 1
+
+    Returns:
+        list of BatchJobResult in order of jobs
+    """
+    if workers == 1:
+        return [run_job(job, options) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, job, options) for job in jobs]
+        results = []
+
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception:
+                # worker process died
+                result = BatchJobResult(job['source'])
+                result.errors.append(traceback.format_exc())
+                results.append(result)
+
+    return results
+
+
+def run_manifest(filename, workers=None, options=None):
+    """
+    Run batch described by manifest file and log per-job results
+
+    Args:
+        filename: manifest file
+        workers: number of worker processes, overrides manifest
+        options: options overriding manifest options
+
+    Returns:
+        list of BatchJobResult
+    """
+    jobs, manifest_options, manifest_workers = load_manifest(filename)
+    manifest_options.update(options or {})
+
+    start = time.perf_counter()
+    results = run_batch(jobs, manifest_options, workers or manifest_workers)
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        if result.ok:
+            log.info(result)
+        else:
+            log.error('{}\n{}'.format(result, '\n'.join(result.errors)))
+
+    failed = len([result for result in results if not result.ok])
+    log.info('Batch finished in {:.3f}s: {} jobs, {} failed'.format(
+        elapsed, len(results), failed))
+
+    cache_stats = [result.cache_stats for result in results if result.cache_stats]
+    if cache_stats:
+        log.info('Conversion cache: {} hits, {} misses'.format(
+            sum(stats['hits'] for stats in cache_stats),
+            sum(stats['misses'] for stats in cache_stats)))
+
+    return results
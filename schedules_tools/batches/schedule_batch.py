@@ -102,16 +102,18 @@ def add_batch(handle, template):
         **batch_task_export_kwargs
     ).id
 
-    # exporting batch tasks and mapping them to set dependencies later
-    # can't set dependencies right away because task
+    # exporting batch tasks at once and mapping them to set dependencies
+    # later - can't set dependencies right away because task
     # dependency might not be in the schedule yet
-    task_id_to_row = {}
-    for task_id, task_data in template['tasks'].items():
-        st_task = construct_task(task_data['name'], duration=task_data['duration'])
-        task_export_row = handler.export_task(st_task, batch_row_id)
-        task_id_to_row[task_id] = parse_row(task_export_row, columns_map)
+    batch_tasks = [construct_task(task_data['name'], duration=task_data['duration'])
+                   for task_data in template['tasks'].values()]
+    batch_rows = handler.export_tasks(batch_tasks, parent_id=batch_row_id)
+    task_id_to_row_id = {
+        task_id: row.id for task_id, row in zip(template['tasks'], batch_rows)
+    }
 
     # setting dependencies
+    dependency_rows = []
     for task_id, task_data in template['tasks'].items():
         if 'dependency' not in task_data:
             continue
@@ -123,7 +125,7 @@ def add_batch(handle, template):
         if dependency_dict['to'] == 'predecessor':
             pred.row_id = predecessor_row['id']
         else:
-            pred.row_id = task_id_to_row[int(dependency_dict['to'])]['id']
+            pred.row_id = task_id_to_row_id[int(dependency_dict['to'])]
         pred.type = dependency_dict.get('type') or 'FS'
         if dependency_dict['lag_amount']:
             lag_duration = Duration()
@@ -138,20 +140,18 @@ def add_batch(handle, template):
         pred_list.predecessors = [pred]
 
         dependency_cell = Cell()
-        dependency_cell.column_id = handler._sheet_columns['predecessors']
+        dependency_cell.column_id = handler.sheet_columns['predecessors']
         dependency_cell.object_value = ObjectValue()
         dependency_cell.object_value.object_type = "PREDECESSOR_LIST"
         dependency_cell.object_value = pred_list
 
-        task_row = task_id_to_row[task_id]
         task_update_row = Row()
-        task_update_row.id = task_row['id']
+        task_update_row.id = task_id_to_row_id[task_id]
         task_update_row.cells.append(dependency_cell)
+        dependency_rows.append(task_update_row)
 
-        handler.client.Sheets.update_rows(
-            handler.handle,
-            [task_update_row]
-        )
+    if dependency_rows:
+        handler.update_rows(dependency_rows)
 
 
 def parse_row(row, columns_map):
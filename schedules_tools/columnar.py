@@ -0,0 +1,349 @@
+"""
+Columnar (struct-of-arrays) store of schedule tasks
+
+Tasks are kept in flat NumPy columns in pre-order (depth first), so subtree
+of task at row i spans rows i .. subtree_end[i] - 1. Schedule-wide
+operations (date range queries, date rollups, flag filtering) are done
+on whole columns instead of walking Task trees.
+
+Conversion to and from Schedule with Task tree is lossless for handlers
+that need objects.
+"""
+import logging
+from copy import copy
+
+from schedules_tools import SchedulesToolsException
+from schedules_tools.models import Schedule, Task
+
+log = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    additional_deps_satistifed = True
+except ImportError:
+    additional_deps_satistifed = False
+
+
+DATE_DTYPE = 'datetime64[us]'
+FLAG_WORD_BITS = 64
+
+# task attributes stored in columns, the rest is kept in per-task dicts
+COLUMN_ATTRS = ('name', 'dStart', 'dFinish', 'milestone', 'level', 'flags')
+SKIP_ATTRS = frozenset(COLUMN_ATTRS + ('tasks', '_schedule', '_subtree_hash_cache'))
+
+
+class ColumnarScheduleException(SchedulesToolsException):
+    pass
+
+
+class ColumnarSchedule(object):
+    """
+    Tasks of schedule stored in columns
+
+    Columns (one item per task):
+        parent: row of parent task, -1 for top level tasks
+        level: task level
+        start, finish: datetime64 dates (NaT for None)
+        milestone: milestone mask
+        flag_bits: flags bitset, bit i of word i // 64 stands for flag_names[i]
+        name_id: index of task name in interned names
+        subtree_end: row after the last task of subtree
+    """
+    task_cls = Task
+    schedule_attrs = None
+
+    def __init__(self, task_cls=Task, schedule_attrs=None):
+        if not additional_deps_satistifed:
+            raise ColumnarScheduleException(
+                'Columnar schedule requires numpy, which is not installed.')
+
+        self.task_cls = task_cls
+        self.schedule_attrs = schedule_attrs or {}
+
+        self.parent = np.empty(0, dtype=np.int32)
+        self.level = np.empty(0, dtype=np.int32)
+        self.start = np.empty(0, dtype=DATE_DTYPE)
+        self.finish = np.empty(0, dtype=DATE_DTYPE)
+        self.milestone = np.empty(0, dtype=bool)
+        self.flag_bits = np.empty((0, 1), dtype=np.uint64)
+        self.name_id = np.empty(0, dtype=np.int32)
+        self.subtree_end = np.empty(0, dtype=np.int32)
+
+        self.names = []
+        self.flag_names = []
+        # flags of task in original order - flag_set_id points here
+        self.flag_sets = []
+        self.flag_set_id = np.empty(0, dtype=np.int32)
+        # remaining task attributes
+        self.attrs = []
+
+        self._depth = np.empty(0, dtype=np.int32)
+        self._depth_rows = []
+
+    def __len__(self):
+        return len(self.parent)
+
+    @classmethod
+    def from_schedule(cls, schedule):
+        """Build columns from Task tree of the schedule"""
+        schedule_attrs = copy(vars(schedule))
+        schedule_attrs.pop('tasks', None)
+        schedule_attrs.pop('task_cls', None)
+
+        columnar = cls(task_cls=schedule.task_cls, schedule_attrs=schedule_attrs)
+
+        parent, level, depth, start, finish, milestone = [], [], [], [], [], []
+        name_id, flag_set_id = [], []
+        name_index, flag_set_index = {}, {}
+
+        stack = [(task, -1, 0) for task in reversed(schedule.tasks)]
+        while stack:
+            task, parent_row, task_depth = stack.pop()
+            row = len(parent)
+
+            parent.append(parent_row)
+            level.append(task.level)
+            depth.append(task_depth)
+            start.append(task.dStart)
+            finish.append(task.dFinish)
+            milestone.append(bool(task.milestone))
+
+            if task.name not in name_index:
+                name_index[task.name] = len(columnar.names)
+                columnar.names.append(task.name)
+            name_id.append(name_index[task.name])
+
+            flags = tuple(task.flags)
+            if flags not in flag_set_index:
+                flag_set_index[flags] = len(columnar.flag_sets)
+                columnar.flag_sets.append(flags)
+            flag_set_id.append(flag_set_index[flags])
+
+            attrs = {key: val for key, val in task._get_attrs().items()
+                     if key not in SKIP_ATTRS}
+            if not isinstance(task.milestone, bool):
+                # keep original value, column holds just its truth value
+                attrs['milestone'] = task.milestone
+            columnar.attrs.append(attrs)
+
+            stack.extend((subtask, row, task_depth + 1)
+                         for subtask in reversed(task.tasks))
+
+        columnar.parent = np.array(parent, dtype=np.int32)
+        columnar.level = np.array(level, dtype=np.int32)
+        columnar.start = np.array(start, dtype=DATE_DTYPE)
+        columnar.finish = np.array(finish, dtype=DATE_DTYPE)
+        columnar.milestone = np.array(milestone, dtype=bool)
+        columnar.name_id = np.array(name_id, dtype=np.int32)
+        columnar.flag_set_id = np.array(flag_set_id, dtype=np.int32)
+        columnar._depth = np.array(depth, dtype=np.int32)
+
+        columnar._build_flag_bits()
+        columnar._build_tree_index()
+
+        return columnar
+
+    def _build_flag_bits(self):
+        flag_index = {}
+        for flags in self.flag_sets:
+            for flag in flags:
+                if flag not in flag_index:
+                    flag_index[flag] = len(self.flag_names)
+                    self.flag_names.append(flag)
+
+        words = max(1, -(-len(self.flag_names) // FLAG_WORD_BITS))
+        set_bits = np.zeros((len(self.flag_sets), words), dtype=np.uint64)
+        for set_id, flags in enumerate(self.flag_sets):
+            set_bits[set_id] = self._flags_to_bits(flags, flag_index, words)
+
+        self.flag_bits = set_bits[self.flag_set_id].reshape(len(self), words)
+
+    @staticmethod
+    def _flags_to_bits(flags, flag_index, words):
+        bits = np.zeros(words, dtype=np.uint64)
+        for flag in flags:
+            if flag in flag_index:
+                bit = flag_index[flag]
+                bits[bit // FLAG_WORD_BITS] |= np.uint64(1 << (bit % FLAG_WORD_BITS))
+
+        return bits
+
+    def _build_tree_index(self):
+        # rows grouped by depth - rollups go level by level
+        order = np.argsort(self._depth, kind='stable')
+        bounds = np.searchsorted(self._depth[order],
+                                 np.arange(self._depth.max() + 2 if len(self) else 0))
+        self._depth_rows = [order[bounds[i]:bounds[i + 1]]
+                            for i in range(len(bounds) - 1)]
+
+        subtree_size = np.ones(len(self), dtype=np.int32)
+        for rows in self._depth_rows[:0:-1]:
+            np.add.at(subtree_size, self.parent[rows], subtree_size[rows])
+
+        self.subtree_end = np.arange(len(self), dtype=np.int32) + subtree_size
+
+    def to_schedule(self, mask=None):
+        """
+        Build Schedule with Task tree from columns
+
+        Args:
+            mask: (optional) bool mask of tasks to include - parents of
+                  included tasks have to be included too
+
+        Returns:
+            Schedule instance
+        """
+        schedule = Schedule()
+        for key, val in self.schedule_attrs.items():
+            setattr(schedule, key, copy(val))
+
+        if self.task_cls is not Schedule.task_cls:
+            schedule.task_cls = self.task_cls
+
+        if mask is None:
+            rows = range(len(self))
+        else:
+            rows = np.flatnonzero(mask)
+            parents = self.parent[rows]
+            if not np.all(mask[parents[parents >= 0]]):
+                raise ColumnarScheduleException(
+                    'Mask has to include parents of all selected tasks.')
+
+        starts = self.start.astype(object)
+        finishes = self.finish.astype(object)
+        tasks = [None] * len(self)
+
+        for row in rows:
+            task = self.task_cls(schedule, level=int(self.level[row]))
+            task.name = self.names[self.name_id[row]]
+            task.dStart = starts[row]
+            task.dFinish = finishes[row]
+            task.milestone = bool(self.milestone[row])
+            task.flags = list(self.flag_sets[self.flag_set_id[row]])
+
+            for key, val in self.attrs[row].items():
+                setattr(task, key, val)
+
+            parent_row = self.parent[row]
+            if parent_row < 0:
+                schedule.tasks.append(task)
+            else:
+                tasks[parent_row].tasks.append(task)
+            tasks[row] = task
+
+        return schedule
+
+    def task_name(self, row):
+        return self.names[self.name_id[row]]
+
+    def date_range_mask(self, start=None, finish=None, within=False):
+        """
+        Tasks in date range
+
+        Args:
+            start: (optional) range start, unbounded if None
+            finish: (optional) range finish, unbounded if None
+            within: whole task has to be within range, overlap is enough otherwise
+
+        Returns:
+            bool mask of tasks
+        """
+        mask = ~(np.isnat(self.start) | np.isnat(self.finish))
+
+        if start is not None:
+            start = np.datetime64(start, 'us')
+            mask &= (self.start if within else self.finish) >= start
+
+        if finish is not None:
+            finish = np.datetime64(finish, 'us')
+            mask &= (self.finish if within else self.start) <= finish
+
+        return mask
+
+    def rollup_dates(self):
+        """
+        Earliest start and latest finish of each task subtree (task included)
+
+        Returns:
+            tuple of start and finish datetime64 arrays
+        """
+        start = self.start.copy()
+        finish = self.finish.copy()
+
+        # fmin/fmax ignore NaT
+        for rows in self._depth_rows[:0:-1]:
+            np.fmin.at(start, self.parent[rows], start[rows])
+            np.fmax.at(finish, self.parent[rows], finish[rows])
+
+        return start, finish
+
+    def date_bounds(self, mask=None):
+        """
+        Earliest start and latest finish of tasks (as check_top_task computes them)
+
+        Args:
+            mask: (optional) bool mask of tasks to consider, top level tasks if None
+
+        Returns:
+            tuple of start and finish as datetime, None if there is no date
+        """
+        if mask is None:
+            mask = self.parent < 0
+
+        start = self.start[mask]
+        finish = self.finish[mask]
+        start = start[~np.isnat(start)]
+        finish = finish[~np.isnat(finish)]
+
+        return (start.min().item() if len(start) else None,
+                finish.max().item() if len(finish) else None)
+
+    def flags_mask(self, flags):
+        """Tasks with any of given flags"""
+        flag_index = {flag: i for i, flag in enumerate(self.flag_names)}
+        bits = self._flags_to_bits(flags, flag_index, self.flag_bits.shape[1])
+
+        return (self.flag_bits & bits).any(axis=1)
+
+    def filter_flags_mask(self, show=None, hide=None):
+        """
+        Tasks kept by Schedule.filter_flags with the same arguments
+
+        Args:
+            show: list of flags to show
+            hide: list of flags to hide
+
+        Returns:
+            bool mask of tasks
+        """
+        if not show and not hide:
+            return np.ones(len(self), dtype=bool)
+
+        visible = ~self.flags_mask(hide or [])
+        if show:
+            shown = self.flags_mask(show)
+        else:
+            shown = np.ones(len(self), dtype=bool)
+
+        # bottom-up - task is kept if it fits itself or any of its children is kept
+        keep = np.zeros(len(self), dtype=bool)
+        keep_child = np.zeros(len(self), dtype=bool)
+        for depth in range(len(self._depth_rows) - 1, -1, -1):
+            rows = self._depth_rows[depth]
+            keep[rows] = visible[rows] & (shown[rows] | keep_child[rows])
+            if depth:
+                np.logical_or.at(keep_child, self.parent[rows], keep[rows])
+
+        # top-down - removed task removes whole subtree
+        for rows in self._depth_rows[1:]:
+            keep[rows] &= keep[self.parent[rows]]
+
+        return keep
+
+    def used_flags(self, mask=None):
+        """Set of flags used by tasks (selected by mask)"""
+        flag_bits = self.flag_bits if mask is None else self.flag_bits[mask]
+        used_bits = np.bitwise_or.reduce(flag_bits, axis=0)
+
+        return {flag for i, flag in enumerate(self.flag_names)
+                if int(used_bits[i // FLAG_WORD_BITS]) >> (i % FLAG_WORD_BITS) & 1}
@@ -0,0 +1,225 @@
+"""
+Persistent cache of conversion results
+
+Imported schedules (intermediate Schedule) and rendered exports are kept
+on local disk, one file per entry named by hash of its key. Import key
+consists of handle, source version (mtime/changelog revision), options
+and handler version; export key of schedule content, target format,
+options and handler version.
+
+Least recently used entries are evicted when cache exceeds its size
+or number of entries.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import tempfile
+from importlib.metadata import PackageNotFoundError, version as package_version
+
+from schedules_tools import get_cache_dir
+
+log = logging.getLogger(__name__)
+
+
+ENTRY_EXT = '.entry'
+DEFAULT_MAX_SIZE = 512 * 2 ** 20  # bytes
+CACHE_FORMAT_VERSION = 1
+
+# converter options not affecting conversion result
+IGNORED_OPTIONS = frozenset([
+    'source', 'target', 'target_format', 'format_target', 'batch', 'workers',
+    'log_level', 'force', 'handlers_path', 'cache_dir', 'cache_max_size',
+])
+
+
+def get_default_cache_dir():
+    return os.path.join(get_cache_dir(), 'conversions')
+
+
+@functools.lru_cache(maxsize=None)
+def _get_package_version():
+    try:
+        return package_version('schedules-tools')
+    except PackageNotFoundError:
+        return ''
+
+
+def get_handler_version(handler_cls):
+    """
+    Version of handler - changes with package version, handler
+    cache_version or modification of handler module
+    """
+    try:
+        module_mtime = os.stat(inspect.getfile(handler_cls)).st_mtime_ns
+    except (OSError, TypeError):
+        module_mtime = None
+
+    return [handler_cls.__module__, handler_cls.__name__,
+            getattr(handler_cls, 'cache_version', None), _get_package_version(),
+            module_mtime]
+
+
+def make_key(*parts):
+    """Hash of JSON representation of key parts"""
+    content = json.dumps(parts, sort_keys=True, default=str)
+
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def options_key(options):
+    return {key: val for key, val in (options or {}).items()
+            if key not in IGNORED_OPTIONS}
+
+
+def schedule_digest(schedule):
+    """Content hash of the schedule"""
+    return make_key(schedule.dump_as_dict())
+
+
+class ConversionCache(object):
+    """
+    Disk cache of imported schedules and rendered exports
+
+    Attributes:
+        directory: cache directory
+        max_size: max total size of entries in bytes
+        max_entries: max number of entries (None for unlimited)
+        stats: dict of hits, misses, stores and evictions of this instance
+    """
+    directory = None
+    max_size = DEFAULT_MAX_SIZE
+    max_entries = None
+    stats = None
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE,
+                 max_entries=None):
+        self.directory = directory or get_default_cache_dir()
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + ENTRY_EXT)
+
+    def get(self, key):
+        """
+        Cached value of key
+
+        Returns:
+            stored value, None on miss
+        """
+        path = self._entry_path(key)
+
+        try:
+            with open(path, 'rb') as fd:
+                version, value = pickle.load(fd)
+        except (IOError, OSError):
+            self.stats['misses'] += 1
+            return None
+        except Exception as e:
+            # broken/incompatible entry is a miss
+            log.debug('Dropping cache entry {}: {}'.format(path, e))
+            self._remove(path)
+            self.stats['misses'] += 1
+            return None
+
+        if version != CACHE_FORMAT_VERSION:
+            self._remove(path)
+            self.stats['misses'] += 1
+            return None
+
+        try:
+            # last use time for LRU eviction
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.stats['hits'] += 1
+        return value
+
+    def set(self, key, value):
+        """Store value under key and evict old entries if needed"""
+        try:
+            content = pickle.dumps((CACHE_FORMAT_VERSION, value),
+                                   protocol=pickle.HIGHEST_PROTOCOL)
+
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+
+            # replace whole entry at once, concurrent processes may read it
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(content)
+            os.replace(tmp_path, self._entry_path(key))
+        except (IOError, OSError, pickle.PicklingError, TypeError,
+                AttributeError) as e:
+            log.warning('Unable to store cache entry: {}'.format(e))
+            return False
+
+        self.stats['stores'] += 1
+        self.evict()
+
+        return True
+
+    def _entries(self):
+        entries = []
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError:
+            return entries
+
+        for filename in filenames:
+            if not filename.endswith(ENTRY_EXT):
+                continue
+
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        return entries
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return False
+
+        return True
+
+    def evict(self):
+        """Remove least recently used entries over size/entries limit"""
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+
+        while entries and (
+                (self.max_size is not None and total_size > self.max_size)
+                or (self.max_entries is not None
+                    and len(entries) > self.max_entries)):
+            _, size, path = entries.pop(0)
+            if self._remove(path):
+                self.stats['evictions'] += 1
+            total_size -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def info(self):
+        """Number of entries and their total size in bytes"""
+        entries = self._entries()
+
+        return {'entries': len(entries),
+                'size': sum(size for _, size, _ in entries)}
+
+    def __str__(self):
+        return ('Conversion cache {}: {hits} hits, {misses} misses, '
+                '{stores} stores, {evictions} evictions').format(
+                    self.directory, **self.stats)
@@ -6,7 +6,10 @@
 import argparse
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from schedules_tools import SchedulesToolsException
+from schedules_tools import conversion_cache
 from schedules_tools import discovery
 from schedules_tools.discovery import search_paths
 from schedules_tools.models import Schedule
@@ -17,6 +20,9 @@ import sys
 log = logging.getLogger(__name__)
 
 
+# size of handle content beginning used to sniff the source format
+SOURCE_HEAD_SIZE = 4096
+
 SORT_FIELDS = {
     'name': 'name',
     'date_start': 'dStart',
@@ -49,17 +55,46 @@ class ScheduleConverter(object):
     schedule = None
     storage_handler = None
     local_handle = None
+    cache = None
 
-    def __init__(self, schedule=None):
+    def __init__(self, schedule=None, cache=None):
+        """
+        Args:
+            schedule: (optional) Schedule to work with
+            cache: (optional) ConversionCache for import/export results
+        """
         self.schedule = schedule
+        self.cache = cache
+
+    @staticmethod
+    def _read_handle_head(handle):
+        """Beginning of handle content, None if handle isn't a local file"""
+        try:
+            with open(handle, 'rb') as fd:
+                return fd.read(SOURCE_HEAD_SIZE)
+        except (IOError, OSError, TypeError, ValueError):
+            return None
 
     # TODO: take a look if _get_handler* methods can't be shared for both
     # schedule/storage
-    @staticmethod
-    def _get_schedule_handler_for_handle(handle):
+    @classmethod
+    def _get_schedule_handler_for_handle(cls, handle):
+        head = cls._read_handle_head(handle)
+
+        # handler class (and module) is loaded only for handlers with deps
         for module in discovery.schedule_handlers.values():
-            if (module['class'].handle_deps_satisfied and
-                    module['class'].is_valid_source(handle)):
+            if not module.get('handle_deps_satisfied'):
+                continue
+
+            handler_cls = module['class']
+            is_valid = None
+            if head is not None:
+                is_valid = handler_cls.sniff_source(handle, head)
+
+            if is_valid is None:
+                is_valid = handler_cls.is_valid_source(handle)
+
+            if is_valid:
                 return module
 
         msg = "Can't find schedule handler for handle: {}".format(handle)
@@ -184,6 +219,8 @@ class ScheduleConverter(object):
             except SchedulesToolsException as e:
                 error_item = e.__class__.__name__, str(e).split('\n'), e.source
                 errors.append(error_item)
+            finally:
+                schedule_handler_cls.clear_parsed_sources()
 
             if cleanup:
                 self.cleanup_local_handle()
@@ -197,6 +234,23 @@ class ScheduleConverter(object):
                         cleanup=True,
                         options=dict()
                         ):
+        cache_key = None
+        self._init_storage_handler(handle, storage_src_format, options)
+
+        # version provided by storage - cache is checked before checkout
+        if (self.cache is not None and self.storage_handler
+                and schedule_src_format):
+            cache_key = self._get_import_cache_key(
+                handle,
+                self._get_schedule_handler_cls(fmt=schedule_src_format),
+                options,
+                self._get_storage_version())
+
+            if self._load_cached_schedule(cache_key):
+                if cleanup and self.local_handle:
+                    self.cleanup_local_handle()
+
+                return self.schedule
 
         # convert to local handle if needed
         local_handle = self._get_local_handle_from_storage(handle,
@@ -217,6 +271,17 @@ class ScheduleConverter(object):
                                         options=options
                                         )
 
+        if self.cache is not None and cache_key is None:
+            cache_key = self._get_import_cache_key(
+                handle, schedule_handler_cls, options,
+                self._get_source_version(schedule_handler))
+
+            if self._load_cached_schedule(cache_key):
+                if cleanup:
+                    self.cleanup_local_handle()
+
+                return self.schedule
+
         # imports changelog and mtime - if implemented
         schedule = Schedule()
         try:
@@ -232,9 +297,18 @@ class ScheduleConverter(object):
                 if self.storage_handler.provide_mtime:
                     schedule.mtime = self.storage_handler.get_handle_mtime()
 
+            # slotted tasks for large schedules
+            if options.get('compact_tasks'):
+                schedule.make_compact()
+
         except SchedulesToolsException as e:
             error_item = e.__class__.__name__, str(e).split('\n'), e.source
             schedule.errors_import.append(error_item)
+        finally:
+            schedule_handler.clear_parsed_sources()
+
+        if cache_key and not schedule.errors_import:
+            self.cache.set(cache_key, schedule)
 
         self.schedule = schedule
 
@@ -243,11 +317,7 @@ class ScheduleConverter(object):
 
         return self.schedule
 
-    def export_schedule(self,
-                        output,
-                        target_format,
-                        update_filename=False,
-                        options=dict()):
+    def _init_export_handler(self, target_format, options=dict()):
         schedule_handler_cls = self._get_schedule_handler_cls(
                                                         fmt=target_format)
 
@@ -261,15 +331,286 @@ class ScheduleConverter(object):
                    'can\'t export schedule.'.format(schedule_handler_cls))
             raise HandlerMissingDeps(msg)
 
-        schedule_handler = schedule_handler_cls(schedule=self.schedule,
-                                                options=options)
+        return schedule_handler_cls(schedule=self.schedule, options=options)
 
+    @staticmethod
+    def _get_export_output(schedule_handler, output, update_filename=False):
         if update_filename and schedule_handler.default_export_ext:
             # change/add export extension according to handler
             output = '.'.join([os.path.splitext(output)[0],
                                schedule_handler.default_export_ext])
 
-        return schedule_handler.export_schedule(output)
+        return output
+
+    def _get_storage_version(self):
+        """
+        Version of the handle provided by storage, no checkout is needed
+
+        Returns:
+            list of version parts, None when storage can't tell it
+        """
+        version = []
+
+        if self.storage_handler:
+            try:
+                if self.storage_handler.provide_mtime:
+                    version.append(self.storage_handler.get_handle_mtime())
+
+                if self.storage_handler.provide_changelog:
+                    changelog = self.storage_handler.get_handle_changelog()
+                    version.append(max(changelog) if changelog else None)
+            except SchedulesToolsException:
+                # reported by import itself
+                log.debug('Storage version unavailable', exc_info=True)
+                return None
+
+        return version or None
+
+    def _get_source_version(self, schedule_handler):
+        """
+        Version of the handle (mtime, changelog revision) without reading it
+
+        Returns:
+            list of version parts, None when handle version can't be told
+        """
+        version = self._get_storage_version()
+        if version:
+            return version
+
+        try:
+            stat = os.stat(schedule_handler.handle)
+            return [stat.st_mtime_ns, stat.st_size]
+        except (OSError, TypeError, ValueError):
+            pass
+
+        if schedule_handler.provide_mtime:
+            try:
+                return [schedule_handler.get_handle_mtime()]
+            except NotImplementedError:
+                pass
+            except SchedulesToolsException:
+                # reported by import itself
+                log.debug('Handle version unavailable', exc_info=True)
+
+        return None
+
+    def _get_import_cache_key(self, handle, schedule_handler_cls, options,
+                              source_version):
+        if self.cache is None or source_version is None:
+            return None
+
+        return conversion_cache.make_key(
+            'import', handle, source_version,
+            conversion_cache.options_key(options),
+            conversion_cache.get_handler_version(schedule_handler_cls))
+
+    def _load_cached_schedule(self, cache_key):
+        """Use imported schedule from cache, return True if found"""
+        if not cache_key:
+            return False
+
+        schedule = self.cache.get(cache_key)
+        if schedule is None:
+            return False
+
+        self.schedule = schedule
+        return True
+
+    def _get_export_cache_key(self, schedule_handler, output, target_format,
+                              options, schedule_digest=None):
+        # without output file handlers just return the content
+        if (self.cache is None or output is None
+                or not schedule_handler.export_cacheable):
+            return None
+
+        return conversion_cache.make_key(
+            'export', target_format,
+            schedule_digest or conversion_cache.schedule_digest(self.schedule),
+            conversion_cache.options_key(options),
+            conversion_cache.get_handler_version(schedule_handler.__class__))
+
+    def _export(self, schedule_handler, output, target_format, options,
+                schedule_digest=None):
+        cache_key = self._get_export_cache_key(schedule_handler, output,
+                                               target_format, options,
+                                               schedule_digest)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                content, result = cached
+                with open(output, 'wb') as fd:
+                    fd.write(content)
+
+                return result
+
+        result = schedule_handler.export_schedule(output)
+
+        if cache_key:
+            with open(output, 'rb') as fd:
+                self.cache.set(cache_key, (fd.read(), result))
+
+        return result
+
+    def export_schedule(self,
+                        output,
+                        target_format,
+                        update_filename=False,
+                        options=dict()):
+        schedule_handler = self._init_export_handler(target_format, options)
+        output = self._get_export_output(schedule_handler, output,
+                                         update_filename)
+
+        return self._export(schedule_handler, output, target_format, options)
+
+    def _export_target(self, target_format, output, default_output, options,
+                       schedule_digest=None):
+        start = time.perf_counter()
+        ret = {'output': output, 'result': None, 'error': None}
+
+        try:
+            schedule_handler = self._init_export_handler(target_format, options)
+            if not output:
+                ret['output'] = self._get_export_output(
+                    schedule_handler, default_output, update_filename=True)
+
+            ret['result'] = self._export(schedule_handler, ret['output'],
+                                         target_format, options,
+                                         schedule_digest)
+        except Exception as e:
+            log.debug('Export to {} failed'.format(target_format), exc_info=True)
+            ret['error'] = e
+
+        ret['time'] = time.perf_counter() - start
+        return ret
+
+    def export_schedules(self,
+                         targets,
+                         default_output=None,
+                         options=dict(),
+                         max_workers=None):
+        """
+        Export schedule to several target formats
+
+        Exports of handlers with concurrent_export run in thread pool
+        (after the others, which can modify the schedule). Failed export
+        doesn't stop exporting to other formats.
+
+        Args:
+            targets: dict of target format -> output, output can be None
+            default_output: output used for targets without output -
+                            with extension according to handler
+            options: handler options
+            max_workers: max number of concurrent exports
+
+        Returns:
+            dict of target format -> dict with 'output', 'result'
+            (export_schedule return value), 'error' (raised exception,
+            None on success) and 'time' (seconds)
+        """
+        ret = dict()
+        concurrent_targets = []
+
+        # schedule is the same for all targets
+        schedule_digest = None
+        if self.cache is not None:
+            schedule_digest = conversion_cache.schedule_digest(self.schedule)
+
+        for target_format, output in targets.items():
+            try:
+                concurrent = self._get_schedule_handler_cls(
+                    fmt=target_format).concurrent_export
+            except ScheduleFormatNotSupported:
+                concurrent = False
+
+            if concurrent:
+                concurrent_targets.append((target_format, output))
+            else:
+                ret[target_format] = self._export_target(
+                    target_format, output, default_output, options,
+                    schedule_digest)
+
+        if concurrent_targets:
+            with ThreadPoolExecutor(
+                    max_workers=max_workers or len(concurrent_targets)) as executor:
+                futures = [
+                    (target_format,
+                     executor.submit(self._export_target, target_format,
+                                     output, default_output, options,
+                                     schedule_digest))
+                    for target_format, output in concurrent_targets]
+
+                for target_format, future in futures:
+                    ret[target_format] = future.result()
+
+        # keep order of targets
+        return {target_format: ret[target_format] for target_format in targets}
+
+
+def _flags_list(value):
+    # comma separated string from CLI, list from batch manifest
+    if isinstance(value, str):
+        value = value.split(',')
+
+    return [flag for flag in value or [] if flag]
+
+
+def filter_schedule(schedule, options):
+    """
+    Check task names, flatten, sort and filter schedule as requested by options
+
+    Args:
+        schedule: Schedule to process (in place, unless it's read-only view)
+        options: dict of schedule-convert options (check_taskname,
+                 check_taskname_startswith, flat, milestones, sort,
+                 flag_show, flag_hide)
+
+    Returns:
+        processed Schedule - materialized copy of read-only schedule view
+        when tasks are modified
+    """
+    flag_show = _flags_list(options.get('flag_show'))
+    flag_hide = _flags_list(options.get('flag_hide'))
+
+    check_taskname = options.get('check_taskname') or []
+    check_taskname_startswith = options.get('check_taskname_startswith') or []
+
+    check_tasks = dict()
+    for task_name in check_taskname:
+        check_tasks[task_name] = False
+
+    for task_name in check_taskname_startswith:
+        check_tasks[task_name] = True
+
+    if check_tasks:
+        missing_tasks = schedule.check_for_taskname(check_tasks)
+        if missing_tasks:
+            log.info('Missing tasks: {}'.format(list(missing_tasks)))
+
+    if (options.get('flat') or options.get('milestones')
+            or options.get('sort') or flag_show or flag_hide):
+        schedule = schedule.materialize()
+
+    if options.get('flat') or options.get('milestones'):
+        schedule.make_flat()
+
+    if options.get('milestones'):
+        schedule.filter_milestones()
+
+    if options.get('sort'):
+        schedule.sort_tasks(options['sort'])
+
+    schedule.filter_flags(flag_show, flag_hide)
+
+    return schedule
+
+
+def get_conversion_cache(options):
+    """ConversionCache according to options, None if not requested"""
+    if not options.get('cache_dir'):
+        return None
+
+    return conversion_cache.ConversionCache(
+        options['cache_dir'], max_size=options['cache_max_size'] * 2 ** 20)
 
 
 def convert(args):
@@ -281,7 +622,7 @@ def convert(args):
     for path in opt_args.pop('handlers_path'):
         search_paths.append(path)
 
-    converter = ScheduleConverter()
+    converter = ScheduleConverter(cache=get_conversion_cache(opt_args))
 
     try:
         converter.import_schedule(
@@ -301,47 +642,47 @@ def convert(args):
         log.error(e)
         return
 
-    check_tasks = dict()
-    for task_name in args.check_taskname:
-        check_tasks[task_name] = False
-
-    for task_name in args.check_taskname_startswith:
-        check_tasks[task_name] = True
-
-    if args.check_taskname or args.check_taskname_startswith:
-        missing_tasks = converter.schedule.check_for_taskname(check_tasks)
-        if missing_tasks:
-            log.info('Missing tasks: {}'.format(list(missing_tasks)))
-
-    if args.flat or args.milestones:
-        converter.schedule.make_flat()
-
-    if args.milestones:
-        converter.schedule.filter_milestones()
-
-    if args.sort:
-        converter.schedule.sort_tasks(args.sort)
-
-    flag_show = args.flag_show.split(',')
-    if flag_show == ['']:
-        flag_show = []
-
-    flag_hide = [f for f in args.flag_hide.split(',') if f]
-    if flag_hide == ['']:
-        flag_hide = []
-
-    converter.schedule.filter_flags(flag_show, flag_hide)
-
-    # do we have target name defined?
-    update_filename = False
-    if not args.target:
-        args.target = args.source
-        update_filename = True
-
-    converter.export_schedule(args.target,
-                              args.target_format,
-                              update_filename=update_filename,
-                              options=opt_args)
+    converter.schedule = filter_schedule(converter.schedule, opt_args)
+
+    target_formats = [fmt for fmt in args.target_format.split(',') if fmt]
+    format_targets = dict()
+    for format_target in args.format_target:
+        target_format, _, target = format_target.partition('=')
+        format_targets[target_format] = target
+
+        if target_format not in target_formats:
+            target_formats.append(target_format)
+
+    ret = None
+    if len(target_formats) > 1 or format_targets:
+        # single schedule exported to all target formats
+        targets = {fmt: format_targets.get(fmt) for fmt in target_formats}
+        exports = converter.export_schedules(targets,
+                                             default_output=args.target or args.source,
+                                             options=opt_args)
+
+        ret = True
+        for target_format, export in exports.items():
+            if export['error']:
+                log.error('Export to {} failed: {}'.format(target_format,
+                                                           export['error']))
+                ret = False
+    else:
+        # do we have target name defined?
+        update_filename = False
+        if not args.target:
+            args.target = args.source
+            update_filename = True
+
+        converter.export_schedule(args.target,
+                                  args.target_format,
+                                  update_filename=update_filename,
+                                  options=opt_args)
+
+    if converter.cache is not None:
+        log.info(converter.cache)
+
+    return ret
 
 
 def get_handlers_args_parser(add_help=False):
@@ -413,6 +754,26 @@ def get_handlers_args_parser(add_help=False):
     parser.add_argument('--html-css-href',
                         help='HTML export custom css for <link> tag')
 
+    parser.add_argument('--json-backend',
+                        help='JSON library used by json handler: auto '
+                             '(default - orjson, ujson or json, the first '
+                             'installed), orjson, ujson, json',
+                        default='auto')
+    parser.add_argument('--json-compact',
+                        help='JSON export without indentation',
+                        default=False,
+                        action='store_true')
+
+    parser.add_argument('--stbin-mmap',
+                        help='Memory-map stbin source instead of reading it',
+                        default=False,
+                        action='store_true')
+    parser.add_argument('--stbin-view',
+                        help='Import stbin source as read-only view over '
+                             'memory-mapped file (tasks loaded on access)',
+                        default=False,
+                        action='store_true')
+
     parser.add_argument('--flat',
                         help='Make output schedule flat',
                         default=False,
@@ -441,8 +802,17 @@ def get_handlers_args_parser(add_help=False):
 
     parser.add_argument('--target-format',
                         metavar='TARGET_FORMAT',
-                        help='Target format to convert',
+                        help='Target format to convert, comma separated '
+                             'list exports the schedule to all of them '
+                             '(TARGET extension is changed according to format)',
                         default='html')
+    parser.add_argument('--format-target',
+                        metavar='FORMAT=TARGET',
+                        help='Output target for given target format, '
+                             'the format is added to target formats '
+                             '(can be used multiple times)',
+                        action='append',
+                        default=[])
     parser.add_argument(
         '--tz',
         help='Timezone used for schedule conversions '
@@ -458,6 +828,14 @@ def get_handlers_args_parser(add_help=False):
 
         return field
 
+    parser.add_argument('--cache-dir',
+                        help='Keep imported schedules and exports in '
+                             'conversion cache in this directory')
+    parser.add_argument('--cache-max-size',
+                        help='Conversion cache size limit in MB (default %(default)s)',
+                        type=int,
+                        default=conversion_cache.DEFAULT_MAX_SIZE // 2 ** 20)
+
     parser.add_argument('--sort',
                         help='Sort by: %s' % ', '.join(SORT_FIELDS.keys()),
                         type=sorting_field)
@@ -483,21 +861,62 @@ def setup_logging(level):
 
 
 def main():
+    # import only handlers that are really used
+    discovery.use_handlers_index()
+
     parser = argparse.ArgumentParser(description='Convert schedules source to target',
                                      parents=[get_handlers_args_parser()])
 
     parser.add_argument('source',
                         help='Source handle (file/URL/...)',
                         type=str,
-                        metavar='SRC')
+                        metavar='SRC',
+                        nargs='?')
 
     parser.add_argument('target', metavar='TARGET',
                         help='Output target', default='schedule.html', nargs='?')
 
+    parser.add_argument('--batch', metavar='MANIFEST',
+                        help='Run conversion jobs from YAML manifest '
+                             '(see schedules_tools.batch_convert), other '
+                             'options override manifest options')
+    parser.add_argument('--workers',
+                        help='Number of worker processes for --batch '
+                             '(default is number of CPUs)',
+                        type=int)
+
     args = parser.parse_args()
 
+    if not args.batch and not args.source:
+        parser.error('the following arguments are required: SRC')
+
     setup_logging(getattr(logging, args.log_level))
 
+    if args.batch:
+        from schedules_tools.batch_convert import get_default_options, run_manifest
+
+        # options given on command line override manifest options
+        defaults = get_default_options()
+        options = {key: val for key, val in vars(args).items()
+                   if key in defaults and key != 'log_level'
+                   and val != defaults[key]}
+
+        # jobs define their sources and targets
+        ignored = ['--' + key.replace('_', '-')
+                   for key in ('target_format', 'format_target')
+                   if key in options]
+        if args.source:
+            ignored.insert(0, 'SRC')
+        if ignored:
+            parser.error('argument --batch: not allowed with {}'.format(
+                ', '.join(ignored)))
+
+        results = run_manifest(args.batch, workers=args.workers,
+                               options=options)
+        if not all(result.ok for result in results):
+            sys.exit(1)
+        return
+
     convert(args)
 
 
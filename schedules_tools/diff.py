@@ -15,14 +15,23 @@ Test as "python -m schedules_tools.batches.diff"
 """
 
 import argparse
+from bisect import bisect_left
+from collections import Counter, defaultdict
 from datetime import datetime
+import heapq
 import json
 import logging
 from schedules_tools import jsondate, discovery
 from schedules_tools.converter import ScheduleConverter
-from schedules_tools.models import Task, Schedule
+from schedules_tools.models import Task, TaskBase, Schedule
 import sys
 
+try:
+    import numpy
+    numpy_available = True
+except ImportError:
+    numpy_available = False
+
 
 log = logging.getLogger(__name__)
 
@@ -45,6 +54,11 @@ TASK_SCORE_THRESHOLD = 0.45
 NAME_SIM_WEIGHT = 0.5
 TASK_POS_WEIGHT = 0.5
 
+# tolerance of float rounding when pruning candidates by score upper bounds
+SCORE_BOUND_EPSILON = 1e-9
+# compute name similarity to all candidates at once (needs numpy) from this count
+BATCH_SIMILARITY_MIN_TASKS = 64
+
 
 def strings_similarity(str1, str2, winkler=True, scaling=0.1):
     """
@@ -82,11 +96,16 @@ def strings_similarity(str1, str2, winkler=True, scaling=0.1):
 
         return count, transpositions
 
+    num_of_matches, transpositions = num_of_char_matches(str1, len(str1), str2, len(str2))
+
+    return _similarity_score(str1, str2, num_of_matches, transpositions, winkler, scaling)
+
+
+def _similarity_score(str1, str2, num_of_matches, transpositions, winkler, scaling):
+    """ Jaro(-Winkler) distance of 2 different strings from counted char matches. """
     len1 = len(str1)
     len2 = len(str2)
 
-    num_of_matches, transpositions = num_of_char_matches(str1, len1, str2, len2)
-
     if num_of_matches == 0:
         return 0.0
 
@@ -111,6 +130,218 @@ def strings_similarity(str1, str2, winkler=True, scaling=0.1):
     return dj
 
 
+class StringsSimilarityIndex(object):
+    """
+    Candidate strings prepared to compute strings_similarity of one string
+    against all of them at once.
+
+    With numpy, positions of every char in candidates are indexed, so each
+    char of the string is looked up in all candidates in one step. Without
+    numpy it falls back to strings_similarity for each candidate. Scores are
+    the same as from strings_similarity in both cases.
+    """
+
+    def __init__(self, strings):
+        self.strings = list(strings)
+        self._char_positions = None
+
+    def _get_char_positions(self):
+        """
+        Returns lengths of candidates and dict char code -> (rows, positions)
+        of its occurrences, sorted by row and position.
+        """
+        if self._char_positions is None:
+            lengths = numpy.array([len(string) for string in self.strings], dtype=numpy.int64)
+            codes = numpy.frombuffer(
+                ''.join(self.strings).encode('utf-32-le', 'surrogatepass'), dtype=numpy.uint32)
+            rows = numpy.repeat(numpy.arange(len(self.strings)), lengths)
+            positions = numpy.arange(len(codes)) - numpy.repeat(numpy.cumsum(lengths) - lengths,
+                                                                lengths)
+
+            order = numpy.lexsort((positions, rows, codes))
+            codes, rows, positions = codes[order], rows[order], positions[order]
+            unique_codes, code_starts = numpy.unique(codes, return_index=True)
+            code_ends = numpy.append(code_starts[1:], len(codes))
+
+            occurrences = {
+                chr(code): (rows[start:end], positions[start:end])
+                for code, start, end in zip(unique_codes.tolist(), code_starts.tolist(),
+                                            code_ends.tolist())
+            }
+            self._char_positions = lengths, occurrences
+
+        return self._char_positions
+
+    def char_matches(self, str1, start_at_index=0):
+        """
+        Number of char matches and transpositions (see strings_similarity)
+        of str1 with candidates from start_at_index on.
+
+        Returns:
+            tuple of lists (zeros for candidates before start_at_index)
+        """
+        lengths, occurrences = self._get_char_positions()
+        len1 = len(str1)
+
+        num_of_matches = numpy.zeros(len(self.strings), dtype=numpy.int64)
+        transpositions = numpy.zeros(len(self.strings), dtype=numpy.int64)
+        limits = (numpy.maximum(lengths, len1) / 2 - 1).astype(numpy.int64)
+
+        for i, char in enumerate(str1):
+            if char not in occurrences:
+                continue
+
+            rows, positions = occurrences[char]
+            if start_at_index:
+                first = numpy.searchsorted(rows, start_at_index)
+                rows, positions = rows[first:], positions[first:]
+
+            # occurrences within search window of i-th char
+            row_limits = limits[rows]
+            in_window = ((positions >= i - row_limits)
+                         & (positions < numpy.minimum(i + row_limits + 1, lengths[rows])))
+            rows, positions = rows[in_window], positions[in_window]
+            if not len(rows):
+                continue
+
+            # first occurrence in each row - same as str.find
+            first_in_row = numpy.empty(len(rows), dtype=bool)
+            first_in_row[0] = True
+            numpy.not_equal(rows[1:], rows[:-1], out=first_in_row[1:])
+            rows, positions = rows[first_in_row], positions[first_in_row]
+
+            num_of_matches[rows] += 1
+            transpositions[rows] += positions != i
+
+        return num_of_matches.tolist(), transpositions.tolist()
+
+    def similarities(self, str1, winkler=True, scaling=0.1):
+        """
+        strings_similarity of str1 and each candidate string
+
+        Returns:
+            list of scores in the order of candidates
+        """
+        if not numpy_available:
+            return [strings_similarity(str1, str2, winkler=winkler, scaling=scaling)
+                    for str2 in self.strings]
+
+        num_of_matches, transpositions = self.char_matches(str1)
+
+        return [1.0 if str1 == str2
+                else _similarity_score(str1, str2, matches, transposed, winkler, scaling)
+                for str2, matches, transposed in zip(self.strings, num_of_matches, transpositions)]
+
+
+def strings_similarity_many(str1, strings, winkler=True, scaling=0.1):
+    """
+    strings_similarity of str1 and each of strings, see StringsSimilarityIndex
+    """
+    return StringsSimilarityIndex(strings).similarities(str1, winkler=winkler, scaling=scaling)
+
+
+def strings_similarity_upper_bound(len1, len2, prefix_length=0, num_of_matches=None,
+                                   scaling=0.1):
+    """
+    Upper bound of strings_similarity (with or without winkler adjustment)
+    for strings of given lengths.
+
+    :param prefix_length: (upper bound of) common prefix length (max = 4)
+    :param num_of_matches: (upper bound of) number of str1 chars present in str2
+    """
+    if not len1 or not len2:
+        return 0.0
+
+    # only chars of str1 with non-empty search window in str2 can match
+    limit = int(max(len1, len2) / 2 - 1)
+    if num_of_matches is None:
+        num_of_matches = len1
+    num_of_matches = min(num_of_matches, len1, len2 + limit)
+
+    if num_of_matches <= 0:
+        return 0.0
+
+    m = float(num_of_matches)
+    dj = (m / float(len1) + m / float(len2) + 1.0) / 3.0
+
+    return max(dj, dj + (prefix_length * scaling * (1.0 - dj)))
+
+
+def common_prefix_length(str1, str2, max_length=4):
+    length = 0
+    max_length = min(len(str1), len(str2), max_length)
+    while length < max_length and str1[length] == str2[length]:
+        length += 1
+
+    return length
+
+
+class TasksMatchIndex(object):
+    """
+    Index of tasks (one level of schedule) to match tasks against
+
+    Exact name and subtree hash matches are looked up in dicts. Other
+    tasks are grouped to buckets by name length and first character,
+    so buckets which can't beat the best match found so far are skipped.
+    """
+
+    def __init__(self, tasks, hash_fields):
+        self.tasks = tasks
+        self.names = []
+        self.name_chars = []
+        self.subtree_hashes = []
+
+        self.by_name = defaultdict(list)
+        self.by_subtree_hash = defaultdict(list)
+        self.buckets = defaultdict(list)
+
+        for i, task in enumerate(tasks):
+            # empty names are considered equal
+            name = task.name or ''
+            subtree_hash = task.get_subtree_hash(hash_fields)
+
+            self.names.append(name)
+            self.name_chars.append(frozenset(name))
+            self.subtree_hashes.append(subtree_hash)
+
+            self.by_name[name].append(i)
+            if subtree_hash:
+                self.by_subtree_hash[subtree_hash].append(i)
+            self.buckets[(len(name), name[:1])].append(i)
+
+        self.names_similarity = StringsSimilarityIndex(self.names)
+
+    @staticmethod
+    def indexes_from(indexes, start_at_index):
+        return indexes[bisect_left(indexes, start_at_index):]
+
+    def name_chars_matches(self, name_chars_count, index):
+        """Number of chars (counted by name_chars_count) present in name of task at index"""
+        common_chars = name_chars_count.keys() & self.name_chars[index]
+        return sum(map(name_chars_count.__getitem__, common_chars))
+
+
+class NameScores(object):
+    """
+    Similarity scores of name to names of indexed tasks from start_at_index on.
+    Chars are matched for all tasks at once, scores are computed on access.
+    """
+
+    def __init__(self, tasks_index, name, start_at_index=0):
+        self.tasks_index = tasks_index
+        self.name = name
+        self.num_of_matches, self.transpositions = \
+            tasks_index.names_similarity.char_matches(name, start_at_index)
+
+    def score(self, index, winkler):
+        t2_name = self.tasks_index.names[index]
+        if self.name == t2_name:
+            return 1.0
+
+        return _similarity_score(self.name, t2_name, self.num_of_matches[index],
+                                 self.transpositions[index], winkler, 0.1)
+
+
 class ScheduleDiff(object):
 
     result = []
@@ -274,22 +505,45 @@ class ScheduleDiff(object):
             if isinstance(attribute_b, datetime):
                 attribute_b = attribute_b.date()
 
-        if isinstance(attribute_a, list):
+        if isinstance(attribute_a, (list, tuple)):
             attribute_a = sorted(attribute_a)
 
-        if isinstance(attribute_b, list):
+        if isinstance(attribute_b, (list, tuple)):
             attribute_b = sorted(attribute_b)
 
         return attribute_a == attribute_b
 
-    def find_best_match(self, t1, possible_matches, start_at_index=0):
+    def find_best_match(self, t1, possible_matches, start_at_index=0, tasks_index=None):
         """
         Finds the best match for the given task in the list of possible matches.
 
+        Result is the same as evaluating all possible matches one by one
+        (first unchanged task wins, otherwise the best scored changed one), but
+        candidates that can't beat the best match found so far are skipped.
+
+        Args:
+            t1: task to match
+            possible_matches: list of tasks
+            start_at_index: skip possible matches before this index
+            tasks_index: TasksMatchIndex of possible_matches (built if not given)
+
         Returns the index of the best match and a dict
             with a state suggestion and list of changed attrs.
         """
-        match_index = None
+        if tasks_index is None:
+            tasks_index = TasksMatchIndex(possible_matches, self.attributes_to_compare)
+
+        name = t1.name or ''
+
+        # first unchanged task wins regardless of tasks before it
+        # and only task with the same name can be unchanged
+        for i in tasks_index.indexes_from(tasks_index.by_name.get(name, []), start_at_index):
+            res = self.eval_tasks(t1, possible_matches[i], i)
+
+            if res['state'] is REPORT_NO_CHANGE:
+                return i, res
+
+        best_index = None
         best_match = {
             'state': REPORT_REMOVED,
             'changes': [],
@@ -297,24 +551,129 @@ class ScheduleDiff(object):
             'score': TASK_SCORE_THRESHOLD
         }
 
-        if start_at_index > 0:
-            possible_matches = possible_matches[start_at_index:]
+        t1_subtree = t1.get_subtree_hash(self.attributes_to_compare)
+        t1_name_chars = Counter(name)
 
-        for i, t2 in enumerate(possible_matches, start_at_index):
-            res = self.eval_tasks(t1, t2, i, name_threshold=best_match['name_score'])
+        name_scores = None
+        if numpy_available and len(possible_matches) - start_at_index >= BATCH_SIMILARITY_MIN_TASKS:
+            name_scores = NameScores(tasks_index, name, start_at_index)
+        position = start_at_index
+        collect = True
 
-            if (res['state'] is REPORT_CHANGED
-                    and res['score'] > best_match['score']):
+        # candidates have to be re-collected only when name score of the best
+        # match drops (renamed task with the same subtree), higher scores just
+        # prune more candidates of the already collected ones
+        while collect:
+            collect = False
 
-                match_index = i
-                best_match = res
+            for i in self._match_candidates(t1, t1_subtree, tasks_index, position, best_match):
+                if not self._may_improve_match(t1, t1_subtree, t1_name_chars, tasks_index, i,
+                                               best_match, name_scores):
+                    continue
 
-            if res['state'] is REPORT_NO_CHANGE:
-                match_index = i
-                best_match = res
-                break
+                res = self.eval_tasks(t1, possible_matches[i], i,
+                                      name_threshold=best_match['name_score'])
+
+                if res['state'] is REPORT_NO_CHANGE:
+                    return i, res
+
+                if (res['state'] is REPORT_CHANGED
+                        and res['score'] > best_match['score']):
+
+                    collect = res['name_score'] < best_match['name_score']
+                    best_index = i
+                    best_match = res
+
+                    if collect:
+                        position = i + 1
+                        break
+
+        return best_index, best_match
+
+    def _min_name_score(self, index, best_match):
+        """
+        Name score a task at index has to exceed to improve best_match
+        (lowered by rounding tolerance)
+        """
+        position_score = self._task_position_score(index)
+        weight_sum = NAME_SIM_WEIGHT + TASK_POS_WEIGHT
+        min_score = ((best_match['score'] * weight_sum - position_score * TASK_POS_WEIGHT)
+                     / NAME_SIM_WEIGHT)
+
+        return max(best_match['name_score'], min_score) - SCORE_BOUND_EPSILON
+
+    def _match_candidates(self, t1, t1_subtree, tasks_index, start_at_index, best_match):
+        """
+        Yields indexes (ascending) of tasks from tasks_index that may
+        improve best_match - same name, same subtree or name length and
+        first character that allow better name similarity.
+        """
+        tasks_count = len(tasks_index.tasks)
+
+        # merging buckets doesn't pay off for few remaining tasks
+        if tasks_count - start_at_index <= len(tasks_index.buckets):
+            yield from range(start_at_index, tasks_count)
+            return
+
+        name = t1.name or ''
+        min_name_score = self._min_name_score(start_at_index, best_match)
+        candidates = [tasks_index.by_name.get(name, [])]
+
+        if t1_subtree:
+            candidates.append(tasks_index.by_subtree_hash.get(t1_subtree, []))
+
+        bounds = {}
+        for (length, first_char), indexes in tasks_index.buckets.items():
+            if indexes[-1] < start_at_index:
+                continue
+
+            prefix_length = 0
+            if name and first_char == name[0]:
+                prefix_length = min(len(name), length, 4)
+
+            if (length, prefix_length) not in bounds:
+                bounds[(length, prefix_length)] = strings_similarity_upper_bound(
+                    len(name), length, prefix_length)
+
+            if bounds[(length, prefix_length)] > min_name_score:
+                candidates.append(indexes)
+
+        last_index = None
+        for i in heapq.merge(*[tasks_index.indexes_from(indexes, start_at_index)
+                               for indexes in candidates]):
+            if i != last_index:
+                last_index = i
+                yield i
+
+    def _may_improve_match(self, t1, t1_subtree, t1_name_chars, tasks_index, index, best_match,
+                           name_scores=None):
+        name = t1.name or ''
+        t2_name = tasks_index.names[index]
+
+        if name == t2_name:
+            return True
+
+        t2_subtree = tasks_index.subtree_hashes[index]
+
+        # renamed task with the same subtree
+        if t1_subtree and t1_subtree == t2_subtree:
+            return self._task_score(0.0, 1.0) > best_match['score']
+
+        min_name_score = self._min_name_score(index, best_match)
+        # name similarity decides - computed the same way as in eval_tasks
+        winkler = bool(t1_subtree and t2_subtree)
+
+        if name_scores is not None:
+            return name_scores.score(index, winkler) > min_name_score
+
+        bound = strings_similarity_upper_bound(
+            len(name), len(t2_name), common_prefix_length(name, t2_name),
+            tasks_index.name_chars_matches(t1_name_chars, index))
+
+        if bound <= min_name_score:
+            return False
 
-        return match_index, best_match
+        return strings_similarity(name, t2_name, winkler=winkler) > min_name_score
 
     def _task_position_score(self, index):
         return 1.0 / (2 * (index + 1))
@@ -392,6 +751,7 @@ class ScheduleDiff(object):
 
         res = []
         last_b_index = 0
+        tasks_b_index = TasksMatchIndex(tasks_b, self.attributes_to_compare)
 
         # shortcut to create a report for an added task
         def report_task_added(index, recursive=True):
@@ -404,7 +764,8 @@ class ScheduleDiff(object):
             return self._create_report(REPORT_ADDED, right=task, subtree=subtree)
 
         for task in tasks_a:
-            match_index, match = self.find_best_match(task, tasks_b, start_at_index=last_b_index)
+            match_index, match = self.find_best_match(task, tasks_b, start_at_index=last_b_index,
+                                                      tasks_index=tasks_b_index)
             report = {}
 
             if match_index is None:
@@ -469,7 +830,7 @@ class ScheduleDiff(object):
     def dump_json(self, **kwargs):
 
         def _encoder(obj):
-            if isinstance(obj, Task):
+            if isinstance(obj, TaskBase):
                 return obj.dump_as_dict()
             return jsondate._datetime_encoder(obj)
 
@@ -518,6 +879,7 @@ def main():
     parser.add_argument('right')
     args = parser.parse_args()
 
+    discovery.use_handlers_index()
     for path in args.handlers_path:
         discovery.search_paths.append(path)
 
@@ -1,9 +1,13 @@
 import importlib
+import importlib.util
+import json
 import logging
 import os
 import re
 import sys
+import tempfile
 
+from . import get_cache_dir
 from .schedule_handlers import ScheduleHandlerBase
 
 
@@ -16,6 +20,12 @@ log = logging.getLogger(__name__)
 re_schedule_handler = re.compile(r'^ScheduleHandler_(\S+)$')
 re_storage_handler = re.compile(r'^StorageHandler_(\S+)$')
 
+# handler class attributes kept along with the class, available without
+# importing handler module when handlers index is used
+CAPABILITY_ATTRS = ('provide_export', 'provide_changelog', 'provide_mtime',
+                    'handle_deps_satisfied', 'default_export_ext')
+HANDLERS_INDEX_VERSION = 1
+
 # FIXME(mpavlase): Figure out nicer way to deal with paths
 sys.path.append(BASE_DIR)
 
@@ -35,6 +45,9 @@ class AutodiscoverHandlers(object):
     def get_handlers(self):
         return self._discovered_handlers
 
+    def reset(self):
+        self._discovered_handlers = dict()
+
     @staticmethod
     def _load_module(name):
         importlib.import_module(name)
@@ -65,26 +78,32 @@ class AutodiscoverHandlers(object):
             key = key[0]
             val = dict()
             val['class'] = obj
-            try:
-                val['provide_export'] = obj.provide_export
-            except AttributeError:
-                # Not all handlers has this attr
-                # TODO(mpavlase): consider this behavior implement in subclass
-                pass
+            for attr in CAPABILITY_ATTRS:
+                try:
+                    val[attr] = getattr(obj, attr)
+                except AttributeError:
+                    # Not all handlers has this attr
+                    # TODO(mpavlase): consider this behavior implement in subclass
+                    pass
 
             ret[key] = val
             log.debug('Discovered new handler: {} from {}'.format(key, module))
         return ret
 
-    def _discover_path(self, filename, parent_module):
+    def _discover_path(self, filename, parent_module, module_path=None):
         # valid Python identifiers only
         if not VALID_MODULE_NAME.match(filename):
             return
 
         name = VALID_MODULE_NAME.sub('\\1', filename)
         name = '.'.join([parent_module, name])
-        loaded_module = self._load_module(name)
-        classes = self._find_classes(loaded_module)
+
+        if handlers_index is not None:
+            classes = handlers_index.get_module_handlers(
+                name, os.path.join(module_path, filename), self)
+        else:
+            loaded_module = self._load_module(name)
+            classes = self._find_classes(loaded_module)
 
         for k in classes.keys():
             if k in self._discovered_handlers.keys():
@@ -97,23 +116,200 @@ class AutodiscoverHandlers(object):
 
         self._discovered_handlers.update(classes)
 
+    @classmethod
+    def _get_module_path(cls, pypath):
+        if handlers_index is None:
+            loaded_module = cls._load_module(pypath)
+            return os.path.dirname(loaded_module.__file__)
+
+        # locate package without importing it
+        spec = importlib.util.find_spec(pypath)
+        if spec is None or not spec.submodule_search_locations:
+            raise ImportError('No package named {}'.format(pypath))
+
+        return list(spec.submodule_search_locations)[0]
+
     def discover(self, pypath):
         try:
-            loaded_module = self._load_module(pypath)
+            module_path = self._get_module_path(pypath)
         except ImportError as e:
             log.warn('Skipping path "{}", couldn\'t load'
                      'it: {} )'.format(pypath, e))
             return self._discovered_handlers
 
-        module_path = os.path.dirname(loaded_module.__file__)
         files = os.listdir(module_path)
 
         for filename in files:
-            self._discover_path(filename, pypath)
+            self._discover_path(filename, pypath, module_path)
+
+        if handlers_index is not None:
+            handlers_index.save()
 
         return self._discovered_handlers
 
 
+class LazyHandler(dict):
+    """
+    Discovered handler taken from handlers index
+
+    Handler module is imported when 'class' is accessed for the first time,
+    capability flags (CAPABILITY_ATTRS) are available right away.
+    """
+    def __init__(self, module_name, class_name, capabilities):
+        super(LazyHandler, self).__init__(capabilities)
+        self.module_name = module_name
+        self.class_name = class_name
+
+    def __missing__(self, key):
+        if key != 'class':
+            raise KeyError(key)
+
+        log.debug('Loading handler {} from {}'.format(
+            self.class_name, self.module_name))
+        module = AutodiscoverHandlers._load_module(self.module_name)
+        self['class'] = getattr(module, self.class_name)
+
+        return self['class']
+
+    def __repr__(self):
+        return '<LazyHandler {}.{}>'.format(self.module_name, self.class_name)
+
+
+class HandlersIndex(object):
+    """
+    On-disk index of discovered handlers
+
+    Keeps handler names, classes (module path and class name) and
+    capability flags of every handler module, so discovery doesn't
+    need to import all handler modules (and their dependencies).
+    Module record is refreshed when mtime or size of the module file
+    changes, whole index is dropped when python environment changes
+    (python version, installed packages).
+    """
+    path = None
+    _index = None
+    _modified = False
+
+    def __init__(self, path=None):
+        self.path = path or get_default_index_path()
+        self._index = self._load()
+
+    @staticmethod
+    def _environment_stamp():
+        # installing/removing packages changes mtime of site directories,
+        # which may change handle_deps_satisfied of handlers
+        site_dirs = [path for path in sys.path
+                     if os.path.basename(path) in ('site-packages', 'dist-packages')
+                     and os.path.isdir(path)]
+
+        return [sys.version, sys.prefix] + [
+            [path, os.stat(path).st_mtime] for path in site_dirs]
+
+    def _empty_index(self):
+        return {
+            'version': HANDLERS_INDEX_VERSION,
+            'environment': self._environment_stamp(),
+            'modules': {},
+        }
+
+    def _load(self):
+        empty_index = self._empty_index()
+
+        try:
+            with open(self.path) as fd:
+                index = json.load(fd)
+        except (IOError, OSError, ValueError) as e:
+            log.debug('Handlers index {} not loaded: {}'.format(self.path, e))
+            self._modified = True
+            return empty_index
+
+        if (not isinstance(index, dict)
+                or index.get('version') != empty_index['version']
+                or index.get('environment') != empty_index['environment']):
+            log.debug('Handlers index {} is outdated'.format(self.path))
+            self._modified = True
+            return empty_index
+
+        return index
+
+    def get_module_handlers(self, module_name, filename, autodiscovery):
+        """
+        Handlers of given module (as AutodiscoverHandlers._find_classes)
+
+        Module is imported only if it's not indexed yet or it has changed.
+
+        Args:
+            module_name: python-dot-notation module name
+            filename: path to the module file
+            autodiscovery: AutodiscoverHandlers instance
+
+        Returns:
+            dict handler name -> LazyHandler
+        """
+        stat = os.stat(filename)
+        pattern = autodiscovery.re_class_teplate.pattern
+
+        record = self._index['modules'].get(module_name)
+        if (not record
+                or record['filename'] != filename
+                or record['mtime'] != stat.st_mtime
+                or record['size'] != stat.st_size):
+            record = {
+                'filename': filename,
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'handlers': {},
+            }
+            self._index['modules'][module_name] = record
+            self._modified = True
+
+        if pattern not in record['handlers']:
+            log.debug('Indexing handlers of {}'.format(module_name))
+            classes = autodiscovery._find_classes(
+                autodiscovery._load_module(module_name))
+            record['handlers'][pattern] = {
+                key: dict(self._capabilities(val),
+                          module=val['class'].__module__,
+                          class_name=val['class'].__name__)
+                for key, val in classes.items()
+            }
+            self._modified = True
+
+        ret = dict()
+        for key, val in record['handlers'][pattern].items():
+            ret[key] = LazyHandler(val['module'], val['class_name'],
+                                   self._capabilities(val))
+
+        return ret
+
+    @staticmethod
+    def _capabilities(handler):
+        return {attr: handler[attr] for attr in CAPABILITY_ATTRS
+                if attr in handler}
+
+    def save(self):
+        if not self._modified:
+            return
+
+        directory = os.path.dirname(self.path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            content = json.dumps(self._index)
+
+            # replace whole file at once, concurrent runs may read it
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                fp.write(content)
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            log.debug('Handlers index {} not saved: {}'.format(self.path, e))
+            return
+
+        self._modified = False
+
+
 class LazyDictDiscovery(dict):
     autodiscovery = None
     _last_search_paths = None
@@ -146,12 +342,16 @@ class LazyDictDiscovery(dict):
         self._last_search_paths = None
         self.run_discovery()
 
+    def reset_discovery(self):
+        self._last_search_paths = None
+
     def run_discovery(self):
         # run only when search_paths has been changed
         if self._last_search_paths == search_paths:
             return
 
         ret = dict()
+        self.autodiscovery.reset()
 
         for pypath in search_paths:
             log.debug('Searching for handlers in: {}'.format(pypath))
@@ -163,7 +363,8 @@ class LazyDictDiscovery(dict):
             self[key] = value
 
         self._post_discovery_hook()
-        self._last_search_paths = search_paths
+        # copy - paths appended later have to trigger new discovery
+        self._last_search_paths = list(search_paths)
 
 
 class ScheduleHandlerDiscovery(LazyDictDiscovery):
@@ -176,11 +377,9 @@ class ScheduleHandlerDiscovery(LazyDictDiscovery):
         return self._provided_exports
 
     def _post_discovery_hook(self):
-        for handler_name, handler in self.items():
-            if handler['provide_export']:
-                self._provided_exports.append(handler_name)
-
-        self._provided_exports = sorted(self._provided_exports)
+        self._provided_exports = sorted(
+            handler_name for handler_name, handler in self.items()
+            if handler['provide_export'])
 
 
 class StorageHandlerDiscovery(LazyDictDiscovery):
@@ -192,3 +391,26 @@ storage_handlers = StorageHandlerDiscovery(cls_template=re_storage_handler)
 
 search_paths = ['schedules_tools.schedule_handlers',
                 'schedules_tools.storage_handlers']
+
+# HandlersIndex instance, handler modules are imported during discovery if None
+handlers_index = None
+
+
+def get_default_index_path():
+    return os.path.join(get_cache_dir(), 'handlers-index.json')
+
+
+def use_handlers_index(path=None):
+    """
+    Discover handlers through on-disk index
+
+    Handler modules are imported only when the handler class is used.
+
+    Args:
+        path: (optional) index file, default is in user cache directory
+    """
+    global handlers_index
+
+    handlers_index = HandlersIndex(path)
+    schedule_handlers.reset_discovery()
+    storage_handlers.reset_discovery()
@@ -27,33 +27,71 @@ https://github.com/rconradharris/jsondate
 
 import datetime
 import json
+import re
 
 DATE_FMT = '%Y-%m-%d'
 ISO8601_FMT = '%Y-%m-%dT%H:%M:%SZ'
 
+# Modified for schedules-tools: dates are decoded only under known keys
+# (dates of schedule, tasks and changelog records) by default, values
+# are matched by precompiled patterns and parsed by fromisoformat instead
+# of trying strptime on every value.
+DATE_KEYS = frozenset(['dStart', 'dFinish', 'mtime', 'date'])
+
+_datetime_re = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z', re.ASCII)
+_date_re = re.compile(r'\d{4}-\d{2}-\d{2}', re.ASCII)
+
 
 def _datetime_encoder(obj):
     if isinstance(obj, datetime.datetime):
-        return obj.strftime(ISO8601_FMT)
+        # same as strftime(ISO8601_FMT) - tzinfo and microseconds ignored,
+        # years < 1000 are zero-padded
+        return obj.isoformat(timespec='seconds')[:19] + 'Z'
     elif isinstance(obj, datetime.date):
-        return obj.strftime(DATE_FMT)
+        return obj.isoformat()
 
     raise TypeError
 
 
-def _datetime_decoder(dict_):
-    for key, value in dict_.items():
-        try:
-            datetime_obj = datetime.datetime.strptime(value, ISO8601_FMT)
-            dict_[key] = datetime_obj
-        except (ValueError, TypeError):
-            try:
-                date_obj = datetime.datetime.strptime(value, DATE_FMT)
-                dict_[key] = date_obj.date()
-            except (ValueError, TypeError):
-                continue
+def _parse_date(value):
+    """
+    Returns:
+        datetime for ISO8601_FMT, date for DATE_FMT string,
+        None for anything else
+    """
+    if not isinstance(value, str):
+        return None
+
+    try:
+        if len(value) == 20 and _datetime_re.fullmatch(value):
+            return datetime.datetime.fromisoformat(value[:19])
+        elif len(value) == 10 and _date_re.fullmatch(value):
+            return datetime.date.fromisoformat(value)
+    except ValueError:
+        # matches the pattern, but isn't valid date (e.g. month 13)
+        pass
+
+    return None
+
 
-    return dict_
+def _make_datetime_decoder(date_keys):
+    if date_keys is not None:
+        date_keys = frozenset(date_keys)
+
+    def decoder(dict_):
+        for key in date_keys.intersection(dict_) if date_keys else list(dict_):
+            date_obj = _parse_date(dict_[key])
+            if date_obj is not None:
+                dict_[key] = date_obj
+
+        return dict_
+
+    return decoder
+
+
+def _datetime_decoder(dict_):
+    """Decode dates in all values of dict_"""
+    return _make_datetime_decoder(None)(dict_)
 
 
 def dumps(*args, **kwargs):
@@ -66,11 +104,19 @@ def dump(*args, **kwargs):
     return json.dump(*args, **kwargs)
 
 
-def loads(*args, **kwargs):
-    kwargs['object_hook'] = _datetime_decoder
+def loads(*args, date_keys=DATE_KEYS, **kwargs):
+    """
+    Args:
+        date_keys: keys with date values to decode, all keys if None
+    """
+    kwargs['object_hook'] = _make_datetime_decoder(date_keys)
     return json.loads(*args, **kwargs)
 
 
-def load(*args, **kwargs):
-    kwargs['object_hook'] = _datetime_decoder
+def load(*args, date_keys=DATE_KEYS, **kwargs):
+    """
+    Args:
+        date_keys: keys with date values to decode, all keys if None
+    """
+    kwargs['object_hook'] = _make_datetime_decoder(date_keys)
     return json.load(*args, **kwargs)
@@ -1,5 +1,6 @@
 import pprint
 import datetime
+import hashlib
 import re
 import logging
 
@@ -18,47 +19,42 @@ ATTR_PREFIX_FLAG = 'Flags'
 ATTR_PREFIX_LINK = 'Link'
 ATTR_PREFIX_NOTE = 'Note'
 
+IT_PHASE_NAMES = {
+    'Concept': 'Concept Phase',
+    'Planning': 'Planning Phase',
+    'Develop': 'Development Phase',
+    'Test': 'Testing Phase',
+    'Launch': 'Launch Phase',
+    'Maintenance': 'Maintenance Phase',
+}
+IT_PHASE_FULLNAMES = frozenset(IT_PHASE_NAMES.values())
+IT_PHASE_LEVELS = (1, 2)
+
 TASK_SLUG_NUMERATION_LIMIT = 9999
 TASK_SLUG_CHAR_LIMIT = 255
 TASK_SLUG_TRUNCATION_LIMIT = TASK_SLUG_CHAR_LIMIT - (1 + len(str(TASK_SLUG_NUMERATION_LIMIT)))
 
+SUBTREE_HASH_DIGEST_SIZE = 16
 
-class Task(object):
-    index = ''
-    slug = ''
-    name = ''
-    note = ''
-    priority = 500
-    dStart = datetime.datetime.max
-    dFinish = datetime.datetime.min
-    duration = None
-    milestone = False
-    p_complete = 0.0
-    flags = []
-    level = 1
-    link = ''
 
-    tasks = []
+def _hash_update(hasher, value):
+    # length prefix keeps boundaries between values
+    value = value.encode('utf-8', 'surrogatepass')
+    hasher.update(len(value).to_bytes(8, 'little'))
+    hasher.update(value)
 
-    resource = None
 
-    _date_format = '%Y-%m-%dT%H:%M:%S'
-    _rx = None
-    _schedule = None
+class TaskBase(object):
+    """
+    Behaviour shared by task representations (Task, CompactTask)
+    """
+    __slots__ = ()
 
-    def __init__(self, schedule=None, level=1):
-        self.tasks = []
-        self.flags = []
-        self._schedule = schedule
-        self.p_complete = 0.0
-        self.priority = 500
-        self.milestone = False
-        self.level = level
-        self._subtree_hash_cache = {}
+    _date_format = '%Y-%m-%dT%H:%M:%S'
 
     def __str__(self):
         return f'{self.slug} {self.name} MS:{self.milestone}  ({self.dStart} - {self.dFinish})  ' \
-               f'F{self.flags}  [{len(self.tasks)}]'
+               f'F{list(self.flags)}  [{len(self.tasks)}]'
 
     def parse_extended_attr(self, value, key=None):
         """
@@ -90,11 +86,12 @@ class Task(object):
 
         if key.lower() == ATTR_PREFIX_FLAG.lower():
             val = str(val).lower()
-            flags = re_flags_separator.split(val)
-            for flag in flags:
+            flags = list(self.flags)
+            for flag in re_flags_separator.split(val):
                 flag = str(flag.strip())
                 if flag:
-                    self.flags.append(flag)
+                    flags.append(flag)
+            self.flags = flags
             self._schedule.used_flags |= set(self.flags)
 
         elif key.lower() == ATTR_PREFIX_LINK.lower():
@@ -108,33 +105,22 @@ class Task(object):
             log.info(f'Extended attr "{key}" wasn\'t recognized.')
 
     @staticmethod
-    def _workaround_it_phase_names(eTask):
-        """Corrects phase names"""
-        name_map = {'Concept': 'Concept Phase',
-                    'Planning': 'Planning Phase',
-                    'Develop': 'Development Phase',
-                    'Test': 'Testing Phase',
-                    'Launch': 'Launch Phase',
-                    'Maintenance': 'Maintenance Phase',
-                    }
-
-        eName_list = eTask.xpath('Name')
-        if eName_list:
-            name = eName_list[0].text
-            if name:
-                name = name.strip()
-
-            level = int(eTask.xpath('OutlineLevel')[0].text)
-
-            if level in [1, 2] and name in name_map.keys():
-                # check that there is no full named task else in the schedule
-                root = eTask.getroottree()
-                eFullnamed_task_list = root.xpath('//Task[Name = "%s"]' % name_map[name])
-
-                if not eFullnamed_task_list:  # if not - map the name
-                    return name_map[name]
-            return name
-        return ''
+    def _workaround_it_phase_names(name, level, fullnamed_tasks):
+        """
+        Corrects phase names
+
+        Args:
+            name: task name
+            level: task level
+            fullnamed_tasks: names of all tasks in the schedule
+                (at least those from IT_PHASE_FULLNAMES)
+        """
+        if level in IT_PHASE_LEVELS and name in IT_PHASE_NAMES:
+            # check that there is no full named task else in the schedule
+            if IT_PHASE_NAMES[name] not in fullnamed_tasks:
+                return IT_PHASE_NAMES[name]
+
+        return name
 
     @property
     def desc_tasks_count(self):
@@ -151,8 +137,12 @@ class Task(object):
         else:
             return 'Task'
 
+    def _get_attrs(self):
+        """Return dict of attributes set on the task instance"""
+        raise NotImplementedError
+
     def dump_as_dict(self, recursive=True):
-        attrs = copy(vars(self))
+        attrs = self._get_attrs()
         # avoid infinite looping schedule > task > schedule ...
         exclude = ['_schedule', '_subtree_hash_cache']
 
@@ -172,39 +162,52 @@ class Task(object):
         task = cls(schedule)
 
         for key, val in input_dict.items():
-            task.__setattr__(key, val)
+            try:
+                task.__setattr__(key, val)
+            except AttributeError:
+                log.debug(f'Attribute "{key}" not supported by {cls.__name__}, skipping.')
 
         task.tasks = []
         for new_task in input_dict.get('tasks', []):
-            task.tasks.append(Task.load_from_dict(new_task, schedule))
+            task.tasks.append(cls.load_from_dict(new_task, schedule))
 
         return task
 
     def get_subtree_hash(self, fields):
+        """
+        Digest of subtasks (their fields and subtrees), empty string for task without subtasks
+
+        Digests are combined bottom-up from child digests, so each task is hashed
+        once and the digest has fixed size regardless of subtree size.
+
+        Args:
+            fields: task attributes to include
+
+        Returns:
+            hex digest string
+        """
         if not isinstance(fields, tuple):
             fields = tuple(fields)
 
+        if self._subtree_hash_cache is None:
+            self._subtree_hash_cache = {}
+
         if fields not in self._subtree_hash_cache:
             if self.tasks:
-                hashes = []
+                hasher = hashlib.blake2b(digest_size=SUBTREE_HASH_DIGEST_SIZE)
+
                 for child_task in self.tasks:
-                    task_hash_values = []
                     for attr_name in fields:
                         attr_value = getattr(child_task, attr_name)
 
-                        if isinstance(attr_value, list):
+                        if isinstance(attr_value, (list, tuple)):
                             attr_value = sorted(attr_value)
 
-                        task_hash_values.append(str(attr_value))
+                        _hash_update(hasher, str(attr_value))
 
-                    hashes.append(
-                        '%s%s' % (
-                            ''.join(task_hash_values),
-                            child_task.get_subtree_hash(fields)
-                        )
-                    )
+                    _hash_update(hasher, child_task.get_subtree_hash(fields))
 
-                subtree_hash = ''.join(hashes)
+                subtree_hash = hasher.hexdigest()
 
             else:
                 subtree_hash = ''
@@ -225,7 +228,151 @@ class Task(object):
         return slug_key
 
 
+class Task(TaskBase):
+    index = ''
+    slug = ''
+    name = ''
+    note = ''
+    priority = 500
+    dStart = datetime.datetime.max
+    dFinish = datetime.datetime.min
+    duration = None
+    milestone = False
+    p_complete = 0.0
+    flags = []
+    level = 1
+    link = ''
+
+    tasks = []
+
+    resource = None
+
+    _rx = None
+    _schedule = None
+    _subtree_hash_cache = None
+
+    def __init__(self, schedule=None, level=1):
+        self.tasks = []
+        self.flags = []
+        self._schedule = schedule
+        self.p_complete = 0.0
+        self.priority = 500
+        self.milestone = False
+        self.level = level
+        self._subtree_hash_cache = {}
+
+    def _get_attrs(self):
+        return copy(vars(self))
+
+
+# Defaults of CompactTask attributes - same as Task class attributes
+COMPACT_TASK_DEFAULTS = {
+    'index': '',
+    'slug': '',
+    'name': '',
+    'note': '',
+    'priority': 500,
+    'dStart': datetime.datetime.max,
+    'dFinish': datetime.datetime.min,
+    'duration': None,
+    'milestone': False,
+    'p_complete': 0.0,
+    'level': 1,
+    'link': '',
+    'resource': None,
+    '_subtree_hash_cache': None,
+}
+
+# distinct flags combinations kept by intern_flags, cache starts over when full
+INTERNED_FLAGS_MAX = 4096
+_interned_flags = {}
+
+
+def intern_flags(flags):
+    """Return tuple of flags shared by all tasks with the same flags"""
+    flags = tuple(flags)
+    try:
+        return _interned_flags[flags]
+    except KeyError:
+        # bound memory of long running processes converting many schedules
+        if len(_interned_flags) >= INTERNED_FLAGS_MAX:
+            _interned_flags.clear()
+        return _interned_flags.setdefault(flags, flags)
+
+
+class CompactTask(TaskBase):
+    """
+    Memory efficient alternative to Task for large schedules (opt-in)
+
+    Attributes are kept in __slots__ instead of per-instance __dict__,
+    flags are interned tuples and subtree hash cache is created on first use.
+    Attributes unknown to Task can't be set.
+    """
+    __slots__ = tuple(COMPACT_TASK_DEFAULTS) + ('tasks', '_flags', '_schedule')
+
+    def __init__(self, schedule=None, level=1):
+        self.tasks = []
+        self._flags = ()
+        self._schedule = schedule
+        self.p_complete = 0.0
+        self.priority = 500
+        self.milestone = False
+        self.level = level
+
+    def __getattr__(self, name):
+        # called only for slots that haven't been set yet
+        try:
+            return COMPACT_TASK_DEFAULTS[name]
+        except KeyError:
+            raise AttributeError(
+                f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+    @property
+    def flags(self):
+        return self._flags
+
+    @flags.setter
+    def flags(self, value):
+        self._flags = intern_flags(value)
+
+    def _get_attrs(self):
+        attrs = {}
+        for name in self.__slots__:
+            try:
+                attrs[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                # not set - default value is used
+                continue
+
+        attrs['flags'] = list(attrs.pop('_flags'))
+        return attrs
+
+    def __getstate__(self):
+        # unset slots keep falling back to defaults after unpickling
+        state = self._get_attrs()
+        state.pop('_subtree_hash_cache', None)
+        return state
+
+    def __setstate__(self, state):
+        for key, val in state.items():
+            setattr(self, key, val)
+
+    @classmethod
+    def from_task(cls, task):
+        """Create compact copy of the task (including subtasks)"""
+        compact_task = cls(task._schedule, level=task.level)
+
+        for key, val in task._get_attrs().items():
+            if key not in ('tasks', '_schedule', '_subtree_hash_cache'):
+                setattr(compact_task, key, val)
+
+        compact_task.tasks = [cls.from_task(subtask) for subtask in task.tasks]
+        return compact_task
+
+
 class Schedule(object):
+    task_cls = Task
+
     slug = ''
     name = ''  # Product 1.2
     tasks = []
@@ -270,6 +417,15 @@ class Schedule(object):
         add_tasks_to_list(self.tasks, flat_tasks)
         self.tasks = flat_tasks
 
+    def materialize(self):
+        '''Schedule with tasks that can be modified - self for regular schedule'''
+        return self
+
+    def make_compact(self):
+        '''Convert tasks to CompactTask to lower memory usage'''
+        self.task_cls = CompactTask
+        self.tasks = [CompactTask.from_task(task) for task in self.tasks]
+
     def filter_milestones(self):
         '''Keep only tasks that are milestones or contain children that are'''
         def filter_tasks(tasks):
@@ -349,7 +505,7 @@ class Schedule(object):
             return
 
         # need one top task
-        top_task = Task(self)
+        top_task = self.task_cls(self)
         top_task.index = 1
         # top_task.name = '%s %s' % (self.name, self.version)
         # removed version as per BZ#1396303 - see how that works
@@ -414,8 +570,13 @@ class Schedule(object):
         diff = {}
 
         for a in attrs:
-            left_val = left.__getattribute__(a)
-            right_val = right.__getattribute__(a)
+            left_val = getattr(left, a)
+            right_val = getattr(right, a)
+            # CompactTask keeps flags as tuple
+            if isinstance(left_val, tuple):
+                left_val = list(left_val)
+            if isinstance(right_val, tuple):
+                right_val = list(right_val)
             if left_val != right_val:
                 try:
                     if whole_days and \
@@ -533,6 +694,7 @@ class Schedule(object):
 
     def dump_as_dict(self):
         schedule = copy(vars(self))
+        schedule.pop('task_cls', None)
 
         schedule['tasks'] = []
         for task in self.tasks:
@@ -543,15 +705,18 @@ class Schedule(object):
         return schedule
 
     @classmethod
-    def load_from_dict(cls, input_dict):
+    def load_from_dict(cls, input_dict, compact=False):
         # This will preserve reference to original class attributes
         schedule = cls()
         for key, val in input_dict.items():
             schedule.__setattr__(key, val)
 
+        if compact:
+            schedule.task_cls = CompactTask
+
         schedule.tasks = []
         for task in input_dict['tasks']:
-            schedule.tasks.append(Task.load_from_dict(task, schedule))
+            schedule.tasks.append(schedule.task_cls.load_from_dict(task, schedule))
 
         schedule.used_flags = set(input_dict['used_flags'])
 
@@ -1,5 +1,6 @@
 from datetime import datetime
 import logging
+import os
 
 import pytz
 
@@ -27,12 +28,26 @@ class ScheduleHandlerBase(object):
 
     default_export_ext = None
 
+    # Export only reads the schedule, so it can run concurrently with other
+    # exports of the same schedule (ScheduleConverter.export_schedules)
+    concurrent_export = False
+
+    # Export just writes the output file, so it can be served from
+    # conversion cache. Bump cache_version when import/export result changes.
+    export_cacheable = False
+    cache_version = 1
+
     # Handlers can depend on additional python modules. We don't require from
     # users to have all of them installed if they aren't used.
     # This flag indicates that the handler can be fully utilized and there is
     # no missing dependent packages installed.
     handle_deps_satisfied = False
 
+    # Source parsed by is_valid_source, kept for import_schedule to not parse
+    # it again - (handler class, handle, mtime, size) -> parsed source.
+    # Holds just the last parsed source.
+    _parsed_sources = {}
+
     def __init__(self, handle=None, schedule=None, options=dict()):
         self.schedule = schedule
         self.options = options
@@ -90,6 +105,49 @@ class ScheduleHandlerBase(object):
         given handle"""
         return False
 
+    @classmethod
+    def sniff_source(cls, handle, head):
+        """
+        Cheap check of handle based on the beginning of its content
+
+        Args:
+            handle: local file
+            head: bytes from the beginning of the file
+
+        Returns:
+            True/False if the handler is (not) able to work with the handle,
+            None if it can't be told from head - is_valid_source decides then
+        """
+        return None
+
+    @classmethod
+    def _parsed_source_key(cls, handle):
+        try:
+            stat = os.stat(handle)
+        except (OSError, TypeError, ValueError):
+            return None
+
+        return cls, handle, stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def cache_parsed_source(cls, handle, parsed):
+        key = cls._parsed_source_key(handle)
+        ScheduleHandlerBase._parsed_sources.clear()
+
+        if key:
+            ScheduleHandlerBase._parsed_sources[key] = parsed
+
+    @classmethod
+    def pop_parsed_source(cls, handle):
+        """Source parsed by is_valid_source if the handle hasn't changed since"""
+        key = cls._parsed_source_key(handle)
+
+        return ScheduleHandlerBase._parsed_sources.pop(key, None)
+
+    @staticmethod
+    def clear_parsed_sources():
+        ScheduleHandlerBase._parsed_sources.clear()
+
     def extract_backup(self, handle=None):
         """Prepare files which need a backup in case of external source"""
         return []
@@ -11,6 +11,8 @@ class ScheduleHandler_confluencehtml(ScheduleHandlerBase):
     provide_export = True
 
     handle_deps_satisfied = True
+    concurrent_export = True
+    export_cacheable = True
 
     default_export_ext = 'html'
 
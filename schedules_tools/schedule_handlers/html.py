@@ -46,6 +46,8 @@ class ScheduleHandler_html(ScheduleHandlerBase):
     provide_export = True
 
     handle_deps_satisfied = True
+    concurrent_export = True
+    export_cacheable = True
 
     default_export_ext = 'html'
 
@@ -17,6 +17,8 @@ class ScheduleHandler_ics(ScheduleHandlerBase):
 
     default_export_ext = 'ics'
     handle_deps_satisfied = additional_deps_satistifed
+    concurrent_export = True
+    export_cacheable = True
 
     _datetime_format = '%Y%m%dT%H%M%SZ'
     _now = None
@@ -1,18 +1,117 @@
 import datetime
+import io
 import json
 import logging
 import os
 
+from schedules_tools import SchedulesToolsException
 from schedules_tools.schedule_handlers import ScheduleHandlerBase
 from schedules_tools.models import Schedule, Task
 
 log = logging.getLogger(__name__)
 
+# optional faster JSON libraries
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# tasks are written one by one, file is flushed in chunks of this size
+WRITE_BUFFER_SIZE = 2 ** 20
+
+
+class JSONBackendNotAvailable(SchedulesToolsException):
+    pass
+
+
+class JSONImportException(SchedulesToolsException):
+    pass
+
+
+class JSONBackend(object):
+    """
+    JSON library used by the handler
+
+    dumps produces compact output with sorted keys, non-ASCII characters
+    aren't escaped - it's the same for all backends.
+    """
+    name = 'json'
+
+    @staticmethod
+    def loads(content):
+        return json.loads(content)
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj, sort_keys=True, separators=(',', ':'),
+                          ensure_ascii=False)
+
+
+class OrjsonBackend(JSONBackend):
+    name = 'orjson'
+
+    @staticmethod
+    def loads(content):
+        return orjson.loads(content)
+
+    @staticmethod
+    def dumps(obj):
+        return orjson.dumps(
+            obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+
+class UjsonBackend(JSONBackend):
+    name = 'ujson'
+
+    @staticmethod
+    def loads(content):
+        return ujson.loads(content)
+
+    @staticmethod
+    def dumps(obj):
+        return ujson.dumps(obj, sort_keys=True, ensure_ascii=False,
+                           escape_forward_slashes=False)
+
+
+# available backends in order of preference
+JSON_BACKENDS = dict(
+    (backend.name, backend) for backend, available in (
+        (OrjsonBackend, orjson is not None),
+        (UjsonBackend, ujson is not None),
+        (JSONBackend, True)) if available)
+
+
+def get_json_backend(name=None):
+    """
+    Args:
+        name: backend name, the fastest available if None or 'auto'
+
+    Returns:
+        JSONBackend class
+    """
+    if not name or name == 'auto':
+        return next(iter(JSON_BACKENDS.values()))
+
+    try:
+        return JSON_BACKENDS[name]
+    except KeyError:
+        raise JSONBackendNotAvailable(
+            'JSON backend {} is not available (available: {}).'.format(
+                name, ', '.join(JSON_BACKENDS)))
+
 
 class ScheduleHandler_json(ScheduleHandlerBase):
     provide_export = True
 
     handle_deps_satisfied = True
+    concurrent_export = True
+    export_cacheable = True
 
     default_export_ext = 'json'
 
@@ -27,21 +126,57 @@ class ScheduleHandler_json(ScheduleHandlerBase):
         if file_ext != '.json':
             return False
         try:
-            with open(handle) as fd:
-                json.load(fd)
+            with open(handle, 'rb') as fd:
+                jsonobj = get_json_backend().loads(fd.read())
         except ValueError:
             return False
 
+        cls.cache_parsed_source(handle, jsonobj)
         return True
 
-    @staticmethod
-    def _parse_timestamp(timestamp):
-        number = int(timestamp)
-        return datetime.datetime.fromtimestamp(number)
+    @classmethod
+    def sniff_source(cls, handle, head):
+        if os.path.splitext(handle)[1] != '.json':
+            return False
+
+        return head.lstrip()[:1] == b'{'
+
+    def __init__(self, *args, **kwargs):
+        super(ScheduleHandler_json, self).__init__(*args, **kwargs)
+
+        # dates repeat across tasks - each one is converted just once
+        self._parsed_timestamps = {}
+        self._formatted_timestamps = {}
+
+    def _parse_timestamp(self, timestamp):
+        date = self._parsed_timestamps.get(timestamp)
+        if date is None:
+            date = datetime.datetime.fromtimestamp(int(timestamp))
+            self._parsed_timestamps[timestamp] = date
+
+        return date
+
+    def _format_timestamp(self, date):
+        if date.tzinfo is not None:
+            # aware dates with different tzinfo can be equal
+            return date.strftime('%s')
+
+        timestamp = self._formatted_timestamps.get(date)
+        if timestamp is None:
+            timestamp = self._formatted_timestamps[date] = date.strftime('%s')
+
+        return timestamp
 
     def import_schedule(self):
-        with open(self.handle) as fd:
-            jsonobj = json.load(fd)
+        jsonobj = self.pop_parsed_source(self.handle)
+        if jsonobj is None:
+            backend = get_json_backend(self.options.get('json_backend'))
+            with open(self.handle, 'rb') as fd:
+                try:
+                    jsonobj = backend.loads(fd.read())
+                except ValueError as e:
+                    # sniffing doesn't parse the source
+                    raise JSONImportException(e, source=self.handle)
 
         schedule = Schedule()
         schedule.dStart = self._parse_timestamp(jsonobj['start'])
@@ -112,26 +247,89 @@ class ScheduleHandler_json(ScheduleHandlerBase):
 
         return task
 
-    def export_schedule(self, out_file):
-        json_schedule = self.export_schedule_as_dict()
-        content = json.dumps(json_schedule,
-                             sort_keys=True,
-                             indent=4,
-                             separators=(',', ': '))
-
-        self._write_to_file(content, out_file)
-
-        return content
-
-    def export_schedule_as_dict(self):
+    def export_schedule(self, out_file=None):
+        """
+        Write schedule to out_file task by task - whole document isn't
+        kept in memory. Output is indented (compatible with previous
+        versions), compact with option json_compact.
+
+        Args:
+            out_file: (optional) file to write content to
+
+        Returns:
+            str, exported content if out_file isn't given, None otherwise
+        """
+        if self.options.get('json_compact'):
+            # backend dumps is compact
+            encode = get_json_backend(self.options.get('json_backend')).dumps
+            newline = ''
+        else:
+            encode = json.JSONEncoder(sort_keys=True, indent=4,
+                                      separators=(',', ': ')).encode
+            newline = '\n'
+
+        schedule_dict = self.export_schedule_as_dict(tasks=False)
+        if not self.schedule.tasks:
+            schedule_dict['tasks'] = []
+
+        if not out_file:
+            buffer = io.StringIO()
+            self._write_object(buffer.write, encode, newline, schedule_dict,
+                               'tasks', self.schedule.tasks, 0, '')
+            return buffer.getvalue()
+
+        with open(out_file, 'w', encoding='utf-8',
+                  buffering=WRITE_BUFFER_SIZE) as fd:
+            self._write_object(fd.write, encode, newline, schedule_dict,
+                               'tasks', self.schedule.tasks, 0, '')
+
+    def _write_object(self, write, encode, newline, obj, tasks_key, tasks,
+                      depth, slug):
+        """
+        Write encoded obj with tasks (as list under tasks_key) in place
+        where encoder would put it - keys are sorted
+        """
+        indent = newline + (' ' * 4 * depth if newline else '')
+
+        if not tasks:
+            write(encode(obj).replace('\n', indent))
+            return
+
+        head = {key: val for key, val in obj.items() if key < tasks_key}
+        tail = {key: val for key, val in obj.items() if key > tasks_key}
+        item_indent = indent + ('    ' if newline else '')
+        separator = ': ' if newline else ':'
+
+        # strip braces (and newline before closing one) of encoded dicts
+        write('{')
+        if head:
+            write(encode(head)[1:-1 - len(newline)].replace('\n', indent))
+            write(',')
+        write(item_indent + encode(tasks_key) + separator + '[')
+
+        for i, task in enumerate(tasks):
+            if i:
+                write(',')
+            write(item_indent + ('    ' if newline else ''))
+            self._write_object(write, encode, newline,
+                               self.export_task_as_dict(task, slug, subtasks=False),
+                               'tasks', task.tasks, depth + 2, task.slug)
+
+        write(item_indent + ']')
+        if tail:
+            write(',')
+            write(encode(tail)[1:-1 - len(newline)].replace('\n', indent))
+        write(indent + '}')
+
+    def export_schedule_as_dict(self, tasks=True):
         schedule_dict = dict()
         schedule_dict['slug'] = self.schedule.slug
         schedule_dict['name'] = self.schedule.name
-        schedule_dict['start'] = self.schedule.dStart.strftime('%s')
-        schedule_dict['end'] = self.schedule.dFinish.strftime('%s')
+        schedule_dict['start'] = self._format_timestamp(self.schedule.dStart)
+        schedule_dict['end'] = self._format_timestamp(self.schedule.dFinish)
 
         if self.schedule.mtime:
-            schedule_dict['mtime'] = self.schedule.mtime.strftime('%s')
+            schedule_dict['mtime'] = self._format_timestamp(self.schedule.mtime)
 
         schedule_dict['resources'] = self.schedule.resources
         schedule_dict['used_flags'] = sorted(list(self.schedule.used_flags))
@@ -141,19 +339,20 @@ class ScheduleHandler_json(ScheduleHandlerBase):
         # We intentionally don't export id_reg attribute here - it's collected
         # during import
 
-        schedule_dict['changelog'] = self.schedule.changelog
-        for log in self.schedule.changelog.values():
-            log['date'] = datetime.datetime.strftime(log['date'], '%Y-%m-%d')
-
-        schedule_dict['tasks'] = []
-        self.schedule.task_id_reg = set()
+        # don't modify schedule changelog, schedule can be exported further
+        schedule_dict['changelog'] = {
+            rev: dict(record, date=datetime.datetime.strftime(record['date'],
+                                                              '%Y-%m-%d'))
+            for rev, record in self.schedule.changelog.items()
+        }
 
-        for task in self.schedule.tasks:
-            schedule_dict['tasks'].append(self.export_task_as_dict(task))
+        if tasks:
+            schedule_dict['tasks'] = [self.export_task_as_dict(task)
+                                      for task in self.schedule.tasks]
 
         return schedule_dict
 
-    def export_task_as_dict(self, task, parent_slug=''):
+    def export_task_as_dict(self, task, parent_slug='', subtasks=True):
         task_export = {}
 
         task_export['slug'] = task.slug
@@ -172,10 +371,10 @@ class ScheduleHandler_json(ScheduleHandlerBase):
 
         task_export['parentTask'] = parent_slug
 
-        task_export['start'] = task.dStart.strftime('%s')
-        task_export['end'] = task.dFinish.strftime('%s')
+        task_export['start'] = self._format_timestamp(task.dStart)
+        task_export['end'] = self._format_timestamp(task.dFinish)
 
-        if task.tasks:  # task has subtasks
+        if subtasks and task.tasks:
             # prepare tasklist
             task_export['tasks'] = []
 
@@ -1,5 +1,3 @@
-import os
-import tempfile
 import logging
 
 from datetime import datetime
@@ -10,7 +8,39 @@ from schedules_tools import models, SchedulesToolsException
 from schedules_tools.schedule_handlers import ScheduleHandlerBase
 
 
+MSP_NAMESPACE = 'http://schemas.microsoft.com/project'
 MSP_FLAGS_ATTRS = ('Flags', )
+# elements picked up during import - with and without MSP namespace
+MSP_IMPORT_ELEMENTS = ('Name', 'Title', 'ExtendedAttribute', 'Task')
+# items of Project sections dropped as soon as they end
+MSP_STREAMED_ELEMENTS = ('Task', 'Calendar', 'Resource', 'Assignment')
+# Project sections dropped as soon as they end, unlisted ones are dropped
+# together with the following section
+MSP_SECTIONS = ('Calendars', 'Resources', 'Assignments', 'Tasks',
+                'ExtendedAttributes', 'OutlineCodes', 'WBSMasks')
+_MSP_PARSED_ELEMENTS = list(dict.fromkeys(
+    MSP_IMPORT_ELEMENTS + MSP_STREAMED_ELEMENTS + MSP_SECTIONS))
+MSP_IMPORT_TAGS = (['{%s}%s' % (MSP_NAMESPACE, tag) for tag in _MSP_PARSED_ELEMENTS]
+                   + _MSP_PARSED_ELEMENTS)
+
+# Task child elements loaded during import - mapping of tag to field name
+MSP_TASK_FIELDS = ('ID', 'Name', 'OutlineLevel', 'Priority', 'Start',
+                   'Finish', 'ActualStart', 'ActualFinish', 'Milestone',
+                   'PercentComplete', 'Notes', 'ExtendedAttribute')
+MSP_EXT_ATTR_FIELDS = ('FieldID', 'Value')
+
+
+def _tags_to_fields(fields):
+    tags = {}
+    for field in fields:
+        tags['{%s}%s' % (MSP_NAMESPACE, field)] = field
+        tags[field] = field
+    return tags
+
+
+MSP_TASK_TAGS = _tags_to_fields(MSP_TASK_FIELDS)
+MSP_EXT_ATTR_TAGS = _tags_to_fields(MSP_EXT_ATTR_FIELDS)
+
 datetime_format = '%Y-%m-%dT%H:%M:%S'
 
 log = logging.getLogger(__name__)
@@ -24,6 +54,7 @@ class ScheduleHandler_msp(ScheduleHandlerBase):
     provide_export = True
 
     handle_deps_satisfied = True
+    export_cacheable = True
 
     default_export_ext = 'xml'
 
@@ -34,61 +65,126 @@ class ScheduleHandler_msp(ScheduleHandlerBase):
     def is_valid_source(cls, handle=None):
         if not handle:
             handle = cls.handle
+        # root element is enough, file is parsed during import
         try:
-            tree = etree.parse(handle)
+            for _, element in etree.iterparse(handle, events=('start', )):
+                return MSP_NAMESPACE in element.tag
         except (etree.XMLSyntaxError, IOError):
             return False
 
-        if 'http://schemas.microsoft.com/project' in tree.getroot().tag:
-            return True
         return False
 
+    @classmethod
+    def sniff_source(cls, handle, head):
+        parser = etree.XMLPullParser(events=('start', ))
+        try:
+            parser.feed(head)
+            for _, element in parser.read_events():
+                return MSP_NAMESPACE in element.tag
+        except etree.XMLSyntaxError:
+            return False
+
+        # root element doesn't fit into head
+        return None
+
     # Schedule
     def import_schedule(self):
         self.schedule = models.Schedule()
+        self._phase_tasks = []
+        self._phase_fullnames = set()
 
-        try:
-            # remove project's xmlns
-            tmp_file = tempfile.mkstemp()[1]
-            with open(tmp_file, 'wt') as hTmp_file:
-                with open(self.handle) as handle_file:
-                    for line in handle_file:
-                        hTmp_file.write(
-                            line.replace(
-                                ' xmlns="http://schemas.microsoft.com/project"',
-                                ''))
-
-            start_level = 1
-            tree = etree.parse(tmp_file)
-
-            eTask_list = tree.xpath('Tasks/Task[OutlineLevel >= %s]' %
-                                    start_level)
-            self.schedule.name = tree.xpath('Name|Title')[0].text.strip()
-            self.schedule.slug = self.schedule.unique_id_re.sub(
-                '_', self.schedule.name)
-
-            # extended attributes
-            for eExtAttr in tree.xpath('ExtendedAttributes/ExtendedAttribute'):
-                fieldID = int(eExtAttr.xpath('FieldID')[0].text)
-                fieldName = eExtAttr.xpath('FieldName')[0].text
-                self.schedule.ext_attr[fieldName] = fieldID
-
-            if self.schedule.ext_attr:  # choose flags field
-                for ff_name in MSP_FLAGS_ATTRS:
-                    if ff_name in self.schedule.ext_attr:
-                        self.schedule.flags_attr_id = self.schedule.ext_attr[
-                                                                    ff_name]
-                        break
+        start_level = 1
 
+        try:
             self.schedule.tasks = self._load_tasks_level(
-                start_level, eTask_list)
-
-            os.unlink(tmp_file)
-            self.schedule.generate_slugs()
-            return self.schedule
+                start_level, self._iterparse_tasks(start_level))
         except etree.XMLSyntaxError as e:
             raise MSPImportException(e, source=self.handle)
 
+        if self.schedule.name is None:
+            raise MSPImportException('Project name not found',
+                                     source=self.handle)
+
+        self.schedule.slug = self.schedule.unique_id_re.sub(
+            '_', self.schedule.name)
+
+        self._fix_phase_names()
+
+        self.schedule.generate_slugs()
+        return self.schedule
+
+    def _iterparse_tasks(self, start_level):
+        """
+        Stream the project file and yield (outline level, task) tuples.
+
+        Task is None when the element doesn't contain importable task.
+        Processed tasks, calendars, resources, assignments and whole
+        Project sections are dropped from the tree right away, so the memory
+        footprint doesn't grow with size of the file.
+
+        Project name and extended attributes are picked up on the way,
+        as MSP XML schema places them before Tasks.
+        """
+        self.schedule.name = None
+        context = etree.iterparse(self.handle,
+                                  events=('end', ),
+                                  tag=MSP_IMPORT_TAGS)
+
+        for _, element in context:
+            tag = etree.QName(element).localname
+            parent = element.getparent()
+
+            if tag == 'Task':
+                fields = self._read_task_fields(element)
+
+                if fields['Name'] in models.IT_PHASE_FULLNAMES:
+                    self._phase_fullnames.add(fields['Name'])
+
+                outline_level = fields['OutlineLevel']
+                if outline_level is not None and \
+                        int(outline_level) >= start_level:
+                    level = int(outline_level)
+                    task = models.Task(self.schedule, level=level)
+                    if not self.task_load_msp_fields(task, fields):
+                        task = None
+
+                    yield level, task
+
+            elif tag == 'ExtendedAttribute':
+                # Project/ExtendedAttributes/ExtendedAttribute only
+                grandparent = parent.getparent()
+                if grandparent is not None and grandparent.getparent() is None:
+                    self._load_ext_attr(element)
+
+            elif (tag in ('Name', 'Title') and parent.getparent() is None
+                    and self.schedule.name is None):
+                # Project/Name|Title - whichever comes first
+                self.schedule.name = (element.text or '').strip()
+
+            if tag in MSP_STREAMED_ELEMENTS or parent.getparent() is None:
+                # drop already processed elements
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    def _load_ext_attr(self, eExtAttr):
+        ns = eExtAttr.tag[:-len('ExtendedAttribute')]
+        fieldID = int(eExtAttr.findtext(ns + 'FieldID'))
+        fieldName = eExtAttr.findtext(ns + 'FieldName')
+        self.schedule.ext_attr[fieldName] = fieldID
+
+        # choose flags field
+        for ff_name in MSP_FLAGS_ATTRS:
+            if ff_name in self.schedule.ext_attr:
+                self.schedule.flags_attr_id = self.schedule.ext_attr[ff_name]
+                break
+
+    def _fix_phase_names(self):
+        """Map short phase names once the whole document has been read"""
+        for task in self._phase_tasks:
+            task.name = task._workaround_it_phase_names(
+                task.name, task.level, self._phase_fullnames)
+
     # Schedule
     def export_schedule(self, out_file=None):
         MSP_NAMESPACE = "http://schemas.microsoft.com/project"
@@ -237,29 +333,51 @@ class ScheduleHandler_msp(ScheduleHandlerBase):
                                   '%s.' % eOutlineNumber.text)
 
     # Schedule
-    def _load_tasks_level(self, level, eTask_list):
+    def _load_tasks_level(self, level, task_records):
+        """
+        Build tasks tree from (outline level, task) records in one pass
+
+        Records can be any iterable (e.g. streamed from the parser), records
+        without task (not importable) are skipped. Tasks deeper than current
+        level become children of the last imported task on that level.
+
+        Args:
+            level: outline level of top level tasks
+            task_records: iterable of (outline level, task or None) tuples
+
+        Returns:
+            list of top level tasks
+        """
         return_tasks = []
+        # stack of (level, tasks) - tasks list is shared with the parent task
+        stack = [(level, return_tasks)]
+        # flags are collected only from tasks really placed in the tree
+        used_flags = set()
+
+        for task_level, task in task_records:
+            curr_level, curr_tasks = stack[-1]
 
-        while eTask_list:
-            eTask = eTask_list[0]
-            task_level = int(eTask.xpath('OutlineLevel')[0].text)
+            while task_level < curr_level and len(stack) > 1:
+                stack.pop()
+                curr_level, curr_tasks = stack[-1]
 
-            if task_level > level:
+            if task_level < curr_level:
+                # shallower than top level - nothing else belongs to the tree
+                break
+
+            if task_level > curr_level:
                 # return tasks may be empty
                 # since there could be no importable tasks yet
-                if len(return_tasks):
-                    return_tasks[-1].tasks = self._load_tasks_level(
-                        task_level, eTask_list)
-                else:
-                    # remove task from list
-                    eTask_list.pop(0)
-                continue
-            elif task_level < level:
-                return return_tasks
+                if not curr_tasks:
+                    continue
+
+                # new children list replaces the previous one (if any)
+                curr_level, curr_tasks = task_level, []
+                stack[-1][1][-1].tasks = curr_tasks
+                stack.append((curr_level, curr_tasks))
 
             # process task
-            task = models.Task(self.schedule, level=level)
-            if self.task_load_msp_node(task, eTask):
+            if task:
                 # update schedule start/end
                 if self.schedule.dStart:
                     self.schedule.dStart = min(self.schedule.dStart,
@@ -273,78 +391,110 @@ class ScheduleHandler_msp(ScheduleHandlerBase):
                 else:
                     self.schedule.dFinish = task.dFinish
 
-                return_tasks.append(task)
-            # remove task from list
-            eTask_list.pop(0)
+                used_flags.update(task.flags)
+                curr_tasks.append(task)
+
+        self.schedule.used_flags = used_flags
         return return_tasks
 
+    @staticmethod
+    def _read_task_fields(eTask):
+        """
+        Walk children of Task element once and return dict of field texts
+
+        Only the first occurrence of a field is used, 'ExtendedAttribute'
+        holds list of (FieldID, Value) tuples.
+        """
+        fields = dict.fromkeys(MSP_TASK_FIELDS)
+        ext_attrs = fields['ExtendedAttribute'] = []
+
+        for child in eTask:
+            field = MSP_TASK_TAGS.get(child.tag)
+
+            if field == 'ExtendedAttribute':
+                ext_attr = dict.fromkeys(MSP_EXT_ATTR_FIELDS)
+                for ext_attr_child in child:
+                    ext_attr_field = MSP_EXT_ATTR_TAGS.get(ext_attr_child.tag)
+                    if ext_attr_field and ext_attr[ext_attr_field] is None:
+                        ext_attr[ext_attr_field] = ext_attr_child.text
+                ext_attrs.append((ext_attr['FieldID'], ext_attr['Value']))
+
+            elif field and fields[field] is None:
+                fields[field] = child.text
+
+        return fields
+
     # Task
     def task_load_msp_node(self, task, eTask):
-        task.index = int(eTask.xpath('ID')[0].text)
+        return self.task_load_msp_fields(task, self._read_task_fields(eTask))
 
-        task.name = task._workaround_it_phase_names(eTask)
-        if not task.name:
+    # Task
+    def task_load_msp_fields(self, task, fields):
+        """Fill task from fields read by _read_task_fields"""
+        task.index = int(fields['ID'])
+
+        name = fields['Name']
+        if name:
+            name = name.strip()
+        if not name:
             return False
 
-        task.priority = int(eTask.xpath('Priority')[0].text)
+        task.name = name
+        if task.level in models.IT_PHASE_LEVELS and \
+                name in models.IT_PHASE_NAMES:
+            # can't be resolved until the whole document is read
+            self._phase_tasks.append(task)
 
-        nlStart = eTask.xpath('Start')
+        task.priority = int(fields['Priority'])
 
-        if nlStart:
-            task.dStart = datetime.strptime(nlStart[0].text,
+        if fields['Start'] is not None:
+            task.dStart = datetime.strptime(fields['Start'],
                                             task._date_format)
             task.dFinish = task.dStart
         else:
             return False
 
-        nlFinish = eTask.xpath('Finish')
-        if nlFinish:
-            task.dFinish = datetime.strptime(
-                nlFinish[0].text,
-                task._date_format
-            )
+        if fields['Finish'] is not None:
+            task.dFinish = datetime.strptime(fields['Finish'],
+                                             task._date_format)
 
-        nlAcStart = eTask.xpath('ActualStart')
-        if nlAcStart:
-            task.dStart = datetime.strptime(nlAcStart[0].text,
+        if fields['ActualStart'] is not None:
+            task.dStart = datetime.strptime(fields['ActualStart'],
                                             task._date_format)
 
-        nlAcFinish = eTask.xpath('ActualFinish')
-        if nlAcFinish:
-            task.dFinish = datetime.strptime(nlAcFinish[0].text,
+        if fields['ActualFinish'] is not None:
+            task.dFinish = datetime.strptime(fields['ActualFinish'],
                                              task._date_format)
 
         # sanity check - if only start defined and beyond plan finish
         task.dFinish = max(task.dFinish, task.dStart)
 
-        task.milestone = eTask.xpath('Milestone')[0].text == '1'
+        task.milestone = fields['Milestone'] == '1'
+
+        if fields['PercentComplete'] is not None:
+            task.p_complete = float(fields['PercentComplete'])
 
-        ePercentComplete_list = eTask.xpath('PercentComplete')
-        if ePercentComplete_list:
-            task.p_complete = float(eTask.xpath('PercentComplete')[0].text)
+        if fields['Notes']:
+            task.note = fields['Notes'].strip()
 
-        notes = eTask.xpath('Notes')
-        if notes:
-            task.note = notes[0].text.strip()
+        ext_attrs = fields['ExtendedAttribute']
 
         # load flags from ext attributes
-        flag_ext_attr = eTask.xpath(
-            'ExtendedAttribute[FieldID = {}]'.format(
-                task._schedule.flags_attr_id)
-        )
-        if flag_ext_attr:
-            flags_value = flag_ext_attr[0].xpath('Value')[0].text
-            if flags_value:
-                task.flags = [f for f in flags_value.strip(' ,\n').split(',')
-                              if ' ' not in f]
-                task._schedule.used_flags |= set(task.flags)
+        for field_id, flags_value in ext_attrs:
+            if field_id is not None and \
+                    int(field_id) == task._schedule.flags_attr_id:
+                if flags_value:
+                    task.flags = [f for f in
+                                  flags_value.strip(' ,\n').split(',')
+                                  if ' ' not in f]
+                    task._schedule.used_flags |= set(task.flags)
+                break
 
         # workaround for SmartSheet exports - load flags, links
-        # @param value: XPath element instance
+        # @param value: ExtendedAttribute Value element text
         #   (/Project/Tasks/Task/ExtendedAttribute/Value)
-        ext_attr_elements = eTask.xpath('ExtendedAttribute/Value')
-        for ext_attr in ext_attr_elements:
-            task.parse_extended_attr(ext_attr.text)
+        for _, value in ext_attrs:
+            task.parse_extended_attr(value)
         return True
 
     # Task
@@ -30,6 +30,13 @@ class ScheduleHandler_rally(ScheduleHandlerBase):
                 return True
         return False
 
+    @classmethod
+    def sniff_source(cls, handle, head):
+        if len(head) >= 1024:
+            return False
+
+        return b'WORKSPACE' in head and b'PROJECT' in head
+
     def import_schedule(self):
         self.schedule = models.Schedule()
         start_time = None
@@ -1,11 +1,21 @@
 import calendar
+import contextlib
 import datetime
+import hashlib
+import json
 import logging
 import numbers
 import os
+import queue
 import re
-from schedules_tools import models, SchedulesToolsException
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from schedules_tools import (
+    conversion_cache, get_cache_dir, models, SchedulesToolsException)
 from schedules_tools.schedule_handlers import ScheduleHandlerBase
+from schedules_tools.working_calendar import WorkingCalendar
 import traceback
 
 
@@ -19,6 +29,28 @@ COLUMN_FLAGS = 'flags'
 COLUMN_LINK = 'link'
 COLUMN_PRIORITY = 'priority'
 
+# rows sent in one add_rows/update_rows request
+ADD_ROWS_BATCH_SIZE = 500
+# API error codes worth retrying - rate limit exceeded, unexpected error
+RETRY_ERROR_CODES = (4003, 4004)
+# retries of a request after the SDK gives up on throttled one
+RETRY_ATTEMPTS = 5
+# seconds to wait before first retry, doubled with every next one
+RETRY_BACKOFF = 2.0
+# API allows 300 requests per minute and token, keep some reserve for burst
+RATE_LIMIT_BURST = 10
+RATE_LIMIT_RATE = (300 - RATE_LIMIT_BURST) / 60.0
+# threads fetching sheets in import_schedules
+FETCH_WORKERS = 8
+
+PERMALINK_INDEX_VERSION = 1
+# seconds after which permalink index is refreshed by listing all sheets
+PERMALINK_INDEX_TTL = 24 * 3600
+# unknown permalink refreshes the index only if it's older than this
+PERMALINK_INDEX_MISS_TTL = 60
+# subdirectory of cache_dir with downloaded sheets
+SHEETS_CACHE_DIR = 'smartsheet-sheets'
+
 log = logging.getLogger(__name__)
 
 
@@ -37,24 +69,253 @@ except ImportError:
     additional_deps_satistifed = False
 
 
-def date_range(start, finish):
-    current_date = start
-    while current_date != finish:
-        yield current_date
-        current_date += datetime.timedelta(days=1)
-    yield finish
+class TokenBucket(object):
+    """
+    Rate limiter - bucket of capacity tokens refilled by rate tokens
+    per second, every request takes one token or waits for it.
+
+    Thread safe, waiting requests are served in order of acquire calls.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, wait until it's available.
+
+        Returns:
+            seconds spent waiting
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # reserve the token - negative balance is debt of waiting callers
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait:
+            self._sleep(wait)
+
+        return wait
+
+
+def get_default_permalink_index_path(token):
+    # index per account, file name doesn't reveal the token
+    digest = hashlib.sha256((token or '').encode('utf-8')).hexdigest()[:16]
+
+    return os.path.join(get_cache_dir(), 'smartsheet',
+                        'permalinks-{}.json'.format(digest))
+
+
+class PermalinkIndex(object):
+    """
+    On-disk index of permalinks and ids of sheets of one account
+
+    Resolving permalink is a lookup instead of listing all sheets of
+    the account. Whole index is refreshed by one listing (warm_up) when
+    it's older than ttl, or when permalink isn't known and the index is
+    older than miss_ttl - the sheet might have been created since.
+    """
+    path = None
+    ttl = PERMALINK_INDEX_TTL
+    miss_ttl = PERMALINK_INDEX_MISS_TTL
+    _index = None
+    _ids = None
+
+    def __init__(self, path, ttl=PERMALINK_INDEX_TTL,
+                 miss_ttl=PERMALINK_INDEX_MISS_TTL, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._index = self._load()
+
+    @staticmethod
+    def _empty_index():
+        return {
+            'version': PERMALINK_INDEX_VERSION,
+            'updated': 0,
+            'permalinks': {},
+        }
+
+    def _load(self):
+        try:
+            with open(self.path) as fd:
+                index = json.load(fd)
+        except (IOError, OSError, ValueError) as e:
+            log.debug('Permalink index {} not loaded: {}'.format(self.path, e))
+            return self._empty_index()
+
+        if (not isinstance(index, dict)
+                or index.get('version') != PERMALINK_INDEX_VERSION):
+            log.debug('Permalink index {} is outdated'.format(self.path))
+            return self._empty_index()
+
+        return index
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            # replace whole file at once, concurrent runs may read it
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(self._index, fp)
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            log.debug('Permalink index {} not saved: {}'.format(self.path, e))
+
+    @property
+    def age(self):
+        return self._clock() - self._index['updated']
+
+    def warm_up(self, client):
+        """Index all sheets of the account by one listing"""
+        with self._lock:
+            log.info('Getting sheets to index permalinks (consuming)')
+            sheets = client.Sheets.list_sheets(include_all=True)
+            log.info('Getting sheets to index permalinks - DONE')
+
+            self._index['permalinks'] = {sheet.permalink: int(sheet.id)
+                                         for sheet in sheets.data}
+            self._index['updated'] = self._clock()
+            self._ids = None
+            self.save()
+
+    def get_id(self, permalink, client):
+        """
+        Returns:
+            sheet id of permalink, None if there is no such sheet
+        """
+        with self._lock:
+            if self.age > self.ttl:
+                self.warm_up(client)
+
+            sheet_id = self._index['permalinks'].get(permalink)
+            if sheet_id is None and self.age > self.miss_ttl:
+                self.warm_up(client)
+                sheet_id = self._index['permalinks'].get(permalink)
+
+            return sheet_id
+
+    def get_permalink(self, sheet_id):
+        """
+        Returns:
+            indexed permalink of sheet id, None if it isn't known
+        """
+        with self._lock:
+            if self._ids is None:
+                self._ids = {val: key for key, val
+                             in self._index['permalinks'].items()}
+
+            return self._ids.get(int(sheet_id))
+
+    def add(self, sheet_id, permalink):
+        with self._lock:
+            self._index['permalinks'][permalink] = int(sheet_id)
+            self._ids = None
+            self.save()
+
+
+class ClientPool(object):
+    """
+    Smartsheet clients of one access token shared by all handlers.
+
+    Client is expensive to create (SDK inspects the call stack) and keeps
+    HTTP connections open, so handlers use one shared client. Threads
+    fetching sheets concurrently check out clients of their own.
+    Sheet downloads of all of them are limited by one TokenBucket.
+    """
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, token, api_base=None):
+        self.token = token
+        self.api_base = api_base
+        self.limiter = TokenBucket(RATE_LIMIT_RATE, RATE_LIMIT_BURST)
+        self._shared_client = None
+        self._idle_clients = queue.LifoQueue()
+        self._permalink_index = None
+
+    @classmethod
+    def get(cls, token, api_base=None):
+        with cls._pools_lock:
+            key = (token, api_base)
+            if key not in cls._pools:
+                cls._pools[key] = cls(token, api_base)
+
+            return cls._pools[key]
+
+    def create_client(self):
+        kwargs = {}
+        if self.api_base:
+            kwargs['api_base'] = self.api_base
+
+        client = smartsheet.Smartsheet(self.token, **kwargs)
+        client.errors_as_exceptions(True)
+        return client
+
+    @property
+    def shared_client(self):
+        with self._pools_lock:
+            if not self._shared_client:
+                self._shared_client = self.create_client()
+
+        return self._shared_client
+
+    @property
+    def permalink_index(self):
+        with self._pools_lock:
+            if not self._permalink_index:
+                self._permalink_index = PermalinkIndex(
+                    get_default_permalink_index_path(self.token))
+
+        return self._permalink_index
+
+    @contextlib.contextmanager
+    def client(self):
+        """Check out client for exclusive use by current thread"""
+        try:
+            client = self._idle_clients.get_nowait()
+        except queue.Empty:
+            client = self.create_client()
+
+        try:
+            yield client
+        finally:
+            self._idle_clients.put(client)
 
 
 class ScheduleHandler_smartsheet(ScheduleHandlerBase):
     provide_export = True
+    provide_mtime = True
+    provide_changelog = True
+    # export creates sheet, there is no output file to cache
+    export_cacheable = False
     handle_deps_satisfied = additional_deps_satistifed
 
     date_format = '%Y-%m-%d'  # 2017-01-20
     datetime_format = '%Y-%m-%dT%H:%M:%S'  # 2017-01-20T08:00:00
     _client_instance = None
     _sheet_instance = None
+    _sheet_info = None
     _sheet_columns = None
+    _working_calendar = None
     _re_number = re.compile(r'[0-9]+')
+    _re_datetime = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}')
+    _re_date = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')
     _re_url = re.compile(r'^(https?://.*?smartsheet.com[^?]+)')
     columns_mapping_name = {
         'Task': COLUMN_TASK_NAME,
@@ -96,34 +357,37 @@ class ScheduleHandler_smartsheet(ScheduleHandlerBase):
         """Return dict with smarsheet id and permalink - get missing one"""
 
         info_dict = {}
+        index = self.client_pool.permalink_index
 
         if ScheduleHandler_smartsheet.value_is_ss_id(value):
-            try:
-                sheet = self.client.Sheets.get_sheet(value)
-                info_dict = dict(id=int(value), permalink=sheet.permalink)
-            except smartsheet.exceptions.ApiError as e:
-                log.warning(e)
+            permalink = index.get_permalink(value)
+            if permalink is None:
+                try:
+                    permalink = self.fetch_sheet_info(value).permalink
+                    index.add(value, permalink)
+                except SmartSheetImportException as e:
+                    log.warning(e)
+
+            if permalink:
+                info_dict = dict(id=int(value), permalink=permalink)
 
         else:
             match = ScheduleHandler_smartsheet.value_is_ss_permalink(value)
             if match:
                 value = match.groups()[0]
+                sheet_id = index.get_id(value, self.client)
 
-                log.info('Getting sheets looking for handle (consuming)')
-                log.info('Waiting on Smartsheets')
-
-                sheets = self.client.Sheets.list_sheets(include_all=True)
-
-                log.info('Getting sheets looking for handle (consuming) - DONE')
-
-                for sheet in sheets.data:
-                    if sheet.permalink == value:
-                        info_dict = info_dict = dict(id=int(sheet.id),
-                                                     permalink=value)
-                        break
+                if sheet_id is not None:
+                    info_dict = dict(id=sheet_id, permalink=value)
 
         return info_dict
 
+    @classmethod
+    def warm_up_permalink_index(cls, options=None):
+        """Index permalinks of all sheets of the account at once"""
+        handler = cls(options=options or {})
+        handler.client_pool.permalink_index.warm_up(handler.client)
+
     @classmethod
     def value_is_ss_id(cls, value):
         try:
@@ -144,27 +408,142 @@ class ScheduleHandler_smartsheet(ScheduleHandlerBase):
 
         return cls.value_is_ss_permalink(handle) or cls.value_is_ss_id(handle)
 
+    @property
+    def client_pool(self):
+        return ClientPool.get(
+            self.options.get('smartsheet_token') or os.environ.get('SMARTSHEET_TOKEN'),
+            self.options.get('smartsheet_api_base'))
+
     @property
     def client(self):
         if not self._client_instance:
-            self._client_instance = smartsheet.Smartsheet(
-                self.options['smartsheet_token'] or os.environ.get('SMARTSHEET_TOKEN'))
-            self._client_instance.errors_as_exceptions(True)
+            self._client_instance = self.client_pool.shared_client
         return self._client_instance
 
+    @property
+    def sheet_cache(self):
+        """Cache of downloaded sheets in cache_dir, None without cache_dir"""
+        if not self.options.get('cache_dir'):
+            return None
+
+        max_size = self.options.get('cache_max_size')
+        return conversion_cache.ConversionCache(
+            os.path.join(self.options['cache_dir'], SHEETS_CACHE_DIR),
+            max_size=(max_size * 2 ** 20 if max_size
+                      else conversion_cache.DEFAULT_MAX_SIZE))
+
+    def fetch_sheet(self, client):
+        """
+        Download sheet with all rows by client, respect rate limit.
+
+        Sheet kept in sheet_cache is downloaded again only if there is
+        newer version of it.
+        """
+        cache = self.sheet_cache
+        cache_key = None
+        cached_sheet = None
+
+        if cache is not None and self.value_is_ss_id(self.handle):
+            cache_key = conversion_cache.make_key('smartsheet', int(self.handle))
+            cached_sheet = cache.get(cache_key)
+
+        self.client_pool.limiter.acquire()
+
+        try:
+            # get sheet and turn off rows pagination to get all rows
+            sheet = client.Sheets.get_sheet(
+                self.handle, page_size=None, page=None,
+                if_version_after=cached_sheet.version if cached_sheet else None)
+
+        except smartsheet.exceptions.ApiError as e:
+            raise SmartSheetImportException(e.message, source=self.handle)
+
+        # unchanged sheet - response contains just its version
+        if cached_sheet and sheet.id is None:
+            log.debug('Sheet %s version %s not changed, using cached one'
+                      % (self.handle, sheet.version))
+            return cached_sheet
+
+        if cache_key:
+            cache.set(cache_key, sheet)
+
+        return sheet
+
     @property
     def sheet(self):
         if not self._sheet_instance:
-            try:
-                # get sheet and turn off rows pagination to get all rows
-                self._sheet_instance = self.client.Sheets.get_sheet(
-                    self.handle, page_size=None, page=None)
-
-            except smartsheet.exceptions.ApiError as e:
-                raise SmartSheetImportException(e.message, source=self.handle)
+            self._sheet_instance = self.fetch_sheet(self.client)
 
         return self._sheet_instance
 
+    @property
+    def sheet_info(self):
+        """
+        Sheet without rows (version, modification time, columns, ...),
+        taken from the sheet if it has been already downloaded.
+        """
+        if self._sheet_instance:
+            return self._sheet_instance
+
+        if not self._sheet_info:
+            self._sheet_info = self.fetch_sheet_info(self.handle)
+
+        return self._sheet_info
+
+    def fetch_sheet_info(self, sheet_id):
+        self.client_pool.limiter.acquire()
+
+        try:
+            # filter by non-existent row number to get no rows
+            return self.client.Sheets.get_sheet(sheet_id, row_numbers=[0])
+
+        except smartsheet.exceptions.ApiError as e:
+            raise SmartSheetImportException(e.message, source=sheet_id)
+
+    def _prefetch_sheet(self):
+        with self.client_pool.client() as client:
+            self._sheet_instance = self.fetch_sheet(client)
+
+    @classmethod
+    def import_schedules(cls, handles, options=None, workers=FETCH_WORKERS,
+                         return_exceptions=False):
+        """
+        Import many sheets - sheets are downloaded concurrently by pool
+        of threads, then loaded into schedules one by one.
+
+        Args:
+            handles: sheet ids or permalinks
+            options: handler options shared by all sheets
+            workers: number of downloading threads
+            return_exceptions: put SmartSheetImportException of failed
+                sheet into result instead of raising it
+
+        Returns:
+            list of schedules in order of handles
+        """
+        handlers = [cls(handle=handle, options=options or {})
+                    for handle in handles]
+
+        schedules = []
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(handler._prefetch_sheet)
+                       for handler in handlers]
+
+            # load already downloaded sheets while the rest is on the way
+            for handler, future in zip(handlers, futures):
+                try:
+                    future.result()
+                    schedules.append(handler.import_schedule())
+                except SmartSheetImportException as e:
+                    if not return_exceptions:
+                        for future in futures:
+                            future.cancel()
+                        raise
+                    schedules.append(e)
+
+        return schedules
+
     @property
     def sheet_columns(self):
         if self._sheet_columns is None:
@@ -173,43 +552,41 @@ class ScheduleHandler_smartsheet(ScheduleHandlerBase):
         return self._sheet_columns
 
     @property
-    def working_days_and_holidays(self):
-        if not self._working_days_and_holidays:
-            sheet = self.sheet
-            verbose_working_weekdays = sheet.project_settings.working_days.to_list()
+    def working_calendar(self):
+        """WorkingCalendar of the sheet project settings"""
+        if not self._working_calendar:
+            project_settings = self.sheet_info.project_settings
+            verbose_working_weekdays = project_settings.working_days.to_list()
             working_isoweekdays = set(self.dayname_to_isoweekday[x.lower()]
                                       for x in verbose_working_weekdays)
-            holidays = set(sheet.project_settings.working_days.non_working_days.to_list())
-            self._working_days_and_holidays = working_isoweekdays, holidays
+            holidays = project_settings.non_working_days.to_list()
+            self._working_calendar = WorkingCalendar(working_isoweekdays,
+                                                     holidays)
+
+        return self._working_calendar
+
+    @property
+    def working_days_and_holidays(self):
+        working_calendar = self.working_calendar
 
-        return self._working_days_and_holidays
+        return (set(working_calendar.working_isoweekdays),
+                set(working_calendar.holidays))
 
     def calculate_duration(self, start, finish):
+        """Number of working days from start to finish, at least 1"""
         if start == finish:
             return 1
 
-        working_isoweekdays, holidays = self.working_days_and_holidays
-        duration = 1
-
-        for date in date_range(start, finish):
-            if date.isoweekday() not in working_isoweekdays:
-                continue
-
-            if date in holidays:
-                continue
-
-            duration += 1
-
-        return duration
+        return max(1, self.working_calendar.working_days(start, finish))
 
     def get_handle_mtime(self):
-        return self.sheet.modified_at
+        return self.sheet_info.modified_at
 
     def get_handle_changelog(self):
         changelog = dict()
 
-        changelog[self.sheet.version] = {
-            'date': self.sheet.modified_at,
+        changelog[self.sheet_info.version] = {
+            'date': self.sheet_info.modified_at,
             'user': None,
             'msg': None,
         }
@@ -235,24 +612,13 @@ class ScheduleHandler_smartsheet(ScheduleHandlerBase):
                 self.schedule.dFinish = datetime.datetime.min
             log.debug('Import schedule - after first call to smartsheet')
 
-            parents_stack = []
-
-            # populate columns dict/map
-            for column in self.sheet.columns:
-                index = self.columns_mapping_name.get(column.title, None)
-                if index is None:
-                    log.debug('Unknown column %s, skipping.' % column.title)
-                    continue
-                self.columns_mapping_id[column.id] = index
-
-            for row in self.sheet.rows:
-                self._load_task(row, parents_stack)
+            self._load_rows(self.sheet.columns, self.sheet.rows)
 
             if not self.schedule.tasks:
                 self.schedule.dStart = None
                 self.schedule.dFinish = None
                 log.warning('Empty schedule (no valid tasks) %s'
-                            % self.get_info_dict(self.handle)['permalink'])
+                            % self.sheet.permalink)
 
             self.schedule.generate_slugs()
 
@@ -297,123 +663,203 @@ class ScheduleHandler_smartsheet(ScheduleHandlerBase):
 
         return date
 
-    def _load_task(self, row, parents_stack):
-        task = models.Task(self.schedule)
-        cells, unknown_cells = self._load_task_cells(row)
-
-        task.index = row.row_number
-        # task.slug is generated at the end of importing whole schedule
-
-        # skip empty rows
-        if not all([c in cells and cells[c]
-                    for c in (COLUMN_TASK_NAME, COLUMN_START, COLUMN_FINISH)]):
-            # skip load, task doesn't contain all needed info
-            return
-
-        task.name = str(cells[COLUMN_TASK_NAME])
-
-        # dates
-        task.dStart = self._parse_date(cells[COLUMN_START])
-        task.dFinish = self._parse_date(cells[COLUMN_FINISH])
+    def _date_parser(self):
+        """
+        Parser of date strings (as _parse_date) for one import - every
+        distinct value is parsed once, values of expected formats
+        by fromisoformat instead of strptime.
+        """
+        parsed = {}
+        trim_time = self.options.get('trim_time')
+
+        def parse(value):
+            date = parsed.get(value)
+            if date is not None or value in parsed:
+                return date
+
+            date = None
+            if isinstance(value, str) and (
+                    self._re_datetime.fullmatch(value)
+                    or self._re_date.fullmatch(value)):
+                try:
+                    date = datetime.datetime.fromisoformat(value)
+                except ValueError:
+                    pass
+
+            if date is None:
+                # unusual value - leave it to strptime
+                date = self._parse_date(value)
+            else:
+                # We don't require so precise timestamp, so ignore seconds
+                date = date.replace(second=0)
+                if trim_time:
+                    date = date.date()
 
-        if not (task.dStart and task.dFinish):
-            # Couldn't parse the dates
-            return
+            parsed[value] = date
+            return date
 
-        self.schedule.dStart = min(self.schedule.dStart, task.dStart)
-        self.schedule.dFinish = max(self.schedule.dFinish, task.dFinish)
+        return parse
 
-        if COLUMN_NOTE in cells and cells[COLUMN_NOTE]:
-            task.note = str(cells[COLUMN_NOTE])
+    def _rows_to_columns(self, columns, rows):
+        """
+        Turn cells of rows into columns of values.
 
-        if COLUMN_PRIORITY in cells:
-            task.priority = cells[COLUMN_PRIORITY]
+        Args:
+            columns: smartsheet Column instances
+            rows: smartsheet Row instances
 
-        if COLUMN_DURATION in cells:
-            # duration cell contains values like '14d', '~0'
-            match = re.findall(self._re_number, cells[COLUMN_DURATION])
-            if match:
-                task.milestone = int(match[0]) == 0
-
-        if (COLUMN_P_COMPLETE in cells and cells[COLUMN_P_COMPLETE] is not None
-                and isinstance(cells[COLUMN_P_COMPLETE], numbers.Number)):
-            task.p_complete = round(cells[COLUMN_P_COMPLETE] * 100, 1)
-
-        if COLUMN_FLAGS in cells and cells[COLUMN_FLAGS]:
-            # try first to parse workaround format 'Flags: qe, dev'
-            task.parse_extended_attr(cells[COLUMN_FLAGS])
-
-            # then try to consider the value as it is 'qe, dev'
-            if not task.flags:
-                task.parse_extended_attr(cells[COLUMN_FLAGS],
-                                         key=models.ATTR_PREFIX_FLAG)
-
-        if COLUMN_LINK in cells and cells[COLUMN_LINK]:
-            # try first to parse workaround format 'Link: http://some.url'
-            task.parse_extended_attr(cells[COLUMN_LINK])
-            # then try to consider the value as it is 'http://some.url'
-            if not task.link:
-                task.parse_extended_attr(cells[COLUMN_LINK],
-                                         key=models.ATTR_PREFIX_LINK)
-        # Try to guess column/purpose of unknown cell values
-        for cell in unknown_cells:
-            task.parse_extended_attr(cell)
-
-        curr_stack_item = {
-            'rowid': row.id,
-            'task': task
-        }
+        Returns:
+            tuple (list of values of every column, row ids, parent ids,
+            row numbers)
+        """
+        positions = {column.id: i for i, column in enumerate(columns)}
+        width = len(columns)
+        table = []
+        ids = []
+        parent_ids = []
+        row_numbers = []
+
+        for row in rows:
+            values = [None] * width
+            for cell in row.cells:
+                values[positions[cell.column_id]] = cell.value
+            table.append(values)
+            ids.append(row.id)
+            parent_ids.append(row.parent_id)
+            row_numbers.append(row.row_number)
+
+        return list(zip(*table)), ids, parent_ids, row_numbers
+
+    def _load_rows(self, columns, rows):
+        """
+        Load tasks from sheet rows - values are taken column by column,
+        dates parsed once per distinct value and tasks linked to their
+        parents by parent_id in one pass.
 
-        if not parents_stack:
-            # Current task is the topmost (root)
-            self.schedule.tasks = [task]
-            parents_stack.insert(0, curr_stack_item)
+        Cells of unknown columns are parsed as extended attributes
+        (e.g. 'Flags: qe, dev'). When column name is duplicated, first
+        non-empty value is used.
+        """
+        if not rows:
+            return
 
-        elif row.parent_id == parents_stack[0]['rowid']:
-            # Current task is direct descendant of latest task
-            parents_stack[0]['task'].tasks.append(task)
-            parents_stack.insert(0, curr_stack_item)
+        self.columns_mapping_id = {}
+        known_positions = {}
+        unknown_positions = []
+        for position, column in enumerate(columns):
+            name = self.columns_mapping_name.get(column.title, None)
+            if name is None:
+                log.debug('Unknown column %s, skipping.' % column.title)
+                unknown_positions.append(position)
+                continue
+            self.columns_mapping_id[column.id] = name
+            known_positions.setdefault(name, []).append(position)
+
+        values, ids, parent_ids, row_numbers = self._rows_to_columns(
+            columns, rows)
+        empty_column = [None] * len(rows)
+
+        def column_values(name):
+            merged = None
+            for position in known_positions.get(name, ()):
+                if merged is None:
+                    merged = values[position]
+                else:
+                    merged = [first or value for first, value
+                              in zip(merged, values[position])]
+
+            return empty_column if merged is None else merged
+
+        names = column_values(COLUMN_TASK_NAME)
+        starts = column_values(COLUMN_START)
+        finishes = column_values(COLUMN_FINISH)
+        notes = column_values(COLUMN_NOTE)
+        priorities = column_values(COLUMN_PRIORITY)
+        durations = column_values(COLUMN_DURATION)
+        p_completes = column_values(COLUMN_P_COMPLETE)
+        flags = column_values(COLUMN_FLAGS)
+        links = column_values(COLUMN_LINK)
+        unknown_values = [values[position] for position in unknown_positions]
+
+        parse_date = self._date_parser()
+        milestones = {}
+        tasks_by_row_id = {}
+        sch_start = self.schedule.dStart
+        sch_finish = self.schedule.dFinish
+
+        for i, row_id in enumerate(ids):
+            # skip empty rows, task doesn't contain all needed info
+            if not (names[i] and starts[i] and finishes[i]):
+                continue
 
-        elif row.parent_id != parents_stack[0]['rowid']:
-            # We are currently in the same, or upper, level of tree
-            while parents_stack and row.parent_id != parents_stack[0]['rowid']:
-                parents_stack.pop(0)
+            d_start = parse_date(starts[i])
+            d_finish = parse_date(finishes[i])
+            if not (d_start and d_finish):
+                # Couldn't parse the dates
+                continue
 
-            if parents_stack:
-                parents_stack[0]['task'].tasks.append(task)
-            else:
+            task = models.Task(self.schedule)
+            task.index = row_numbers[i]
+            # task.slug is generated at the end of importing whole schedule
+            task.name = str(names[i])
+            task.dStart = d_start
+            task.dFinish = d_finish
+            sch_start = min(sch_start, d_start)
+            sch_finish = max(sch_finish, d_finish)
+
+            if notes[i]:
+                task.note = str(notes[i])
+
+            if priorities[i]:
+                task.priority = priorities[i]
+
+            duration = durations[i]
+            if duration:
+                # duration cell contains values like '14d', '~0'
+                if duration not in milestones:
+                    match = re.findall(self._re_number, duration)
+                    milestones[duration] = int(match[0]) == 0 if match else None
+                if milestones[duration] is not None:
+                    task.milestone = milestones[duration]
+
+            p_complete = p_completes[i]
+            if p_complete and isinstance(p_complete, numbers.Number):
+                task.p_complete = round(p_complete * 100, 1)
+
+            if flags[i]:
+                # try first to parse workaround format 'Flags: qe, dev'
+                task.parse_extended_attr(flags[i])
+
+                # then try to consider the value as it is 'qe, dev'
+                if not task.flags:
+                    task.parse_extended_attr(flags[i],
+                                             key=models.ATTR_PREFIX_FLAG)
+
+            if links[i]:
+                # try first to parse workaround format 'Link: http://some.url'
+                task.parse_extended_attr(links[i])
+                # then try to consider the value as it is 'http://some.url'
+                if not task.link:
+                    task.parse_extended_attr(links[i],
+                                             key=models.ATTR_PREFIX_LINK)
+
+            # Try to guess column/purpose of unknown cell values
+            for column in unknown_values:
+                if column[i] is not None:
+                    task.parse_extended_attr(column[i])
+
+            # rows of skipped parents are linked to the top level
+            parent = tasks_by_row_id.get(parent_ids[i])
+            if parent is None:
                 self.schedule.tasks.append(task)
+            else:
+                parent.tasks.append(task)
+                task.level = parent.level + 1
 
-            parents_stack.insert(0, curr_stack_item)
-        task.level = len(parents_stack)
-
-    def _load_task_cells(self, row):
-        """
-        Method tries to combine expected column name together with cell value.
-        Cell those don't match are returned back as list of values.
-
-        Args:
-            row: smartsheet Row instance
-
-        Returns: tuple (mapped, unknown) cells, resp. unknown values
+            tasks_by_row_id[row_id] = task
 
-        """
-        mapped_cells = {}
-        unknown_values = []
-        used_cells = set()
-
-        for cell in row.cells:
-            cell_name = self.columns_mapping_id.get(cell.column_id, None)
-            if not cell_name:
-                if cell.value is not None:
-                    unknown_values.append(cell.value)
-                continue
-            # avoid to override existing values when column name is duplicated
-            if cell_name not in used_cells and cell.value:
-                mapped_cells[cell_name] = cell.value
-                used_cells.add(cell_name)
-
-        return mapped_cells, unknown_values
+        self.schedule.dStart = sch_start
+        self.schedule.dFinish = sch_finish
 
     def export_schedule(self, output=None):
         # Project sheet from API (Templates.list_public_templates)
@@ -458,13 +904,116 @@ class ScheduleHandler_smartsheet(ScheduleHandlerBase):
             msg = 'Adding column failed: {}'.format(resp)
             raise SmartSheetExportException(msg, source=self.handle)
 
-        for task in self.schedule.tasks:
-            self.export_task(task, parent_id=None)
+        self.export_tasks(self.schedule.tasks)
 
         # sheet ID
         return self.handle
 
-    def export_task(self, task, parent_id=None, sibling_id=None, to_top=False):
+    def _call_with_retry(self, method, *args):
+        """Call API method, repeat it with backoff while it's throttled"""
+        for attempt in range(RETRY_ATTEMPTS + 1):
+            try:
+                return method(*args)
+            except smartsheet.exceptions.ApiError as e:
+                code = getattr(getattr(e.error, 'result', None), 'code', None)
+                if code not in RETRY_ERROR_CODES or attempt == RETRY_ATTEMPTS:
+                    raise SmartSheetExportException(e.message,
+                                                    source=self.handle)
+
+                backoff = RETRY_BACKOFF * 2 ** attempt
+                log.warning('Request throttled (%s), retrying in %.1f s'
+                            % (code, backoff))
+                time.sleep(backoff)
+
+    def _send_rows(self, method, rows):
+        """Send rows by method in batches, check all of them were processed"""
+        result_rows = []
+
+        for i in range(0, len(rows), ADD_ROWS_BATCH_SIZE):
+            batch = rows[i:i + ADD_ROWS_BATCH_SIZE]
+            resp = self._call_with_retry(method, self.handle, batch)
+
+            if resp.message != 'SUCCESS':
+                raise SmartSheetExportException(resp.result.message,
+                                                source=self.handle)
+            if len(resp.result) != len(batch):
+                msg = ('{} rows were expected to be processed, instead '
+                       'of {}'.format(len(batch), len(resp.result)))
+                raise SmartSheetExportException(msg, source=self.handle)
+
+            result_rows.extend(resp.result)
+
+        return result_rows
+
+    def add_rows(self, rows):
+        """
+        Add rows in batches of ADD_ROWS_BATCH_SIZE.
+
+        All rows have to share the same location (parent_id, sibling_id,
+        to_top/to_bottom) - API doesn't allow to mix them in one request.
+
+        Args:
+            rows: list of smartsheet Row instances
+
+        Returns:
+            list of added rows (with ids) in the same order
+        """
+        return self._send_rows(self.client.Sheets.add_rows, rows)
+
+    def update_rows(self, rows):
+        """
+        Update existing rows (identified by id) in batches
+        of ADD_ROWS_BATCH_SIZE.
+
+        Args:
+            rows: list of smartsheet Row instances
+
+        Returns:
+            list of updated rows in the same order
+        """
+        return self._send_rows(self.client.Sheets.update_rows, rows)
+
+    def export_tasks(self, tasks, parent_id=None):
+        """
+        Add tasks including their subtrees level by level - children of
+        one parent are added together, in as few requests as batch size
+        allows.
+
+        Args:
+            tasks: list of tasks to add at the bottom
+            parent_id: row id to add tasks under, top level if None
+
+        Returns:
+            list of added rows of tasks (without subtrees)
+        """
+        top_rows = self.add_rows([self.task_to_row(task, parent_id=parent_id)
+                                  for task in tasks])
+        level = [(row.id, task.tasks)
+                 for task, row in zip(tasks, top_rows) if task.tasks]
+
+        while level:
+            next_level = []
+
+            for row_id, siblings in level:
+                rows = self.add_rows([self.task_to_row(task, parent_id=row_id)
+                                      for task in siblings])
+                next_level.extend((row.id, task.tasks)
+                                  for task, row in zip(siblings, rows)
+                                  if task.tasks)
+
+            level = next_level
+
+        return top_rows
+
+    def task_to_row(self, task, parent_id=None, sibling_id=None,
+                    to_top=False):
+        """
+        Build new row of the task (without subtasks).
+
+        Returns:
+            smartsheet Row instance
+        """
+        columns = self.sheet_columns
         row = self.client.models.Row()
         if sibling_id:
             row.sibling_id = sibling_id
@@ -478,19 +1027,19 @@ class ScheduleHandler_smartsheet(ScheduleHandlerBase):
 
         if task.name:
             row.cells.append({
-                'column_id': self.sheet_columns['task name'],
+                'column_id': columns['task name'],
                 'value': task.name
             })
         if task.dStart:
             if isinstance(task.dStart, datetime.datetime):
                 task.dStart = task.dStart.date()
             row.cells.append({
-                'column_id': self.sheet_columns['start'],
+                'column_id': columns['start'],
                 'value': task.dStart.isoformat()
             })
         if task.milestone:
             row.cells.append({
-                'column_id': self.sheet_columns['duration'],
+                'column_id': columns['duration'],
                 'value': '0'
             })
         elif task.dFinish:
@@ -501,49 +1050,44 @@ class ScheduleHandler_smartsheet(ScheduleHandlerBase):
                 task.dFinish = task.dFinish.date()
             duration = (task.dFinish - task.dStart).days + 1
             row.cells.append({
-                'column_id': self._sheet_columns['duration'],
+                'column_id': columns['duration'],
                 'value': '{}d'.format(duration)
             })
         elif task.duration:
             row.cells.append({
-                'column_id': self._sheet_columns['duration'],
+                'column_id': columns['duration'],
                 'value': '{}d'.format(task.duration)
             })
 
         if task.flags:
             row.cells.append({
-                'column_id': self._sheet_columns['flags'],
+                'column_id': columns['flags'],
                 'value': ', '.join(task.flags)
             })
         if task.link:
             row.cells.append({
-                'column_id': self.sheet_columns['link'],
+                'column_id': columns['link'],
                 'value': task.link
             })
         if task.p_complete:
             row.cells.append({
-                'column_id': self.sheet_columns['% complete'],
+                'column_id': columns['% complete'],
                 'value': task.p_complete / 100.0
             })
         if task.note:
             row.cells.append({
-                'column_id': self.sheet_columns['comments'],
+                'column_id': columns['comments'],
                 'value': task.note
             })
-        resp = self.client.Sheets.add_rows(self.handle, [row])
 
-        if resp.message != 'SUCCESS':
-            raise SmartSheetExportException(resp.result.message,
-                                            source=self.handle)
-        len_result = len(resp.result)
-        if 1 != len_result:
-            msg = ('Just one row was expected to be added, instead '
-                   'of {}'.format(len_result))
-            raise SmartSheetExportException(msg, source=self.handle)
+        return row
 
-        row = resp.result[0]
+    def export_task(self, task, parent_id=None, sibling_id=None, to_top=False):
+        row = self.task_to_row(task, parent_id=parent_id,
+                               sibling_id=sibling_id, to_top=to_top)
+        row = self.add_rows([row])[0]
 
-        for nested_task in task.tasks:
-            self.export_task(nested_task, parent_id=row.id)
+        if task.tasks:
+            self.export_tasks(task.tasks, parent_id=row.id)
 
         return row
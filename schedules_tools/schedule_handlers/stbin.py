@@ -0,0 +1,727 @@
+"""
+Binary snapshot of the intermediate Schedule (stbin)
+
+Lossless, pickle-free and fast to load. All integers are little-endian,
+sections are 8-byte aligned:
+
+    header      magic, format version, record size, counts and
+                offsets of the sections below
+    strings     (count + 1) u32 offsets followed by UTF-8 data,
+                every distinct string is stored once
+    flag sets   (count + 1) u32 offsets to the following array
+                of string ids, every distinct list of flags is stored once
+    records     fixed-width task records in breadth-first order, so
+                children of a task are consecutive records
+                (first_child, child_count), top level tasks come first
+    meta        schedule attributes and task attributes not fitting
+                their record fields, JSON with tagged non-JSON types
+
+Dates are stored as microseconds since 1970-01-01 (naive, no timezone
+conversion). Task attributes not set on the instance are not stored,
+so import yields the same dump_as_dict() as the exported schedule.
+
+Besides full import, snapshot can be opened as read-only ScheduleView
+(open_schedule_view, option stbin_view) working directly over the
+memory-mapped file. Processes opening the same snapshot share its pages,
+task attributes are decoded on access.
+"""
+import datetime
+import json
+import logging
+import mmap
+import os
+import struct
+
+from schedules_tools import SchedulesToolsException
+from schedules_tools.schedule_handlers import ScheduleHandlerBase
+from schedules_tools.models import COMPACT_TASK_DEFAULTS, Schedule, Task, TaskBase
+
+log = logging.getLogger(__name__)
+
+
+MAGIC = b'\x89STBIN\r\n'
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<8sHHIIIIQQQQQ')
+RECORD = struct.Struct('<qqqdiiIIIIIIIiIHBx')
+RECORD_FIELDS = dict((field, i) for i, field in enumerate(
+    ('dStart', 'dFinish', 'index', 'p_complete', 'priority', 'level', 'name',
+     'slug', 'note', 'link', 'flags', 'extra', 'first_child', 'parent',
+     'child_count', 'present', 'bits')))
+
+NO_ID = 0xFFFFFFFF
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+INT32_RANGE = (-2 ** 31, 2 ** 31 - 1)
+INT64_RANGE = (-2 ** 63, 2 ** 63 - 1)
+
+# record 'present' bits - attribute is set on the task (strings are
+# present when their id isn't NO_ID)
+PRESENT_BITS = dict((attr, 1 << bit) for bit, attr in enumerate(
+    ('index', 'name', 'slug', 'note', 'link', 'dStart', 'dFinish',
+     'p_complete', 'priority', 'milestone', 'level', 'flags')))
+STRING_ATTRS = ('name', 'slug', 'note', 'link')
+
+# record 'bits'
+BIT_MILESTONE = 1
+BIT_INDEX_STRING = 2
+
+# task attributes never stored (tree structure, back reference, cache)
+SKIP_TASK_ATTRS = frozenset(['tasks', '_schedule', '_subtree_hash_cache'])
+# schedule attributes rebuilt by Schedule() itself
+SKIP_SCHEDULE_ATTRS = frozenset(['tasks', 'task_cls', 'unique_id_re'])
+
+TAG_KEY = '__stbin__'
+
+
+class StbinFormatException(SchedulesToolsException):
+    pass
+
+
+def _align(size):
+    return -size % 8
+
+
+def _encode_value(value):
+    """Encode value to JSON-compatible structure, non-JSON types are tagged"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    elif isinstance(value, list):
+        return [_encode_value(item) for item in value]
+    elif isinstance(value, dict):
+        if all(isinstance(key, str) for key in value) and TAG_KEY not in value:
+            return {key: _encode_value(val) for key, val in value.items()}
+        return {TAG_KEY: 'dict', 'items': [[_encode_value(key), _encode_value(val)]
+                                           for key, val in value.items()]}
+    elif isinstance(value, (set, frozenset)):
+        return {TAG_KEY: 'set', 'items': [_encode_value(item) for item in value]}
+    elif isinstance(value, tuple):
+        return {TAG_KEY: 'tuple', 'items': [_encode_value(item) for item in value]}
+    elif isinstance(value, datetime.datetime):
+        return {TAG_KEY: 'datetime', 'value': value.isoformat()}
+    elif isinstance(value, datetime.date):
+        return {TAG_KEY: 'date', 'value': value.isoformat()}
+    elif isinstance(value, datetime.timedelta):
+        return {TAG_KEY: 'timedelta', 'value': value // MICROSECOND}
+
+    raise StbinFormatException(
+        'Value of type {} can\'t be stored: {!r}'.format(type(value).__name__, value))
+
+
+def _decode_value(value):
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    elif not isinstance(value, dict):
+        return value
+
+    tag = value.get(TAG_KEY)
+    if tag is None:
+        return {key: _decode_value(val) for key, val in value.items()}
+    elif tag == 'dict':
+        return {_decode_value(key): _decode_value(val) for key, val in value['items']}
+    elif tag == 'set':
+        return set(_decode_value(item) for item in value['items'])
+    elif tag == 'tuple':
+        return tuple(_decode_value(item) for item in value['items'])
+    elif tag == 'datetime':
+        return datetime.datetime.fromisoformat(value['value'])
+    elif tag == 'date':
+        return datetime.date.fromisoformat(value['value'])
+    elif tag == 'timedelta':
+        return value['value'] * MICROSECOND
+
+    raise StbinFormatException('Unknown value tag {}'.format(tag))
+
+
+def datetime_to_epoch(value):
+    return (value - EPOCH) // MICROSECOND
+
+
+def epoch_to_datetime(value):
+    return EPOCH + value * MICROSECOND
+
+
+def _is_int(value, int_range):
+    return (type(value) is int
+            and int_range[0] <= value <= int_range[1])
+
+
+class StbinWriter(object):
+    """Serialize schedule into stbin content"""
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.strings = []
+        self.string_ids = {}
+        self.flag_sets = []
+        self.flag_set_ids = {}
+
+    def _string_id(self, value):
+        try:
+            return self.string_ids[value]
+        except KeyError:
+            string_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+            return string_id
+
+    def _flag_set_id(self, flags):
+        """Id of flag set, None if flags can't be stored as flag set"""
+        if type(flags) is not list:
+            return None
+
+        key = tuple(flags)
+        set_id = self.flag_set_ids.get(key)
+        if set_id is None:
+            if not all(type(flag) is str for flag in key):
+                return None
+
+            set_id = self.flag_set_ids[key] = len(self.flag_sets)
+            self.flag_sets.append([self._string_id(flag) for flag in key])
+
+        return set_id
+
+    def _pack_task(self, task, parent_row, first_child, extra_attrs):
+        attrs = task._get_attrs()
+        for key in SKIP_TASK_ATTRS:
+            attrs.pop(key, None)
+
+        present = bits = 0
+        string_ids = []
+        for key in STRING_ATTRS:
+            val = attrs.get(key)
+            if type(val) is str:
+                string_ids.append(self._string_id(val))
+                del attrs[key]
+            else:
+                string_ids.append(NO_ID)
+
+        index = attrs.get('index')
+        if _is_int(index, INT64_RANGE):
+            del attrs['index']
+            present |= PRESENT_BITS['index']
+        elif type(index) is str:
+            index = self._string_id(attrs.pop('index'))
+            present |= PRESENT_BITS['index']
+            bits |= BIT_INDEX_STRING
+        else:
+            index = 0
+
+        dates = []
+        for key in ('dStart', 'dFinish'):
+            val = attrs.get(key)
+            if type(val) is datetime.datetime and val.tzinfo is None:
+                dates.append(datetime_to_epoch(val))
+                del attrs[key]
+                present |= PRESENT_BITS[key]
+            else:
+                dates.append(0)
+
+        p_complete = attrs.get('p_complete')
+        if type(p_complete) is float:
+            del attrs['p_complete']
+            present |= PRESENT_BITS['p_complete']
+        else:
+            p_complete = 0.0
+
+        numbers = []
+        for key in ('priority', 'level'):
+            val = attrs.get(key)
+            if _is_int(val, INT32_RANGE):
+                numbers.append(val)
+                del attrs[key]
+                present |= PRESENT_BITS[key]
+            else:
+                numbers.append(0)
+
+        milestone = attrs.get('milestone')
+        if type(milestone) is bool:
+            del attrs['milestone']
+            present |= PRESENT_BITS['milestone']
+            bits |= BIT_MILESTONE if milestone else 0
+
+        flag_set = self._flag_set_id(attrs.get('flags'))
+        if flag_set is None:
+            flag_set = 0
+        else:
+            del attrs['flags']
+            present |= PRESENT_BITS['flags']
+
+        # the rest doesn't fit record fields
+        extra = NO_ID
+        if attrs:
+            extra = len(extra_attrs)
+            extra_attrs.append({key: _encode_value(val)
+                                for key, val in attrs.items()})
+
+        return RECORD.pack(dates[0], dates[1], index, p_complete, numbers[0],
+                           numbers[1], *string_ids, flag_set, extra,
+                           first_child, parent_row, len(task.tasks), present,
+                           bits)
+
+    def _schedule_meta(self):
+        meta = {}
+        for key, val in vars(self.schedule).items():
+            if key not in SKIP_SCHEDULE_ATTRS:
+                meta[key] = _encode_value(val)
+
+        return meta
+
+    @staticmethod
+    def _pack_table(sizes, data):
+        offsets = [0]
+        for size in sizes:
+            offsets.append(offsets[-1] + size)
+
+        if offsets[-1] > 0xFFFFFFFF:
+            raise StbinFormatException('Schedule is too large for stbin format.')
+
+        return struct.pack('<%dI' % len(offsets), *offsets) + data
+
+    def dumps(self):
+        """
+        Returns:
+            stbin content as bytes
+        """
+        records = []
+        extra_attrs = []
+
+        # breadth-first - children of each task are consecutive records
+        queue = [(task, -1) for task in self.schedule.tasks]
+        next_row = len(queue)
+        pos = 0
+        while pos < len(queue):
+            task, parent_row = queue[pos]
+            records.append(self._pack_task(task, parent_row, next_row,
+                                           extra_attrs))
+            queue.extend((subtask, pos) for subtask in task.tasks)
+            next_row += len(task.tasks)
+            pos += 1
+
+        meta = json.dumps({'schedule': self._schedule_meta(),
+                           'tasks': extra_attrs},
+                          separators=(',', ':')).encode('utf-8')
+
+        encoded = [string.encode('utf-8', 'surrogatepass')
+                   for string in self.strings]
+        strings = self._pack_table([len(string) for string in encoded],
+                                   b''.join(encoded))
+        flag_sets = self._pack_table(
+            [4 * len(ids) for ids in self.flag_sets],
+            b''.join(struct.pack('<%dI' % len(ids), *ids)
+                     for ids in self.flag_sets))
+
+        sections = []
+        offset = HEADER.size + _align(HEADER.size)
+        for content in (strings, flag_sets, b''.join(records), meta):
+            sections.append((offset, content))
+            offset += len(content) + _align(len(content))
+
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, RECORD.size, len(records),
+            len(self.schedule.tasks), len(self.strings), len(self.flag_sets),
+            sections[0][0], sections[1][0], sections[2][0], sections[3][0],
+            len(meta))
+
+        content = [header, b'\0' * _align(len(header))]
+        for _, section in sections:
+            content.extend((section, b'\0' * _align(len(section))))
+
+        return b''.join(content)
+
+
+class StbinReader(object):
+    """
+    Random access to content of stbin snapshot
+
+    Works over any buffer (bytes, mmap), nothing is decoded in advance.
+    """
+    buffer = None
+    task_count = 0
+    top_count = 0
+    string_count = 0
+    flag_set_count = 0
+
+    def __init__(self, buffer, source=None):
+        self.buffer = buffer
+
+        if len(buffer) < HEADER.size or buffer[:len(MAGIC)] != MAGIC:
+            raise StbinFormatException('Not a stbin file.', source=source)
+
+        (_, version, record_size, self.task_count, self.top_count,
+         self.string_count, self.flag_set_count, self._strings_offset,
+         self._flag_sets_offset, self._records_offset, self._meta_offset,
+         self._meta_size) = HEADER.unpack_from(buffer)
+
+        if version != FORMAT_VERSION or record_size != RECORD.size:
+            raise StbinFormatException(
+                'Unsupported stbin format version {}.'.format(version),
+                source=source)
+
+        if self._meta_offset + self._meta_size > len(buffer):
+            raise StbinFormatException('Truncated stbin file.', source=source)
+
+        self._strings_data = self._strings_offset + 4 * (self.string_count + 1)
+        self._flag_sets_data = self._flag_sets_offset + 4 * (self.flag_set_count + 1)
+
+    def string(self, string_id):
+        start, end = struct.unpack_from('<II', self.buffer,
+                                        self._strings_offset + 4 * string_id)
+        return str(self.buffer[self._strings_data + start:self._strings_data + end],
+                   'utf-8', 'surrogatepass')
+
+    def strings(self):
+        """All strings of string table"""
+        offsets = struct.unpack_from('<%dI' % (self.string_count + 1),
+                                     self.buffer, self._strings_offset)
+        data = bytes(self.buffer[self._strings_data:self._strings_data + offsets[-1]])
+
+        return [str(data[offsets[i]:offsets[i + 1]], 'utf-8', 'surrogatepass')
+                for i in range(self.string_count)]
+
+    def flag_set(self, set_id, strings=None):
+        start, end = struct.unpack_from('<II', self.buffer,
+                                        self._flag_sets_offset + 4 * set_id)
+        ids = struct.unpack_from('<%dI' % ((end - start) // 4), self.buffer,
+                                 self._flag_sets_data + start)
+        if strings is None:
+            return [self.string(string_id) for string_id in ids]
+
+        return [strings[string_id] for string_id in ids]
+
+    def record(self, row):
+        return RECORD.unpack_from(self.buffer,
+                                  self._records_offset + RECORD.size * row)
+
+    def records(self):
+        """All task records (tuples of RECORD fields)"""
+        if not self.task_count:
+            return []
+
+        with memoryview(self.buffer) as view:
+            return list(RECORD.iter_unpack(
+                view[self._records_offset:
+                     self._records_offset + RECORD.size * self.task_count]))
+
+    def meta(self):
+        """Schedule attributes and extra task attributes"""
+        meta = json.loads(bytes(self.buffer[self._meta_offset:
+                                            self._meta_offset + self._meta_size]))
+
+        return (_decode_value(meta['schedule']),
+                [_decode_value(attrs) for attrs in meta['tasks']])
+
+
+def task_attrs(record, strings, flag_sets, extra_attrs):
+    """
+    Attributes of task stored in record (children excluded)
+
+    Args:
+        record: tuple of RECORD fields
+        strings: sequence of strings indexed by string id
+        flag_sets: sequence of flag lists indexed by flag set id
+        extra_attrs: list of extra task attributes
+    """
+    (d_start, d_finish, index, p_complete, priority, level, name, slug,
+     note, link, flag_set, extra, _, _, _, present, bits) = record
+    attrs = {}
+
+    if present & PRESENT_BITS['index']:
+        attrs['index'] = strings[index] if bits & BIT_INDEX_STRING else index
+    for key, string_id in (('name', name), ('slug', slug), ('note', note),
+                           ('link', link)):
+        if string_id != NO_ID:
+            attrs[key] = strings[string_id]
+    if present & PRESENT_BITS['dStart']:
+        attrs['dStart'] = epoch_to_datetime(d_start)
+    if present & PRESENT_BITS['dFinish']:
+        attrs['dFinish'] = epoch_to_datetime(d_finish)
+    if present & PRESENT_BITS['p_complete']:
+        attrs['p_complete'] = p_complete
+    if present & PRESENT_BITS['priority']:
+        attrs['priority'] = priority
+    if present & PRESENT_BITS['level']:
+        attrs['level'] = level
+    if present & PRESENT_BITS['milestone']:
+        attrs['milestone'] = bool(bits & BIT_MILESTONE)
+    if present & PRESENT_BITS['flags']:
+        attrs['flags'] = list(flag_sets[flag_set])
+    if extra != NO_ID:
+        attrs.update(extra_attrs[extra])
+
+    return attrs
+
+
+def task_attr(record, name, strings, flag_sets, extra_attrs):
+    """
+    Single task attribute stored in record (arguments as for task_attrs)
+
+    Raises:
+        KeyError if the attribute isn't set on the task
+    """
+    extra = record[RECORD_FIELDS['extra']]
+    if extra != NO_ID and name in extra_attrs[extra]:
+        return extra_attrs[extra][name]
+
+    if name in STRING_ATTRS:
+        string_id = record[RECORD_FIELDS[name]]
+        if string_id == NO_ID:
+            raise KeyError(name)
+        return strings[string_id]
+
+    if not record[RECORD_FIELDS['present']] & PRESENT_BITS[name]:
+        raise KeyError(name)
+
+    bits = record[RECORD_FIELDS['bits']]
+    if name == 'milestone':
+        return bool(bits & BIT_MILESTONE)
+
+    value = record[RECORD_FIELDS[name]]
+    if name in ('dStart', 'dFinish'):
+        return epoch_to_datetime(value)
+    elif name == 'index' and bits & BIT_INDEX_STRING:
+        return strings[value]
+    elif name == 'flags':
+        return list(flag_sets[value])
+
+    return value
+
+
+class _Table(object):
+    """Items loaded on every access"""
+    __slots__ = ('_load',)
+
+    def __init__(self, load):
+        self._load = load
+
+    def __getitem__(self, key):
+        return self._load(key)
+
+
+class _LazyTable(dict):
+    """Items loaded on first access"""
+
+    def __init__(self, load):
+        self._load = load
+
+    def __missing__(self, key):
+        value = self[key] = self._load(key)
+        return value
+
+
+class StbinSnapshot(object):
+    """
+    Memory-mapped stbin file
+
+    Task records and strings are decoded on every access and not kept in
+    process memory (just flag sets are), so processes share all pages
+    of the snapshot.
+    """
+    handle = None
+    reader = None
+
+    def __init__(self, handle):
+        self.handle = handle
+
+        with open(handle, 'rb') as fd:
+            if not os.fstat(fd.fileno()).st_size:
+                raise StbinFormatException('Not a stbin file.', source=handle)
+
+            self._buffer = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.reader = StbinReader(self._buffer, handle)
+        self.schedule_attrs, self.extra_attrs = self.reader.meta()
+        self.strings = _Table(self.reader.string)
+        self.flag_sets = _LazyTable(
+            lambda set_id: self.reader.flag_set(set_id, self.strings))
+
+    def task_attr(self, row, name):
+        return task_attr(self.reader.record(row), name, self.strings,
+                         self.flag_sets, self.extra_attrs)
+
+    def task_attrs(self, row):
+        return task_attrs(self.reader.record(row), self.strings, self.flag_sets,
+                          self.extra_attrs)
+
+    def children(self, row):
+        """Range of rows of task subtasks"""
+        record = self.reader.record(row)
+        first_child = record[RECORD_FIELDS['first_child']]
+        return range(first_child,
+                     first_child + record[RECORD_FIELDS['child_count']])
+
+    def close(self):
+        self._buffer.close()
+
+
+class TaskView(TaskBase):
+    """
+    Read-only task backed by record of stbin snapshot
+
+    Attributes are decoded from the snapshot on access, views of subtasks
+    are created on first access of tasks. Private attributes (caches)
+    can be set.
+    """
+    __slots__ = ('_schedule', '_row', '_tasks', '_subtree_hash_cache')
+
+    def __init__(self, schedule, row):
+        object.__setattr__(self, '_schedule', schedule)
+        object.__setattr__(self, '_row', row)
+        object.__setattr__(self, '_tasks', None)
+        object.__setattr__(self, '_subtree_hash_cache', None)
+
+    def __getattr__(self, name):
+        # called only for attributes outside of slots
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        try:
+            return self._schedule._snapshot.task_attr(self._row, name)
+        except KeyError:
+            pass
+
+        if name == 'flags':
+            return []
+
+        try:
+            return COMPACT_TASK_DEFAULTS[name]
+        except KeyError:
+            raise AttributeError(
+                f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+    def __setattr__(self, name, value):
+        if name not in TaskView.__slots__:
+            raise AttributeError(
+                f"'{self.__class__.__name__}' is read-only, can't set '{name}'")
+
+        object.__setattr__(self, name, value)
+
+    @property
+    def tasks(self):
+        if self._tasks is None:
+            object.__setattr__(self, '_tasks', [
+                TaskView(self._schedule, row)
+                for row in self._schedule._snapshot.children(self._row)])
+
+        return self._tasks
+
+    def _get_attrs(self):
+        attrs = self._schedule._snapshot.task_attrs(self._row)
+        attrs['tasks'] = self.tasks
+        attrs['_schedule'] = self._schedule
+
+        return attrs
+
+
+def open_schedule_view(handle):
+    """Open stbin file as read-only ScheduleView"""
+    return ScheduleView(StbinSnapshot(handle))
+
+
+class ScheduleView(Schedule):
+    """
+    Schedule with read-only TaskView tasks over memory-mapped stbin snapshot
+
+    Schedule attributes are regular (loaded at open), tasks can be read,
+    exported and compared, but not modified - use materialize() to get
+    regular Schedule. Pickled view re-opens the snapshot file.
+    """
+    _snapshot = None
+
+    def __init__(self, snapshot):
+        super(ScheduleView, self).__init__()
+        self._snapshot = snapshot
+
+        for key, val in snapshot.schedule_attrs.items():
+            setattr(self, key, val)
+
+        self.tasks = [TaskView(self, row)
+                      for row in range(snapshot.reader.top_count)]
+
+    def __reduce__(self):
+        return open_schedule_view, (self._snapshot.handle,)
+
+    def dump_as_dict(self):
+        schedule = super(ScheduleView, self).dump_as_dict()
+        schedule.pop('_snapshot', None)
+
+        return schedule
+
+    def materialize(self):
+        """Regular Schedule with Task tree"""
+        return ScheduleHandler_stbin()._build_schedule(self._snapshot.reader)
+
+
+class ScheduleHandler_stbin(ScheduleHandlerBase):
+    provide_export = True
+
+    handle_deps_satisfied = True
+    concurrent_export = True
+    export_cacheable = True
+
+    default_export_ext = 'stbin'
+
+    @classmethod
+    def is_valid_source(cls, handle=None):
+        if not handle:
+            handle = cls.handle
+
+        try:
+            with open(handle, 'rb') as fd:
+                return fd.read(len(MAGIC)) == MAGIC
+        except (OSError, TypeError, ValueError):
+            return False
+
+    @classmethod
+    def sniff_source(cls, handle, head):
+        return head[:len(MAGIC)] == MAGIC
+
+    def _build_schedule(self, reader):
+        schedule = Schedule()
+        schedule_attrs, extra_attrs = reader.meta()
+        for key, val in schedule_attrs.items():
+            setattr(schedule, key, val)
+
+        strings = reader.strings()
+        flag_sets = [tuple(reader.flag_set(set_id, strings))
+                     for set_id in range(reader.flag_set_count)]
+        records = reader.records()
+
+        tasks = []
+        for record in records:
+            task = Task(schedule)
+            task.__dict__.update(task_attrs(record, strings, flag_sets,
+                                            extra_attrs))
+            tasks.append(task)
+
+        for task, record in zip(tasks, records):
+            first_child = record[RECORD_FIELDS['first_child']]
+            child_count = record[RECORD_FIELDS['child_count']]
+            if child_count:
+                task.tasks = tasks[first_child:first_child + child_count]
+
+        schedule.tasks = tasks[:reader.top_count]
+
+        return schedule
+
+    def import_schedule(self):
+        if self.options.get('stbin_view'):
+            return open_schedule_view(self.handle)
+
+        with open(self.handle, 'rb') as fd:
+            if not self.options.get('stbin_mmap'):
+                return self._build_schedule(StbinReader(fd.read(), self.handle))
+
+            if not os.fstat(fd.fileno()).st_size:
+                raise StbinFormatException('Not a stbin file.', source=self.handle)
+
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return self._build_schedule(StbinReader(buffer, self.handle))
+
+    def export_schedule(self, out_file):
+        content = StbinWriter(self.schedule).dumps()
+
+        with open(out_file, 'wb') as fp:
+            fp.write(content)
+
+        return content
@@ -0,0 +1,353 @@
+"""
+In-memory stand-in for smartsheet.Smartsheet client. Keeps rows of sheets
+in sheet order and records every API call to let tests count round trips.
+FakeSmartsheetServer serves the same sheets over local HTTP for tests
+of the real SDK client.
+"""
+
+import contextlib
+import datetime
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from smartsheet import models
+from smartsheet.exceptions import ApiError
+
+
+DEFAULT_COLUMNS = ['Task Name', 'Duration', 'Start', 'Finish', '% Complete',
+                   'Predecessors', 'Comments']
+ERROR_RATE_LIMIT = 4003
+ERROR_MULTIPLE_LOCATIONS = 1123
+ERROR_NOT_FOUND = 1006
+
+
+class FakeResponse(object):
+    def __init__(self, result, message='SUCCESS'):
+        self.result = result
+        self.message = message
+
+
+class FakeIndexResult(object):
+    def __init__(self, data):
+        self.data = data
+        self.total_count = len(data)
+
+
+class FakeSheet(object):
+    def __init__(self, sheet_id, name, columns=DEFAULT_COLUMNS):
+        self.id = sheet_id
+        self.name = name
+        self.permalink = 'https://app.smartsheet.com/sheets/fake{}'.format(sheet_id)
+        self.version = 1
+        self.modified_at = datetime.datetime(2020, 1, 1,
+                                             tzinfo=datetime.timezone.utc)
+        self.columns = list(columns)
+        self.working_days = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY',
+                             'FRIDAY']
+        self.non_working_days = []
+        # dicts with id, parent_id and cells (column title -> value)
+        self.rows = []
+
+    def column_id(self, title):
+        return 1000 + self.columns.index(title)
+
+    def column_title(self, column_id):
+        return self.columns[column_id - 1000]
+
+    def subtree_end(self, row_id):
+        """Index after the last descendant of row"""
+        ids = {row_id}
+        index = self.row_index(row_id) + 1
+
+        while index < len(self.rows) and self.rows[index]['parent_id'] in ids:
+            ids.add(self.rows[index]['id'])
+            index += 1
+
+        return index
+
+    def row_index(self, row_id):
+        for index, row in enumerate(self.rows):
+            if row['id'] == row_id:
+                return index
+
+        raise KeyError(row_id)
+
+    def children(self, parent_id=None):
+        return [row for row in self.rows if row['parent_id'] == parent_id]
+
+    def touch(self):
+        self.version += 1
+        self.modified_at += datetime.timedelta(minutes=1)
+
+    def to_model(self, rows=True):
+        return models.Sheet(self.to_json(rows=rows))
+
+    def to_json(self, rows=True):
+        sheet = {
+            'id': self.id,
+            'name': self.name,
+            'permalink': self.permalink,
+            'version': self.version,
+            'modifiedAt': self.modified_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'columns': [{'id': self.column_id(title), 'title': title,
+                         'index': index}
+                        for index, title in enumerate(self.columns)],
+            'projectSettings': {
+                'workingDays': self.working_days,
+                'nonWorkingDays': self.non_working_days,
+            },
+        }
+        if rows:
+            sheet['rows'] = [{
+                'id': row['id'],
+                'rowNumber': number,
+                'parentId': row['parent_id'],
+                'cells': [{'columnId': self.column_id(title),
+                           'value': row['cells'].get(title)}
+                          for title in self.columns],
+            } for number, row in enumerate(self.rows, start=1)]
+
+        return sheet
+
+
+class FakeSheets(object):
+    def __init__(self, client):
+        self._client = client
+
+    def get_sheet(self, sheet_id, row_numbers=None, if_version_after=None,
+                  **kwargs):
+        sheet = self._client.sheet_json(sheet_id, row_numbers, if_version_after)
+        self._client.record('get_sheet', sheet_id, len(sheet.get('rows', [])))
+        return models.Sheet(sheet)
+
+    def list_sheets(self, include_all=False):
+        self._client.record('list_sheets')
+        return FakeIndexResult([models.Sheet({'id': sheet.id,
+                                              'name': sheet.name,
+                                              'permalink': sheet.permalink})
+                                for sheet in self._client.sheets.values()])
+
+    def update_sheet(self, sheet_id, sheet_spec):
+        self._client.record('update_sheet', sheet_id)
+        sheet = self._client.get(sheet_id)
+        sheet.working_days = sheet_spec.project_settings.working_days.to_list()
+        return FakeResponse(sheet.to_model(rows=False))
+
+    def add_columns(self, sheet_id, columns):
+        self._client.record('add_columns', sheet_id)
+        sheet = self._client.get(sheet_id)
+        for column in columns:
+            sheet.columns.insert(column.index, column.title)
+        return FakeResponse(columns)
+
+    def add_rows(self, sheet_id, rows):
+        self._client.record('add_rows', sheet_id, len(rows))
+        sheet = self._client.get(sheet_id)
+
+        locations = set((row.parent_id, row.sibling_id, row.to_top,
+                         row.to_bottom) for row in rows)
+        if len(locations) > 1:
+            raise self._client.api_error(
+                ERROR_MULTIPLE_LOCATIONS,
+                'Specifying multiple row locations is not yet supported.')
+
+        parent_id, sibling_id, to_top, _ = locations.pop()
+        if sibling_id:
+            parent_id = sheet.rows[sheet.row_index(sibling_id)]['parent_id']
+            index = sheet.subtree_end(sibling_id)
+        elif parent_id:
+            index = sheet.row_index(parent_id) + 1
+            if not to_top:
+                index = sheet.subtree_end(parent_id)
+        else:
+            index = 0 if to_top else len(sheet.rows)
+
+        added = []
+        for row in rows:
+            row_id = next(self._client.ids)
+            sheet.rows.insert(index + len(added), {
+                'id': row_id,
+                'parent_id': parent_id,
+                'cells': {sheet.column_title(cell.column_id): cell.value
+                          for cell in row.cells},
+            })
+            added.append(models.Row({'id': row_id, 'parentId': parent_id,
+                                     'cells': [cell.to_dict()
+                                               for cell in row.cells]}))
+        sheet.touch()
+
+        return FakeResponse(added)
+
+    def update_rows(self, sheet_id, rows):
+        self._client.record('update_rows', sheet_id, len(rows))
+        sheet = self._client.get(sheet_id)
+
+        for row in rows:
+            cells = sheet.rows[sheet.row_index(row.id)]['cells']
+            for cell in row.cells:
+                value = cell.object_value if cell.object_value else cell.value
+                cells[sheet.column_title(cell.column_id)] = value
+        sheet.touch()
+
+        return FakeResponse(rows)
+
+
+class FakeHome(object):
+    def __init__(self, client):
+        self._client = client
+
+    def create_sheet_from_template(self, sheet_spec):
+        self._client.record('create_sheet_from_template')
+        sheet = self._client.add_sheet(sheet_spec.name)
+        return FakeResponse(models.Sheet({'id': sheet.id, 'name': sheet.name}))
+
+
+class FakeSmartsheet(object):
+    """
+    Fake client with Sheets and Home endpoints used by handlers.
+
+    Args:
+        throttle: number of following row requests to reject by rate limit
+    """
+    models = models
+
+    def __init__(self, throttle=0):
+        self.sheets = {}
+        self.calls = []
+        self.throttle = throttle
+        self.ids = itertools.count(5000000000)
+        self.Sheets = FakeSheets(self)
+        self.Home = FakeHome(self)
+
+    def add_sheet(self, name, columns=DEFAULT_COLUMNS):
+        sheet = FakeSheet(next(self.ids), name, columns)
+        self.sheets[sheet.id] = sheet
+        return sheet
+
+    def sheet_json(self, sheet_id, row_numbers=None, if_version_after=None):
+        """Sheet as API returns it for get_sheet parameters"""
+        sheet = self.get(sheet_id)
+        if if_version_after is not None and int(if_version_after) >= sheet.version:
+            return {'version': sheet.version}
+
+        content = sheet.to_json()
+        if row_numbers:
+            row_numbers = [int(number) for number in row_numbers]
+            content['rows'] = [row for row in content['rows']
+                               if row['rowNumber'] in row_numbers]
+
+        return content
+
+    def get(self, sheet_id):
+        try:
+            return self.sheets[int(sheet_id)]
+        except KeyError:
+            raise self.api_error(ERROR_NOT_FOUND, 'Not Found')
+
+    def api_error(self, code, message):
+        error = models.Error({'result': models.ErrorResult({
+            'code': code, 'message': message, 'statusCode': 400})})
+        return ApiError(error, '{}: {}'.format(code, message))
+
+    def record(self, name, *args):
+        if name in ('add_rows', 'update_rows') and self.throttle:
+            self.throttle -= 1
+            self.calls.append(('throttled', name))
+            raise self.api_error(ERROR_RATE_LIMIT, 'Rate limit exceeded.')
+
+        self.calls.append((name, ) + args)
+
+    def count(self, name):
+        return len([call for call in self.calls if call[0] == name])
+
+    def errors_as_exceptions(self, value=True):
+        pass
+
+
+class FakeSmartsheetServer(ThreadingHTTPServer):
+    """
+    Local HTTP stand-in of Smartsheet API serving sheets of FakeSmartsheet
+    client (GET /2.0/sheets/<id>), use api_base with real SDK client.
+
+    Args:
+        client: FakeSmartsheet with sheets to serve
+        delay: seconds every response takes
+    """
+    daemon_threads = True
+
+    def __init__(self, client, delay=0):
+        super(FakeSmartsheetServer, self).__init__(('127.0.0.1', 0),
+                                                   FakeSmartsheetRequestHandler)
+        self.client = client
+        self.delay = delay
+        self.requests_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def api_base(self):
+        return 'http://127.0.0.1:{}/2.0'.format(self.server_address[1])
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    @contextlib.contextmanager
+    def track_request(self):
+        with self._lock:
+            self.requests_count += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FakeSmartsheetRequestHandler(BaseHTTPRequestHandler):
+    re_sheet = re.compile(r'^/2\.0/sheets/(?P<id>[0-9]+)(\?(?P<query>.*))?$')
+
+    def do_GET(self):
+        with self.server.track_request():
+            time.sleep(self.server.delay)
+            match = self.re_sheet.match(self.path)
+            if not match:
+                self.send_json(404, {'errorCode': 1006, 'message': 'Not Found'})
+                return
+
+            query = parse_qs(match.group('query') or '')
+            row_numbers = query.get('rowNumbers', [''])[0].split(',')
+            try:
+                sheet = self.server.client.sheet_json(
+                    match.group('id'),
+                    row_numbers=[number for number in row_numbers if number],
+                    if_version_after=query.get('ifVersionAfter', [None])[0])
+            except ApiError as e:
+                self.send_json(404, {'errorCode': e.error.result.code,
+                                     'message': e.error.result.message})
+                return
+
+            self.send_json(200, sheet)
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
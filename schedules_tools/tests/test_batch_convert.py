@@ -0,0 +1,170 @@
+import os
+import pytest
+import sys
+
+import mock
+from schedules_tools import batch_convert, converter
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+MSP_FILE = os.path.join(BASE_DIR, 'schedule_files', 'import-schedule-msp.xml')
+JSON_FILE = os.path.join(BASE_DIR, 'schedule_files', 'import-schedule-json.json')
+
+
+def convert_one(source, target, target_format, **options):
+    job_options = batch_convert.get_default_options()
+    job_options.update(options)
+
+    conv = converter.ScheduleConverter()
+    conv.import_schedule(source, options=job_options)
+    conv.schedule = converter.filter_schedule(conv.schedule, job_options)
+    conv.export_schedule(target, target_format, options=job_options)
+
+    with open(target) as fd:
+        return fd.read()
+
+
+class TestBatchConvert(object):
+    out_dir = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path, monkeypatch):
+        self.out_dir = tmp_path
+        monkeypatch.setenv('TZ', 'UTC')
+
+    def out(self, name):
+        return str(self.out_dir / name)
+
+    def read(self, name):
+        with open(self.out(name)) as fd:
+            return fd.read()
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_run_batch(self, workers):
+        jobs = [
+            {'source': MSP_FILE,
+             'targets': {'html': self.out('msp.html'), 'json': self.out('msp.json')},
+             'flag_hide': ['flag1']},
+            {'source': self.out('missing.json'),
+             'targets': {'json': self.out('missing-out.json')}},
+            {'source': JSON_FILE, 'targets': {'ics': self.out('json.ics')}},
+        ]
+
+        results = batch_convert.run_batch(jobs, {'tz': 'UTC'}, workers=workers)
+
+        assert [result.source for result in results] == [job['source'] for job in jobs]
+        assert [result.ok for result in results] == [True, False, True]
+        assert set(results[0].timings) == {'import', 'html', 'json'}
+        assert results[0].targets == jobs[0]['targets']
+        assert results[1].errors
+
+        assert self.read('msp.html') == convert_one(
+            MSP_FILE, self.out('reference.html'), 'html', tz='UTC', flag_hide=['flag1'])
+        assert self.read('msp.json') == convert_one(
+            MSP_FILE, self.out('reference.json'), 'json', tz='UTC', flag_hide='flag1')
+        assert not os.path.exists(self.out('missing-out.json'))
+
+    def test_failed_export(self):
+        jobs = [{'source': MSP_FILE,
+                 'targets': {'unknown': self.out('msp.unknown'),
+                             'json': self.out('msp.json')}}]
+
+        result = batch_convert.run_batch(jobs, {'tz': 'UTC'}, workers=1)[0]
+
+        assert not result.ok
+        assert 'unknown' in result.errors[0]
+        assert result.targets == {'json': self.out('msp.json')}
+
+    def test_job_environment_restored(self, monkeypatch):
+        monkeypatch.setenv('TZ', 'America/New_York')
+        search_paths = list(converter.discovery.search_paths)
+        jobs = [
+            {'source': MSP_FILE, 'targets': {'abc': self.out('msp.abc')},
+             'tz': 'Europe/Prague',
+             'handlers_path': ['schedules_tools.tests.foohandlers']},
+            # handlers of previous job aren't available
+            {'source': MSP_FILE, 'targets': {'abc': self.out('msp2.abc')},
+             'tz': 'UTC'},
+        ]
+
+        results = batch_convert.run_batch(jobs, workers=1)
+
+        # abc handler is found but can't export, unknown format afterwards
+        assert 'HandlerMissingDeps' in results[0].errors[0]
+        assert 'ScheduleFormatNotSupported' in results[1].errors[0]
+        assert os.environ['TZ'] == 'America/New_York'
+        assert converter.discovery.search_paths == search_paths
+
+    def test_manifest(self):
+        manifest = self.out('manifest.yml')
+        with open(manifest, 'w') as fd:
+            fd.write('\n'.join([
+                'workers: 1',
+                'options:',
+                '  tz: UTC',
+                'jobs:',
+                '  - source: {}'.format(MSP_FILE),
+                '    sort: date_start',
+                '    flat: true',
+                '    targets:',
+                '      json: {}'.format(self.out('msp.json')),
+            ]))
+
+        results = batch_convert.run_manifest(manifest)
+
+        assert results[0].ok
+        assert self.read('msp.json') == convert_one(
+            MSP_FILE, self.out('reference.json'), 'json',
+            tz='UTC', flat=True, sort='dStart')
+
+    @pytest.mark.parametrize('content', [
+        'jobs: {}',
+        'jobs:\n  - source: abc',
+        '- source: abc',
+    ])
+    def test_invalid_manifest(self, content):
+        manifest = self.out('manifest.yml')
+        with open(manifest, 'w') as fd:
+            fd.write(content)
+
+        with pytest.raises(batch_convert.BatchManifestException):
+            batch_convert.load_manifest(manifest)
+
+    def write_cli_manifest(self):
+        manifest = self.out('manifest.yml')
+        with open(manifest, 'w') as fd:
+            fd.write('options: {{tz: UTC}}\njobs:\n  - source: {}\n'
+                     '    targets:\n      json: {}\n'.format(MSP_FILE, self.out('msp.json')))
+
+        return manifest
+
+    def run_cli(self, *args):
+        argv = ['schedule-convert', '--workers', '1'] + list(args)
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch.object(converter, 'setup_logging'), \
+                mock.patch.object(converter.discovery, 'use_handlers_index'):
+            converter.main()
+
+    def test_cli(self):
+        self.run_cli('--batch', self.write_cli_manifest())
+
+        assert self.read('msp.json') == convert_one(
+            MSP_FILE, self.out('reference.json'), 'json', tz='UTC')
+
+    def test_cli_options(self):
+        self.run_cli('--batch', self.write_cli_manifest(),
+                     '--flat', '--sort', 'date_start', '--flag-hide', 'flag1')
+
+        assert self.read('msp.json') == convert_one(
+            MSP_FILE, self.out('reference.json'), 'json',
+            tz='UTC', flat=True, sort='dStart', flag_hide='flag1')
+
+    @pytest.mark.parametrize('args', [
+        [MSP_FILE],
+        ['--target-format', 'ics'],
+        ['--format-target', 'ics=out.ics'],
+    ])
+    def test_cli_options_not_allowed(self, args):
+        with pytest.raises(SystemExit):
+            self.run_cli('--batch', self.write_cli_manifest(), *args)
+
+        assert not os.path.exists(self.out('msp.json'))
@@ -0,0 +1,141 @@
+import datetime
+import os
+import pytest
+
+from schedules_tools import models
+from schedules_tools.converter import ScheduleConverter
+from schedules_tools.tests import create_test_schedule
+
+np = pytest.importorskip('numpy')
+
+from schedules_tools.columnar import (  # noqa: E402
+    ColumnarSchedule, ColumnarScheduleException)
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+MSP_FILE = os.path.join(BASE_DIR, 'schedule_files', 'import-schedule-msp.xml')
+
+
+class TestColumnarSchedule(object):
+    schedule = None
+    columnar = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.schedule = ScheduleConverter().import_schedule(MSP_FILE)
+        self.columnar = ColumnarSchedule.from_schedule(self.schedule)
+
+    def _names(self, mask):
+        return [self.columnar.task_name(row) for row in np.flatnonzero(mask)]
+
+    def test_lossless(self):
+        schedule = self.columnar.to_schedule()
+
+        assert schedule.dump_as_dict() == self.schedule.dump_as_dict()
+        assert self.schedule.diff(schedule) == ''
+
+    def test_lossless_compact(self):
+        self.schedule.make_compact()
+        schedule = ColumnarSchedule.from_schedule(self.schedule).to_schedule()
+
+        assert isinstance(schedule.tasks[0], models.CompactTask)
+        assert schedule.dump_as_dict() == self.schedule.dump_as_dict()
+
+    def test_tree_columns(self):
+        columnar = self.columnar
+        rows_count = len(columnar)
+
+        assert columnar.parent[0] == -1
+        assert columnar.subtree_end[0] == rows_count
+        assert all(columnar.parent[1:] < np.arange(1, rows_count))
+        assert columnar.names[columnar.name_id[0]] == self.schedule.tasks[0].name
+
+    def test_rollup_dates(self):
+        start, finish = self.columnar.rollup_dates()
+
+        def check(tasks, row):
+            for task in tasks:
+                subtree = self.columnar.subtree_end[row]
+                assert start[row] == self.columnar.start[row:subtree].min()
+                assert finish[row] == self.columnar.finish[row:subtree].max()
+                row = check(task.tasks, row + 1)
+            return row
+
+        check(self.schedule.tasks, 0)
+
+    def test_date_bounds(self):
+        top_task = self.schedule.tasks[0]
+
+        assert self.columnar.date_bounds() == (top_task.dStart, top_task.dFinish)
+
+    def test_date_range_mask(self):
+        day = datetime.datetime(2000, 12, 5)
+        mask = self.columnar.date_range_mask(day, day + datetime.timedelta(days=1))
+
+        expected = []
+
+        def walk(tasks):
+            for task in tasks:
+                if task.dFinish >= day and task.dStart <= day + datetime.timedelta(days=1):
+                    expected.append(task.name)
+                walk(task.tasks)
+
+        walk(self.schedule.tasks)
+        assert self._names(mask) == expected
+
+        within = self.columnar.date_range_mask(finish=datetime.datetime.min, within=True)
+        assert not within.any()
+
+    @pytest.mark.parametrize('show,hide', [
+        (['flag1'], None),
+        (['flag2', 'flag3'], None),
+        (None, ['flag1']),
+        (['flag1'], ['flag2']),
+        (['unknown'], None),
+        (None, None),
+    ])
+    def test_filter_flags_mask(self, show, hide):
+        mask = self.columnar.filter_flags_mask(show=show, hide=hide)
+        filtered = self.columnar.to_schedule(mask)
+        if show or hide:
+            filtered.used_flags = self.columnar.used_flags(mask)
+
+        self.schedule.filter_flags(show=show, hide=hide)
+
+        assert filtered.dump_as_dict() == self.schedule.dump_as_dict()
+
+    def test_flags_mask(self):
+        mask = self.columnar.flags_mask(['flag2', 'flag3'])
+
+        expected = []
+
+        def walk(tasks):
+            for task in tasks:
+                if {'flag2', 'flag3'} & set(task.flags):
+                    expected.append(task.name)
+                walk(task.tasks)
+
+        walk(self.schedule.tasks)
+        assert expected
+        assert self._names(mask) == expected
+
+    def test_invalid_mask(self):
+        mask = np.zeros(len(self.columnar), dtype=bool)
+        mask[-1] = True
+
+        with pytest.raises(ColumnarScheduleException):
+            self.columnar.to_schedule(mask)
+
+    def test_many_flags(self):
+        schedule = create_test_schedule()
+        flags = ['flag%d' % i for i in range(100)]
+        schedule.tasks[0].tasks[0].flags = flags
+
+        columnar = ColumnarSchedule.from_schedule(schedule)
+
+        assert columnar.flag_bits.shape == (len(columnar), 2)
+        assert self._names_of(columnar, columnar.flags_mask(['flag99'])) == ['Planning']
+        assert columnar.to_schedule().dump_as_dict() == schedule.dump_as_dict()
+
+    @staticmethod
+    def _names_of(columnar, mask):
+        return [columnar.task_name(row) for row in np.flatnonzero(mask)]
@@ -0,0 +1,167 @@
+import os
+import pytest
+import shutil
+
+import mock
+from schedules_tools import conversion_cache
+from schedules_tools.converter import ScheduleConverter
+from schedules_tools.schedule_handlers.html import ScheduleHandler_html
+from schedules_tools.schedule_handlers.msp import ScheduleHandler_msp
+from schedules_tools.storage_handlers.local import StorageHandler_local
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+MSP_FILE = os.path.join(BASE_DIR, 'schedule_files', 'import-schedule-msp.xml')
+
+
+class TestConversionCache(object):
+    cache = None
+    tmp_dir = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path):
+        self.tmp_dir = tmp_path
+        self.cache = conversion_cache.ConversionCache(str(tmp_path / 'cache'))
+
+    def set_entries(self, count):
+        for i in range(count):
+            self.cache.set('key%d' % i, 'value%d' % i)
+            # distinct last use time
+            path = self.cache._entry_path('key%d' % i)
+            os.utime(path, (1000 + i, 1000 + i))
+
+    def test_get_set(self):
+        assert self.cache.get('key') is None
+        assert self.cache.set('key', {'value': [1, 2]})
+        assert self.cache.get('key') == {'value': [1, 2]}
+
+        assert self.cache.stats == {'hits': 1, 'misses': 1, 'stores': 1,
+                                    'evictions': 0}
+
+    def test_lru_eviction(self):
+        self.cache.max_entries = 3
+        self.set_entries(3)
+
+        # key0 becomes the most recently used
+        assert self.cache.get('key0') == 'value0'
+        self.cache.set('key3', 'value3')
+
+        assert self.cache.get('key1') is None
+        assert self.cache.get('key0') == 'value0'
+        assert self.cache.info()['entries'] == 3
+        assert self.cache.stats['evictions'] == 1
+
+    def test_size_eviction(self):
+        self.set_entries(4)
+        entry_size = self.cache.info()['size'] // 4
+
+        self.cache.max_size = entry_size * 2
+        self.cache.evict()
+
+        assert self.cache.info()['entries'] == 2
+        assert self.cache.get('key3') == 'value3'
+
+    def test_broken_entry(self):
+        self.cache.set('key', 'value')
+        with open(self.cache._entry_path('key'), 'wb') as fd:
+            fd.write(b'broken')
+
+        assert self.cache.get('key') is None
+        assert self.cache.info()['entries'] == 0
+
+
+class TestConverterCache(object):
+    cache = None
+    source = None
+    tmp_dir = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path):
+        self.tmp_dir = tmp_path
+        self.cache = conversion_cache.ConversionCache(str(tmp_path / 'cache'))
+        self.source = str(tmp_path / 'schedule.xml')
+        shutil.copy(MSP_FILE, self.source)
+
+    def import_schedule(self, **options):
+        return ScheduleConverter(cache=self.cache).import_schedule(
+            self.source, options=options)
+
+    def test_import_hit(self):
+        schedule = self.import_schedule()
+
+        with mock.patch.object(ScheduleHandler_msp, 'import_schedule',
+                               side_effect=AssertionError):
+            cached = self.import_schedule()
+
+        assert cached.dump_as_dict() == schedule.dump_as_dict()
+        assert self.cache.stats['hits'] == 1
+
+    def test_import_hit_without_checkout(self):
+        def import_schedule():
+            return ScheduleConverter(cache=self.cache).import_schedule(
+                self.source, schedule_src_format='msp',
+                storage_src_format='local')
+
+        schedule = import_schedule()
+
+        with mock.patch.object(StorageHandler_local, 'get_local_handle',
+                               side_effect=AssertionError):
+            cached = import_schedule()
+
+        assert cached.dump_as_dict() == schedule.dump_as_dict()
+        assert self.cache.stats['hits'] == 1
+
+    def test_import_compact(self):
+        self.import_schedule(compact_tasks=True)
+        schedule = self.import_schedule(compact_tasks=True)
+
+        assert self.cache.stats['hits'] == 1
+        assert schedule.task_cls.__name__ == 'CompactTask'
+        assert schedule.dump_as_dict() == self.import_schedule().dump_as_dict()
+
+    def test_import_miss_on_change(self):
+        self.import_schedule()
+        self.import_schedule(html_title='other options')
+
+        stat = os.stat(self.source)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.import_schedule()
+
+        assert self.cache.stats['hits'] == 0
+        assert self.cache.stats['misses'] == 3
+
+    def test_export_hit(self):
+        converter = ScheduleConverter(cache=self.cache)
+        converter.import_schedule(self.source)
+        output = str(self.tmp_dir / 'out.html')
+        reference = str(self.tmp_dir / 'reference.html')
+
+        result = converter.export_schedule(reference, 'html')
+        with mock.patch.object(ScheduleHandler_html, 'export_schedule',
+                               side_effect=AssertionError):
+            assert converter.export_schedule(output, 'html') == result
+
+        with open(output) as fd, open(reference) as fd_ref:
+            assert fd.read() == fd_ref.read()
+
+        # changed schedule is exported again
+        converter.schedule.tasks[0].name = 'Changed'
+        converter.export_schedule(output, 'html')
+        with open(output) as fd:
+            assert 'Changed' in fd.read()
+
+    def test_not_cacheable_export(self):
+        converter = ScheduleConverter(cache=self.cache)
+        converter.import_schedule(self.source)
+
+        with mock.patch.object(ScheduleHandler_html, 'export_cacheable', False):
+            converter.export_schedule(str(self.tmp_dir / 'out.html'), 'html')
+
+        assert self.cache.info()['entries'] == 1
+
+    def test_export_without_output(self):
+        converter = ScheduleConverter(cache=self.cache)
+        converter.import_schedule(self.source)
+
+        assert converter.export_schedule(None, 'json') == \
+            converter.export_schedule(None, 'json')
+        assert self.cache.info()['entries'] == 1
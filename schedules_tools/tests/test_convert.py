@@ -1,11 +1,15 @@
 import datetime
 import os
 import pytest
+import sys
 import tempfile
 
 import mock
 from schedules_tools import converter
 from schedules_tools.models import Schedule
+from schedules_tools.schedule_handlers.jsonstruct import (
+    ScheduleHandler_json, get_json_backend)
+from schedules_tools.schedule_handlers.msp import ScheduleHandler_msp
 from schedules_tools.storage_handlers import StorageBase
 
 
@@ -240,3 +244,158 @@ class TestConverter(BaseTestConvert):
 
         # Test1 - Development
         assert 'https://github.com/1' == schedule.tasks[0].tasks[0].tasks[0].link
+
+
+class TestSourceSniffing(object):
+    file_msp = os.path.join(CURR_DIR, DATA_DIR, 'import-schedule-msp.xml')
+    file_json = os.path.join(CURR_DIR, DATA_DIR, 'import-schedule-json.json')
+
+    @staticmethod
+    def _handler_name(handle):
+        return converter.ScheduleConverter._get_schedule_handler_cls(
+            handle=handle).__name__
+
+    def test_sniff_without_parsing(self):
+        with mock.patch.object(ScheduleHandler_msp, 'is_valid_source',
+                               side_effect=AssertionError), \
+                mock.patch.object(ScheduleHandler_json, 'is_valid_source',
+                                  side_effect=AssertionError):
+            assert self._handler_name(self.file_msp) == 'ScheduleHandler_msp'
+            assert self._handler_name(self.file_json) == 'ScheduleHandler_json'
+
+    @pytest.mark.parametrize('sniffed', [True, None])
+    def test_json_parsed_once(self, sniffed):
+        backend = get_json_backend()
+        with mock.patch.object(ScheduleHandler_json, 'sniff_source',
+                               return_value=sniffed), \
+                mock.patch.object(backend, 'loads', wraps=backend.loads) as mock_load:
+            schedule = converter.ScheduleConverter().import_schedule(self.file_json)
+
+        assert mock_load.call_count == 1
+        assert not schedule.errors_import
+        assert not ScheduleHandler_json._parsed_sources
+
+    def test_root_out_of_head(self, tmp_path):
+        with open(self.file_msp, 'rb') as fd:
+            declaration, content = fd.read().split(b'\n', 1)
+
+        comment = b'<!-- ' + b'x' * converter.SOURCE_HEAD_SIZE + b' -->'
+        handle = str(tmp_path / 'schedule.xml')
+        with open(handle, 'wb') as fd:
+            fd.write(b'\n'.join([declaration, comment, content]))
+
+        assert ScheduleHandler_msp.sniff_source(
+            handle, comment[:converter.SOURCE_HEAD_SIZE]) is None
+        assert self._handler_name(handle) == 'ScheduleHandler_msp'
+
+    def test_stbin_source(self, tmp_path):
+        conv = converter.ScheduleConverter()
+        conv.import_schedule(self.file_msp)
+        handle = str(tmp_path / 'schedule.bin')
+        conv.export_schedule(handle, 'stbin')
+
+        assert self._handler_name(handle) == 'ScheduleHandler_stbin'
+        schedule = converter.ScheduleConverter().import_schedule(handle)
+        assert schedule.dump_as_dict() == conv.schedule.dump_as_dict()
+
+    def test_not_a_file(self, tmp_path):
+        assert converter.ScheduleConverter._read_handle_head('1234567890') is None
+        assert converter.ScheduleConverter._read_handle_head(str(tmp_path)) is None
+
+
+class TestExportSchedules(object):
+    file_msp = os.path.join(CURR_DIR, DATA_DIR, 'import-schedule-msp.xml')
+    out_dir = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path):
+        self.out_dir = tmp_path
+
+    def out(self, name):
+        return str(self.out_dir / name)
+
+    @staticmethod
+    def read(filename):
+        with open(filename) as fd:
+            # skip ics timestamp of export
+            return [line for line in fd if not line.startswith('DTSTAMP')]
+
+    def import_msp(self):
+        conv = converter.ScheduleConverter()
+        conv.import_schedule(self.file_msp)
+        return conv
+
+    def test_same_as_single_exports(self):
+        formats = ['html', 'ics', 'json', 'msp']
+        targets = {fmt: self.out('multi.' + fmt) for fmt in formats}
+
+        exports = self.import_msp().export_schedules(targets)
+
+        assert list(exports) == formats
+        for fmt in formats:
+            assert exports[fmt]['error'] is None
+            assert exports[fmt]['output'] == targets[fmt]
+
+            self.import_msp().export_schedule(self.out('single.' + fmt), fmt)
+            assert self.read(targets[fmt]) == self.read(self.out('single.' + fmt))
+
+    def test_failed_export(self):
+        targets = {'unknown': self.out('out.unknown'), 'json': None}
+
+        exports = self.import_msp().export_schedules(
+            targets, default_output=self.out('schedule.txt'))
+
+        assert isinstance(exports['unknown']['error'],
+                          converter.ScheduleFormatNotSupported)
+        assert exports['json']['error'] is None
+        assert exports['json']['output'] == self.out('schedule.json')
+        assert os.path.exists(self.out('schedule.json'))
+
+    def test_cli(self):
+        argv = ['schedule-convert', '--tz', 'UTC',
+                '--target-format', 'html,json',
+                '--format-target', 'json={}'.format(self.out('out.json')),
+                self.file_msp, self.out('schedule.txt')]
+
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch.object(converter, 'setup_logging'), \
+                mock.patch.object(converter.discovery, 'use_handlers_index'):
+            converter.main()
+
+        assert os.path.exists(self.out('schedule.html'))
+        assert os.path.exists(self.out('out.json'))
+        assert not os.path.exists(self.out('schedule.txt'))
+
+    @pytest.mark.parametrize('options', [
+        ['--flag-hide', 'flag1'],
+        ['--flag-show', 'flag1'],
+        ['--flat'],
+        ['--milestones'],
+        ['--sort', 'name'],
+    ])
+    def test_cli_stbin_view_filters(self, options):
+        stbin = self.out('schedule.stbin')
+        self.import_msp().export_schedule(stbin, 'stbin')
+
+        for view_option, target in ([], 'schedule.json'), (['--stbin-view'], 'view.json'):
+            argv = (['schedule-convert', '--tz', 'UTC', '--target-format', 'json']
+                    + view_option + options + [stbin, self.out(target)])
+            with mock.patch.object(sys, 'argv', argv), \
+                    mock.patch.object(converter, 'setup_logging'), \
+                    mock.patch.object(converter.discovery, 'use_handlers_index'):
+                converter.main()
+
+        assert self.read(self.out('view.json')) == self.read(self.out('schedule.json'))
+
+    def test_cli_format_target_only(self):
+        argv = ['schedule-convert', '--tz', 'UTC', '--target-format', 'html',
+                '--format-target', 'json={}'.format(self.out('out.json')),
+                self.file_msp, self.out('schedule.txt')]
+
+        with mock.patch.object(sys, 'argv', argv), \
+                mock.patch.object(converter, 'setup_logging'), \
+                mock.patch.object(converter.discovery, 'use_handlers_index'):
+            converter.main()
+
+        assert os.path.exists(self.out('schedule.html'))
+        assert os.path.exists(self.out('out.json'))
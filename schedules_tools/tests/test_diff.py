@@ -2,10 +2,15 @@ import datetime
 import json
 import pytest
 import os
+import random
 
+from schedules_tools import diff, models
 from schedules_tools.tests import create_test_schedule
 from schedules_tools.converter import ScheduleConverter
-from schedules_tools.diff import ScheduleDiff
+from schedules_tools.diff import (
+    REPORT_CHANGED, REPORT_NO_CHANGE, REPORT_REMOVED, SCORE_BOUND_EPSILON,
+    TASK_SCORE_THRESHOLD, ScheduleDiff, common_prefix_length, strings_similarity,
+    strings_similarity_many, strings_similarity_upper_bound)
 
 BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 
@@ -169,3 +174,130 @@ class TestScheduleDiff(object):
 
 class TestDiffCLI(object):
     pass
+
+
+class ScanScheduleDiff(ScheduleDiff):
+    """ScheduleDiff evaluating all possible matches one by one"""
+
+    def find_best_match(self, t1, possible_matches, start_at_index=0, tasks_index=None):
+        match_index = None
+        best_match = {
+            'state': REPORT_REMOVED,
+            'changes': [],
+            'name_score': 0,
+            'score': TASK_SCORE_THRESHOLD
+        }
+
+        for i, t2 in enumerate(possible_matches[start_at_index:], start_at_index):
+            res = self.eval_tasks(t1, t2, i, name_threshold=best_match['name_score'])
+
+            if res['state'] is REPORT_CHANGED and res['score'] > best_match['score']:
+                match_index = i
+                best_match = res
+
+            if res['state'] is REPORT_NO_CHANGE:
+                match_index = i
+                best_match = res
+                break
+
+        return match_index, best_match
+
+
+class TestTasksMatching(object):
+    names = ['Planning', 'Plannig', 'Development', 'Devel', 'Testing', 'Test',
+             'aaaaaa', 'aaa', 'Release 1.0', 'Release 1.1', '']
+
+    def _random_tasks(self, schedule, rand, level=1):
+        tasks = []
+        for _ in range(rand.randint(0, 12 // level)):
+            task = models.Task(schedule, level=level)
+            task.name = rand.choice(self.names)
+            task.dStart = datetime.datetime(2020, 1, rand.randint(1, 3))
+            task.dFinish = task.dStart + datetime.timedelta(days=rand.randint(0, 1))
+            if level < 3 and rand.random() < 0.3:
+                task.tasks = self._random_tasks(schedule, rand, level + 1)
+            tasks.append(task)
+
+        return tasks
+
+    @pytest.mark.parametrize('seed', range(50))
+    @pytest.mark.parametrize('batch_min_tasks', [0, diff.BATCH_SIMILARITY_MIN_TASKS])
+    def test_same_as_scan(self, seed, batch_min_tasks, monkeypatch):
+        monkeypatch.setattr(diff, 'BATCH_SIMILARITY_MIN_TASKS', batch_min_tasks)
+        rand = random.Random(seed)
+        schedule_a = models.Schedule()
+        schedule_b = models.Schedule()
+        schedule_a.tasks = self._random_tasks(schedule_a, rand)
+        schedule_b.tasks = self._random_tasks(schedule_b, rand)
+
+        schedule_diff = ScheduleDiff(schedule_a, schedule_b)
+        scan_diff = ScanScheduleDiff(schedule_a, schedule_b)
+
+        assert schedule_diff.dump_json(sort_keys=True) == scan_diff.dump_json(sort_keys=True)
+
+    def test_wide_list(self):
+        schedule_a = models.Schedule()
+        schedule_b = models.Schedule()
+
+        for i in range(300):
+            task = models.Task(schedule_a)
+            task.name = 'Task %d' % i
+            task.dStart = task.dFinish = datetime.datetime(2020, 1, 1)
+            schedule_a.tasks.append(task)
+
+            if i % 10:
+                task_b = models.Task(schedule_b)
+                task_b.name = task.name if i % 7 else task.name + ' renamed'
+                task_b.dStart = task_b.dFinish = task.dStart
+                schedule_b.tasks.append(task_b)
+
+        schedule_diff = ScheduleDiff(schedule_a, schedule_b)
+        scan_diff = ScanScheduleDiff(schedule_a, schedule_b)
+
+        assert schedule_diff.dump_json(sort_keys=True) == scan_diff.dump_json(sort_keys=True)
+
+    def test_upper_bound(self):
+        rand = random.Random(42)
+        for _ in range(2000):
+            str1 = ''.join(rand.choice('abc ') for _ in range(rand.randint(1, 10)))
+            str2 = ''.join(rand.choice('abc ') for _ in range(rand.randint(1, 10)))
+            present_chars = len([char for char in str1 if char in str2])
+            bound = strings_similarity_upper_bound(
+                len(str1), len(str2), common_prefix_length(str1, str2), present_chars)
+
+            assert strings_similarity(str1, str2) <= bound + SCORE_BOUND_EPSILON
+            assert strings_similarity(str1, str2, winkler=False) <= bound + SCORE_BOUND_EPSILON
+
+
+class TestStringsSimilarityMany(object):
+
+    def _random_strings(self, rand, count):
+        return [''.join(rand.choice('abc \u00e9\U0001f600') for _ in range(rand.randint(0, 12)))
+                for _ in range(count)]
+
+    @pytest.mark.parametrize('numpy_available', [True, False])
+    @pytest.mark.parametrize('winkler', [True, False])
+    def test_same_as_strings_similarity(self, numpy_available, winkler, monkeypatch):
+        if numpy_available and not diff.numpy_available:
+            pytest.skip('numpy not installed')
+        monkeypatch.setattr(diff, 'numpy_available', numpy_available)
+
+        rand = random.Random(42)
+        for _ in range(200):
+            str1 = self._random_strings(rand, 1)[0]
+            strings = self._random_strings(rand, rand.randint(0, 30)) + [str1]
+
+            expected = [strings_similarity(str1, str2, winkler=winkler) for str2 in strings]
+            assert strings_similarity_many(str1, strings, winkler=winkler) == expected
+
+    def test_char_matches_from_index(self):
+        pytest.importorskip('numpy')
+        rand = random.Random(42)
+        strings = self._random_strings(rand, 50)
+        similarity_index = diff.StringsSimilarityIndex(strings)
+
+        all_matches = similarity_index.char_matches('abc abc')
+        matches = similarity_index.char_matches('abc abc', start_at_index=20)
+
+        assert matches[0][20:] == all_matches[0][20:]
+        assert matches[1][20:] == all_matches[1][20:]
@@ -0,0 +1,113 @@
+import os
+import sys
+import pytest
+
+from schedules_tools import discovery
+
+
+HANDLER_TEMPLATE = '''
+from schedules_tools.schedule_handlers import ScheduleHandlerBase
+
+
+class ScheduleHandler_{name}(ScheduleHandlerBase):
+    provide_export = {provide_export}
+    handle_deps_satisfied = True
+    default_export_ext = '{name}'
+'''
+
+
+class TestHandlersIndex(object):
+    package = 'indexed_foohandlers'
+    package_dir = None
+    index_path = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, tmp_path, monkeypatch):
+        self.package_dir = tmp_path / self.package
+        self.package_dir.mkdir()
+        (self.package_dir / '__init__.py').write_text('')
+        self.write_handler('idx', provide_export=True)
+        self.index_path = str(tmp_path / 'cache' / 'handlers-index.json')
+
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.setattr(discovery, 'search_paths',
+                            discovery.search_paths + [self.package])
+        monkeypatch.setattr(discovery, 'handlers_index', None)
+        yield
+        self.unload()
+        discovery.schedule_handlers.reset_discovery()
+        discovery.storage_handlers.reset_discovery()
+
+    def write_handler(self, name, provide_export=False, module='handler'):
+        path = self.package_dir / '{}.py'.format(module)
+        path.write_text(HANDLER_TEMPLATE.format(
+            name=name, provide_export=provide_export))
+
+        # make sure mtime differs even on coarse-grained filesystems
+        mtime = os.stat(str(path)).st_mtime + len(name)
+        os.utime(str(path), (mtime, mtime))
+
+    def unload(self):
+        for name in list(sys.modules):
+            if name.startswith(self.package):
+                del sys.modules[name]
+
+    def discover(self):
+        self.unload()
+        discovery.use_handlers_index(self.index_path)
+        return discovery.schedule_handlers
+
+    def test_index_created(self):
+        handlers = self.discover()
+
+        assert 'idx' in handlers.keys()
+        assert 'json' in handlers.keys()
+        assert 'idx' in handlers.provided_exports
+        assert os.path.exists(self.index_path)
+
+    def test_lazy_import(self):
+        self.discover().keys()
+        handlers = self.discover()
+
+        assert handlers['idx']['provide_export'] is True
+        assert handlers['idx']['default_export_ext'] == 'idx'
+        assert self.package + '.handler' not in sys.modules
+
+        handler_cls = handlers['idx']['class']
+
+        assert handler_cls.__name__ == 'ScheduleHandler_idx'
+        assert self.package + '.handler' in sys.modules
+
+    def test_invalidated_by_mtime(self):
+        assert 'idx' in self.discover().keys()
+
+        self.write_handler('idxchanged')
+        handlers = self.discover()
+
+        assert 'idx' not in handlers.keys()
+        assert handlers['idxchanged']['provide_export'] is False
+        assert 'idxchanged' not in handlers.provided_exports
+
+    def test_new_module(self):
+        self.discover().keys()
+        self.write_handler('idxnew', module='other')
+
+        assert {'idx', 'idxnew'} <= set(self.discover().keys())
+
+    def test_broken_index(self):
+        os.makedirs(os.path.dirname(self.index_path))
+        with open(self.index_path, 'w') as fd:
+            fd.write('{broken')
+
+        assert 'idx' in self.discover().keys()
+
+    def test_same_as_import_discovery(self):
+        discovery.schedule_handlers.force_run_discovery()
+        imported = {key: val['provide_export']
+                    for key, val in discovery.schedule_handlers.items()}
+
+        handlers = self.discover()
+        handlers.keys()
+
+        assert {key: val['provide_export']
+                for key, val in handlers.items()} == imported
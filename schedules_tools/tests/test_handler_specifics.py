@@ -1,6 +1,29 @@
+import datetime
 import logging
+import os
+import pickle
+import pytest
 
 from schedules_tools import models
+from schedules_tools.conversion_cache import ConversionCache
+from schedules_tools.converter import ScheduleConverter
+from schedules_tools.schedule_handlers import msp
+from schedules_tools.schedule_handlers.msp import (
+    MSP_NAMESPACE, MSPImportException, ScheduleHandler_msp)
+from schedules_tools.diff import ScheduleDiff
+from schedules_tools.schedule_handlers.html import ScheduleHandler_html
+from schedules_tools.schedule_handlers import smart_sheet
+from schedules_tools.schedule_handlers.smart_sheet import (
+    ClientPool, PermalinkIndex, ScheduleHandler_smartsheet,
+    SmartSheetExportException, SmartSheetImportException, TokenBucket)
+from schedules_tools.schedule_handlers.jsonstruct import (
+    JSON_BACKENDS, JSONBackendNotAvailable, JSONImportException,
+    ScheduleHandler_json)
+from schedules_tools.schedule_handlers.stbin import (
+    MAGIC, ScheduleHandler_stbin, ScheduleView, StbinFormatException,
+    open_schedule_view)
+from schedules_tools.tests.smartsheet_fake import (
+    FakeSmartsheet, FakeSmartsheetServer)
 
 logging.basicConfig()
 
@@ -119,3 +142,618 @@ class TestUnit_msp_parseExtAttrs(object):
             self._inject_value(pattern)
             assert set(self.task.flags) != flags
             assert self.schedule.used_flags != set()
+
+
+class TestUnit_msp_import(object):
+    basedir = os.path.dirname(os.path.realpath(__file__))
+    import_file = os.path.join(basedir, 'schedule_files', 'import-schedule-msp.xml')
+
+    def test_import_without_namespace(self, tmpdir):
+        with open(self.import_file) as fd:
+            content = fd.read()
+
+        no_ns_file = tmpdir.join('import-schedule-msp-no-ns.xml')
+        no_ns_file.write(content.replace(' xmlns="{}"'.format(MSP_NAMESPACE), ''))
+
+        schedule = ScheduleHandler_msp(handle=self.import_file).import_schedule()
+        schedule_no_ns = ScheduleHandler_msp(handle=str(no_ns_file)).import_schedule()
+
+        assert schedule.diff(schedule_no_ns) == ''
+        assert schedule.tasks[0].desc_tasks_count == 8
+        assert schedule.used_flags == schedule_no_ns.used_flags
+
+    def test_import_drops_processed_sections(self, monkeypatch):
+        contexts = []
+        iterparse = msp.etree.iterparse
+
+        def tracked_iterparse(*args, **kwargs):
+            contexts.append(iterparse(*args, **kwargs))
+            return contexts[-1]
+
+        monkeypatch.setattr(msp.etree, 'iterparse', tracked_iterparse)
+        ScheduleHandler_msp(handle=self.import_file).import_schedule()
+
+        # only last (cleared) section stays in the tree
+        root = contexts[0].root
+        assert len(root) == 1
+        assert len(root[0]) == 0
+
+    def test_import_missing_name(self, tmpdir):
+        project_file = tmpdir.join('import-schedule-msp-no-name.xml')
+        project_file.write('<Project xmlns="{}"><Tasks/></Project>'.format(MSP_NAMESPACE))
+
+        with pytest.raises(MSPImportException):
+            ScheduleHandler_msp(handle=str(project_file)).import_schedule()
+
+    def test_it_phase_names(self, tmpdir):
+        task_fmt = ('<Task><ID>{0}</ID><Name>{1}</Name><OutlineLevel>{2}</OutlineLevel>'
+                    '<Priority>500</Priority><Start>2000-01-0{0}T08:00:00</Start>'
+                    '<Milestone>0</Milestone></Task>')
+        tasks = [
+            ('Develop', 1),
+            ('Test', 2),
+            ('Launch', 3),  # only levels 1 and 2 are mapped
+            ('Planning', 2),
+            ('Planning Phase', 3),  # full name present later in the document
+        ]
+        project_file = tmpdir.join('import-schedule-msp-phases.xml')
+        project_file.write('<Project xmlns="{}"><Name>Phases</Name><Tasks>{}</Tasks></Project>'.format(
+            MSP_NAMESPACE,
+            ''.join(task_fmt.format(i, name, level) for i, (name, level) in enumerate(tasks, 1))))
+
+        schedule = ScheduleHandler_msp(handle=str(project_file)).import_schedule()
+        develop = schedule.tasks[0]
+
+        assert develop.name == 'Development Phase'
+        assert [t.name for t in develop.tasks] == ['Testing Phase', 'Planning']
+        assert develop.tasks[0].tasks[0].name == 'Launch'
+        assert develop.tasks[1].tasks[0].name == 'Planning Phase'
+
+    def test_workaround_it_phase_names(self):
+        fix_name = models.Task._workaround_it_phase_names
+
+        assert fix_name('Concept', 1, set()) == 'Concept Phase'
+        assert fix_name('Concept', 1, {'Concept Phase'}) == 'Concept'
+        assert fix_name('Concept', 3, set()) == 'Concept'
+        assert fix_name('Unknown', 2, set()) == 'Unknown'
+
+    def test_load_tasks_level(self):
+        handler = ScheduleHandler_msp()
+        handler.schedule = models.Schedule()
+
+        def record(level, name, day=1):
+            if name is None:
+                return level, None
+
+            task = models.Task(handler.schedule, level=level)
+            task.name = name
+            task.dStart = task.dFinish = datetime.datetime(2000, 1, day)
+            return level, task
+
+        records = [
+            record(2, 'orphan'),  # no parent yet - skipped
+            record(1, 'A', 3),
+            record(2, 'A.1'),
+            record(3, None),  # not importable
+            record(3, 'A.1.1', 9),
+            record(2, None),
+            record(2, 'A.2'),
+            record(1, 'B', 2),
+        ]
+        tasks = handler._load_tasks_level(1, iter(records))
+
+        assert [t.name for t in tasks] == ['A', 'B']
+        assert [t.name for t in tasks[0].tasks] == ['A.1', 'A.2']
+        assert [t.name for t in tasks[0].tasks[0].tasks] == ['A.1.1']
+        assert handler.schedule.dStart == datetime.datetime(2000, 1, 1)
+        assert handler.schedule.dFinish == datetime.datetime(2000, 1, 9)
+
+
+class TestUnit_json(object):
+    basedir = os.path.dirname(os.path.realpath(__file__))
+    import_file = os.path.join(basedir, 'schedule_files', 'import-schedule-json.json')
+
+    @pytest.mark.parametrize('backend', list(JSON_BACKENDS))
+    @pytest.mark.parametrize('compact', [False, True])
+    def test_backend_roundtrip(self, tmpdir, backend, compact):
+        options = {'json_backend': backend, 'json_compact': compact}
+        schedule = ScheduleHandler_json(handle=self.import_file).import_schedule()
+        path = str(tmpdir.join('schedule.json'))
+
+        assert ScheduleHandler_json(schedule=schedule,
+                                    options=options).export_schedule(path) is None
+        imported = ScheduleHandler_json(handle=path, options=options).import_schedule()
+
+        assert imported.dump_as_dict() == schedule.dump_as_dict()
+        assert tmpdir.join('schedule.json').read_text('utf-8') == ScheduleHandler_json(
+            schedule=schedule, options=options).export_schedule()
+
+    @pytest.mark.parametrize('backend', list(JSON_BACKENDS))
+    def test_import_malformed(self, tmpdir, backend):
+        path = tmpdir.join('schedule.json')
+        path.write('{"name": broken')
+
+        with pytest.raises(JSONImportException):
+            ScheduleHandler_json(handle=str(path),
+                                 options={'json_backend': backend}).import_schedule()
+
+        schedule = ScheduleConverter().import_schedule(
+            str(path), options={'json_backend': backend})
+        assert [error[0] for error in schedule.errors_import] == [
+            'JSONImportException']
+
+    def test_unknown_backend(self):
+        with pytest.raises(JSONBackendNotAvailable):
+            ScheduleHandler_json(handle=self.import_file,
+                                 options={'json_backend': 'unknown'}).import_schedule()
+
+
+class TestUnit_stbin(object):
+    basedir = os.path.dirname(os.path.realpath(__file__))
+    import_file = os.path.join(basedir, 'schedule_files', 'import-schedule-msp.xml')
+
+    def roundtrip(self, schedule, path, **options):
+        ScheduleHandler_stbin(schedule=schedule).export_schedule(path)
+
+        return ScheduleHandler_stbin(handle=path, options=options).import_schedule()
+
+    @pytest.mark.parametrize('options', [{}, {'stbin_mmap': True}])
+    def test_roundtrip(self, tmpdir, options):
+        schedule = ScheduleHandler_msp(handle=self.import_file).import_schedule()
+        imported = self.roundtrip(schedule, str(tmpdir.join('schedule.stbin')),
+                                  **options)
+
+        assert imported.dump_as_dict() == schedule.dump_as_dict()
+        assert imported.diff(schedule) == ''
+        assert imported.tasks[0].tasks[0]._schedule is imported
+
+    def test_roundtrip_extra_attrs(self, tmpdir):
+        schedule = models.Schedule()
+        schedule.name = 'Extra'
+        schedule.dStart = datetime.datetime(2000, 1, 1)
+        schedule.mtime = datetime.datetime(2000, 1, 2, tzinfo=datetime.timezone.utc)
+        schedule.changelog = {3: {'user': 'me', 'date': datetime.date(2000, 1, 2),
+                                  'msg': 'ž'}}
+        schedule.used_flags = {'a', 'b'}
+
+        task = models.Task(schedule, level=1)
+        task.index = '1.2'
+        task.name = ''
+        task.priority = 2 ** 40
+        task.p_complete = 50
+        task.milestone = 1
+        task.duration = datetime.timedelta(hours=8)
+        task.dStart = datetime.datetime(1900, 1, 1)
+        task.resource = ('x', None)
+        task.flags = ['a', 'b']
+
+        subtask = models.Task(schedule, level=2)
+        subtask.dFinish = datetime.datetime.max
+        subtask.flags = ['a', 'b']
+        task.tasks.append(subtask)
+        schedule.tasks.append(task)
+        schedule.tasks.append(models.Task(schedule, level=1))
+
+        imported = self.roundtrip(schedule, str(tmpdir.join('schedule.stbin')))
+
+        assert imported.dump_as_dict() == schedule.dump_as_dict()
+        assert imported.mtime.tzinfo is not None
+        assert type(imported.tasks[0].p_complete) is int
+        assert imported.tasks[0].tasks[0].flags is not imported.tasks[0].flags
+
+    def test_invalid_source(self, tmpdir):
+        path = tmpdir.join('schedule.stbin')
+        path.write_binary(MAGIC)
+
+        assert ScheduleHandler_stbin.is_valid_source(str(path))
+        assert ScheduleHandler_stbin.sniff_source(str(path), MAGIC + b'...')
+        assert not ScheduleHandler_stbin.is_valid_source(self.import_file)
+        assert not ScheduleHandler_stbin.is_valid_source(str(tmpdir.join('missing')))
+
+        with pytest.raises(StbinFormatException):
+            ScheduleHandler_stbin(handle=str(path)).import_schedule()
+
+    def test_view(self, tmpdir, capsys):
+        schedule = ScheduleHandler_msp(handle=self.import_file).import_schedule()
+        path = str(tmpdir.join('schedule.stbin'))
+        ScheduleHandler_stbin(schedule=schedule).export_schedule(path)
+
+        view = ScheduleHandler_stbin(handle=path,
+                                     options={'stbin_view': True}).import_schedule()
+        assert isinstance(view, ScheduleView)
+        # subtasks created on access
+        assert view.tasks[0]._tasks is None
+
+        assert view.dump_as_dict() == schedule.dump_as_dict()
+
+        def check_attrs(view_tasks, tasks):
+            assert len(view_tasks) == len(tasks)
+            for view_task, task in zip(view_tasks, tasks):
+                for key, val in task._get_attrs().items():
+                    if key not in ('tasks', '_schedule', '_subtree_hash_cache'):
+                        assert getattr(view_task, key) == val
+                check_attrs(view_task.tasks, task.tasks)
+
+        check_attrs(view.tasks, schedule.tasks)
+        assert view.materialize().dump_as_dict() == schedule.dump_as_dict()
+        assert pickle.loads(pickle.dumps(view)).dump_as_dict() == schedule.dump_as_dict()
+
+        check = {'Test project 10': False, 'Missing': True}
+        assert view.check_for_taskname(check) == schedule.check_for_taskname(check)
+
+        view.print_tasks()
+        view_output = capsys.readouterr().out
+        schedule.print_tasks()
+        assert view_output == capsys.readouterr().out
+
+        assert str(ScheduleDiff(view, schedule)) == str(ScheduleDiff(schedule, schedule))
+
+        html_view, html = tmpdir.join('view.html'), tmpdir.join('schedule.html')
+        ScheduleHandler_html(schedule=view).export_schedule(str(html_view))
+        ScheduleHandler_html(schedule=schedule).export_schedule(str(html))
+        assert html_view.read() == html.read()
+
+    def test_view_read_only(self, tmpdir):
+        path = str(tmpdir.join('schedule.stbin'))
+        schedule = ScheduleHandler_msp(handle=self.import_file).import_schedule()
+        ScheduleHandler_stbin(schedule=schedule).export_schedule(path)
+        task = open_schedule_view(path).tasks[0]
+
+        with pytest.raises(AttributeError):
+            task.name = 'Changed'
+        with pytest.raises(AttributeError):
+            task.tasks = []
+        with pytest.raises(AttributeError):
+            task.unknown
+
+        assert task.duration is None
+
+
+class TestUnit_smartsheet(object):
+    basedir = os.path.dirname(os.path.realpath(__file__))
+    import_file = os.path.join(basedir, 'schedule_files', 'import-schedule-msp.xml')
+    schedule = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, monkeypatch):
+        monkeypatch.setattr(smart_sheet, 'RETRY_BACKOFF', 0)
+        self.schedule = ScheduleHandler_msp(handle=self.import_file).import_schedule()
+
+    def all_tasks(self, tasks):
+        for task in tasks:
+            yield task
+            yield from self.all_tasks(task.tasks)
+
+    def export(self, client):
+        handler = ScheduleHandler_smartsheet(schedule=self.schedule)
+        handler._client_instance = client
+
+        return client.sheets[handler.export_schedule()]
+
+    def assert_exported_tree(self, sheet, tasks, parent_id=None):
+        rows = sheet.children(parent_id)
+
+        assert [row['cells']['Task Name'] for row in rows] == [t.name for t in tasks]
+        for row, task in zip(rows, tasks):
+            self.assert_exported_tree(sheet, task.tasks, row['id'])
+
+    def test_export_bulk(self):
+        client = FakeSmartsheet()
+        sheet = self.export(client)
+
+        tasks = list(self.all_tasks(self.schedule.tasks))
+        parents_count = len([task for task in tasks if task.tasks])
+        self.assert_exported_tree(sheet, self.schedule.tasks)
+        assert len(sheet.rows) == len(tasks)
+        assert client.count('add_rows') == parents_count + 1
+
+    def test_export_batch_size(self, monkeypatch):
+        monkeypatch.setattr(smart_sheet, 'ADD_ROWS_BATCH_SIZE', 2)
+        client = FakeSmartsheet()
+        sheet = self.export(client)
+
+        self.assert_exported_tree(sheet, self.schedule.tasks)
+        assert max(call[2] for call in client.calls if call[0] == 'add_rows') == 2
+
+    def test_export_throttled(self):
+        client = FakeSmartsheet(throttle=3)
+        sheet = self.export(client)
+
+        self.assert_exported_tree(sheet, self.schedule.tasks)
+        assert client.count('throttled') == 3
+
+    def test_export_throttled_too_long(self, monkeypatch):
+        monkeypatch.setattr(smart_sheet, 'RETRY_ATTEMPTS', 2)
+
+        with pytest.raises(SmartSheetExportException):
+            self.export(FakeSmartsheet(throttle=3))
+
+
+class TestUnit_smartsheet_fetch(object):
+    client = None
+    server = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.client = FakeSmartsheet()
+        self.server = FakeSmartsheetServer(self.client, delay=0.1)
+        self.server.start()
+        yield
+        self.server.stop()
+
+    def add_sheet(self, name, tasks_count=3):
+        sheet = self.client.add_sheet(name)
+        for i in range(tasks_count):
+            sheet.rows.append({
+                'id': next(self.client.ids),
+                'parent_id': None,
+                'cells': {'Task Name': 'Task %d' % i, 'Duration': '1d',
+                          'Start': '2020-01-0%dT08:00:00' % (i + 1),
+                          'Finish': '2020-01-0%dT17:00:00' % (i + 1)},
+            })
+
+        return sheet.id
+
+    def import_schedules(self, handles, **kwargs):
+        options = {'smartsheet_token': 'fake',
+                   'smartsheet_api_base': self.server.api_base}
+
+        return ScheduleHandler_smartsheet.import_schedules(handles, options,
+                                                           **kwargs)
+
+    def test_import_schedules(self):
+        names = ['Sheet %d' % i for i in range(8)]
+        handles = [self.add_sheet(name) for name in names]
+        schedules = self.import_schedules(handles, workers=4)
+
+        assert [schedule.name for schedule in schedules] == names
+        assert [t.name for t in schedules[-1].tasks] == ['Task 0', 'Task 1', 'Task 2']
+        assert self.server.requests_count == len(handles)
+        assert self.server.max_in_flight > 1
+
+    def test_import_schedules_missing(self):
+        handles = [self.add_sheet('Sheet'), 1]
+
+        with pytest.raises(SmartSheetImportException):
+            self.import_schedules(handles)
+
+        schedule, error = self.import_schedules(handles, return_exceptions=True)
+        assert schedule.name == 'Sheet'
+        assert isinstance(error, SmartSheetImportException)
+
+    def test_token_bucket(self):
+        now = [0.0]
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=10, capacity=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(4):
+            bucket.acquire()
+        now[0] += 1
+        bucket.acquire()
+
+        assert waits == pytest.approx([0.1, 0.1])
+
+
+class TestUnit_smartsheet_permalinks(object):
+    client = None
+    sheets = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, monkeypatch, tmpdir):
+        self.client = FakeSmartsheet()
+        self.sheets = [self.client.add_sheet('Sheet %d' % i) for i in range(3)]
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir))
+        monkeypatch.setattr(ClientPool, '_pools', {})
+        monkeypatch.setattr(ScheduleHandler_smartsheet, '_client_instance',
+                            self.client)
+
+    def handler(self, handle):
+        return ScheduleHandler_smartsheet(handle=handle,
+                                          options={'smartsheet_token': 'fake'})
+
+    def test_resolve_permalink(self, monkeypatch):
+        for sheet in self.sheets:
+            assert self.handler(sheet.permalink + '?view=grid').handle == sheet.id
+
+        assert self.client.count('list_sheets') == 1
+
+        # index is persistent
+        monkeypatch.setattr(ClientPool, '_pools', {})
+        assert self.handler(self.sheets[0].permalink).handle == self.sheets[0].id
+        assert self.client.count('list_sheets') == 1
+
+    def test_resolve_id(self):
+        self.handler(self.sheets[0].permalink)
+        info_dict = self.handler(None).get_info_dict(str(self.sheets[1].id))
+
+        assert info_dict == {'id': self.sheets[1].id,
+                             'permalink': self.sheets[1].permalink}
+        assert self.client.count('get_sheet') == 0
+
+    def test_refresh(self, tmpdir):
+        now = [1000.0]
+        index = PermalinkIndex(str(tmpdir.join('index.json')), ttl=100,
+                               miss_ttl=10, clock=lambda: now[0])
+
+        assert index.get_id(self.sheets[0].permalink, self.client) == self.sheets[0].id
+        assert index.get_id('https://app.smartsheet.com/sheets/new', self.client) is None
+        assert self.client.count('list_sheets') == 1
+
+        # unknown permalink refreshes only index older than miss_ttl
+        sheet = self.client.add_sheet('New sheet')
+        now[0] += 11
+        assert index.get_id(sheet.permalink, self.client) == sheet.id
+        assert self.client.count('list_sheets') == 2
+
+        # known permalink refreshes only index older than ttl
+        del self.client.sheets[sheet.id]
+        now[0] += 50
+        assert index.get_id(sheet.permalink, self.client) == sheet.id
+        now[0] += 51
+        assert index.get_id(sheet.permalink, self.client) is None
+        assert self.client.count('list_sheets') == 3
+
+
+class TestUnit_smartsheet_version(object):
+    client = None
+    sheet = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, monkeypatch):
+        self.client = FakeSmartsheet()
+        self.sheet = self.client.add_sheet('Sheet')
+        self.sheet.rows.append({
+            'id': next(self.client.ids),
+            'parent_id': None,
+            'cells': {'Task Name': 'Task', 'Duration': '1d',
+                      'Start': '2020-01-01T08:00:00',
+                      'Finish': '2020-01-01T17:00:00'},
+        })
+        monkeypatch.setattr(ScheduleHandler_smartsheet, '_client_instance',
+                            self.client)
+
+    def handler(self, **options):
+        return ScheduleHandler_smartsheet(handle=self.sheet.id, options=options)
+
+    def downloaded_rows(self):
+        return [call[2] for call in self.client.calls if call[0] == 'get_sheet']
+
+    def test_mtime(self):
+        handler = self.handler()
+        mtime = self.sheet.modified_at.replace(tzinfo=None)
+
+        assert handler.get_handle_mtime() == self.sheet.modified_at
+        assert list(handler.get_handle_changelog()) == [self.sheet.version]
+        assert not handler.handle_modified_since(mtime)
+        assert handler.handle_modified_since(mtime - datetime.timedelta(seconds=1))
+        assert self.downloaded_rows() == [0]
+
+    def test_sheet_cache(self, tmpdir):
+        options = {'cache_dir': str(tmpdir)}
+        schedule = self.handler(**options).import_schedule()
+        cached = self.handler(**options).import_schedule()
+
+        assert cached.dump_as_dict() == schedule.dump_as_dict()
+        assert self.downloaded_rows() == [1, 0]
+
+        self.sheet.rows[0]['cells']['Task Name'] = 'Changed'
+        self.sheet.touch()
+        changed = self.handler(**options).import_schedule()
+
+        assert changed.tasks[0].name == 'Changed'
+        assert self.downloaded_rows() == [1, 0, 1]
+
+    @pytest.mark.parametrize('cached', [False, True])
+    def test_missing_sheet(self, tmpdir, cached):
+        cache = ConversionCache(str(tmpdir)) if cached else None
+        schedule = ScheduleConverter(cache=cache).import_schedule(
+            '12345', schedule_src_format='smartsheet')
+
+        assert [error[0] for error in schedule.errors_import] == [
+            'SmartSheetImportException']
+
+    def test_calculate_duration(self):
+        self.sheet.non_working_days = ['2020-01-03']
+        handler = self.handler()
+        wednesday = datetime.date(2020, 1, 1)
+
+        assert handler.calculate_duration(wednesday, wednesday) == 1
+        assert handler.calculate_duration(
+            wednesday, wednesday + datetime.timedelta(days=6)) == 4
+        assert handler.calculate_duration(
+            datetime.date(2020, 1, 4), datetime.date(2020, 1, 5)) == 1
+        assert self.downloaded_rows() == [0]
+
+    @staticmethod
+    def legacy_duration(handler, start, finish):
+        """Day by day count of calculate_duration before WorkingCalendar"""
+        if start == finish:
+            return 1
+
+        duration = 1
+        working_isoweekdays, holidays = handler.working_days_and_holidays
+        for days in range((finish - start).days + 1):
+            date = start + datetime.timedelta(days=days)
+            if date.isoweekday() in working_isoweekdays and date not in holidays:
+                duration += 1
+
+        return duration
+
+    @pytest.mark.parametrize('start, finish, legacy, duration', [
+        # Wednesday to Tuesday, holiday on Friday
+        ((2020, 1, 1), (2020, 1, 7), 5, 4),
+        ((2020, 1, 1), (2020, 1, 2), 3, 2),
+        ((2020, 1, 6), (2020, 1, 10), 6, 5),
+        # weekend only
+        ((2020, 1, 4), (2020, 1, 5), 1, 1),
+    ])
+    def test_calculate_duration_change(self, start, finish, legacy, duration):
+        # previous day by day count included one extra day for every
+        # span with working days, duration is now the working days count
+        self.sheet.non_working_days = ['2020-01-03']
+        handler = self.handler()
+        start, finish = datetime.date(*start), datetime.date(*finish)
+
+        assert self.legacy_duration(handler, start, finish) == legacy
+        assert handler.calculate_duration(start, finish) == duration
+
+
+class TestUnit_smartsheet_import(object):
+    client = None
+    sheet = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, monkeypatch):
+        self.client = FakeSmartsheet()
+        self.sheet = self.client.add_sheet(
+            'Sheet', ['Task Name', 'Task', 'Duration', 'Start', 'Finish',
+                      '% Complete', 'Team'])
+        monkeypatch.setattr(ScheduleHandler_smartsheet, '_client_instance',
+                            self.client)
+
+    def add_row(self, name, start='2020-01-01T08:00:30', finish='2020-01-02T17:00:00',
+                parent_id=None, **cells):
+        row_id = next(self.client.ids)
+        cells.update({'Task Name': name, 'Start': start, 'Finish': finish})
+        self.sheet.rows.append({'id': row_id, 'parent_id': parent_id,
+                                'cells': cells})
+
+        return row_id
+
+    def test_import(self):
+        parent = self.add_row('Parent')
+        self.add_row('Child', parent_id=parent, Duration='~0', **{'% Complete': 0.5})
+        skipped = self.add_row('Skipped', start=None, parent_id=parent)
+        self.add_row('Orphan', parent_id=skipped)
+        self.add_row('Invalid date', start='2020-13-01')
+        self.add_row(None, start='2020-02-01', Task='Duplicated column',
+                     Team='Flags: pm, qe')
+
+        schedule = ScheduleHandler_smartsheet(handle=self.sheet.id).import_schedule()
+        parent_task, orphan, duplicated = schedule.tasks
+        child = parent_task.tasks[0]
+
+        assert [t.name for t in schedule.tasks] == [
+            'Parent', 'Orphan', 'Duplicated column']
+        assert [t.name for t in parent_task.tasks] == ['Child']
+        assert [t.level for t in (parent_task, child, orphan)] == [1, 2, 1]
+        assert [t.index for t in (parent_task, child, orphan)] == [1, 2, 4]
+        assert child.milestone and not parent_task.milestone
+        assert child.p_complete == 50.0
+        assert child.dStart == datetime.datetime(2020, 1, 1, 8, 0)
+        assert duplicated.dStart == datetime.datetime(2020, 2, 1)
+        assert duplicated.flags == ['pm', 'qe']
+        assert schedule.dStart == datetime.datetime(2020, 1, 1, 8, 0)
+        assert schedule.dFinish == datetime.datetime(2020, 1, 2, 17, 0)
+
+    def test_import_trim_time(self):
+        self.add_row('Task')
+        schedule = ScheduleHandler_smartsheet(
+            handle=self.sheet.id, options={'trim_time': True}).import_schedule()
+
+        assert schedule.tasks[0].dStart == datetime.date(2020, 1, 1)
+        assert schedule.dFinish == datetime.date(2020, 1, 2)
@@ -68,6 +68,8 @@ class TestHandlers(object):
         ('json', 'export-schedule-json-flat.json', True, [], [], {}, None),
         ('json', 'export-schedule-json-flat-sort-date.json', True, [], [], {}, 'dStart'),
         ('json', 'export-schedule-json-flat-flags.json', True, ['flag1'], ['flag2'], {}, None),
+        ('json', 'export-schedule-json-compact.json', False, [], [],
+         dict(json_compact=True), None),
         ('ics', 'export-schedule-ics.ics', False, [], [], {}, None),
         ('html', 'export-schedule-html.html', False, [], [], {}, None),
         ('html', 'export-schedule-html-sort-date.html', False, [], [], {}, 'dStart'),
@@ -0,0 +1,52 @@
+import datetime
+import pytest
+
+from schedules_tools import jsondate
+
+
+class TestJsonDate(object):
+    document = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.document = {
+            'name': '2020-01-01',
+            'dStart': '2020-01-02T10:20:30Z',
+            'mtime': '2020-01-03',
+            'tasks': [
+                {'note': '2020-01-04T00:00:00Z', 'dFinish': '2020-01-05'},
+            ]
+        }
+
+    def test_date_keys(self):
+        loaded = jsondate.loads(jsondate.dumps(self.document))
+
+        assert loaded['name'] == '2020-01-01'
+        assert loaded['dStart'] == datetime.datetime(2020, 1, 2, 10, 20, 30)
+        assert loaded['mtime'] == datetime.date(2020, 1, 3)
+        assert loaded['tasks'][0]['note'] == '2020-01-04T00:00:00Z'
+        assert loaded['tasks'][0]['dFinish'] == datetime.date(2020, 1, 5)
+
+    def test_all_keys(self):
+        loaded = jsondate.loads(jsondate.dumps(self.document), date_keys=None)
+
+        assert loaded['name'] == datetime.date(2020, 1, 1)
+        assert loaded['tasks'][0]['note'] == datetime.datetime(2020, 1, 4)
+
+    @pytest.mark.parametrize('value', [
+        '2020-13-01', '2020-01-01T25:00:00Z', '2020-01-01 00:00:00Z',
+        '２０２０-01-01', '2020-01-01Z', 20200101, None])
+    def test_not_date(self, value):
+        loaded = jsondate.loads(jsondate.dumps({'dStart': value}))
+
+        assert loaded['dStart'] == value
+
+    @pytest.mark.parametrize('value,expected', [
+        (datetime.datetime(2020, 1, 2, 3, 4, 5, 678), '2020-01-02T03:04:05Z'),
+        (datetime.datetime(2020, 1, 2, tzinfo=datetime.timezone.utc),
+         '2020-01-02T00:00:00Z'),
+        (datetime.datetime(999, 1, 2), '0999-01-02T00:00:00Z'),
+        (datetime.date(2020, 1, 2), '2020-01-02'),
+    ])
+    def test_encoder(self, value, expected):
+        assert jsondate._datetime_encoder(value) == expected
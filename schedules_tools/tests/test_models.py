@@ -0,0 +1,143 @@
+import os
+import pytest
+
+from schedules_tools import models
+from schedules_tools.converter import ScheduleConverter
+from schedules_tools.tests import create_test_schedule
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+MSP_FILE = os.path.join(BASE_DIR, 'schedule_files', 'import-schedule-msp.xml')
+
+
+class TestCompactTask(object):
+    schedule = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.schedule = create_test_schedule()
+
+    def test_no_instance_dict(self):
+        task = models.CompactTask(self.schedule)
+
+        assert not hasattr(task, '__dict__')
+
+        with pytest.raises(AttributeError):
+            task.unknown_attr = 1
+
+    def test_defaults(self):
+        task = models.CompactTask(self.schedule)
+        regular_task = models.Task(self.schedule)
+
+        for attr in models.COMPACT_TASK_DEFAULTS:
+            if attr != '_subtree_hash_cache':
+                assert getattr(task, attr) == getattr(regular_task, attr)
+
+        assert task.dump_as_dict() == regular_task.dump_as_dict()
+
+    def test_interned_flags(self):
+        task1 = models.CompactTask(self.schedule)
+        task2 = models.CompactTask(self.schedule)
+        task1.flags = ['qe', 'dev']
+        task2.flags = ['qe', 'dev']
+
+        assert task1.flags == ('qe', 'dev')
+        assert task1.flags is task2.flags
+
+    def test_interned_flags_bounded(self, monkeypatch):
+        monkeypatch.setattr(models, 'INTERNED_FLAGS_MAX', 10)
+        monkeypatch.setattr(models, '_interned_flags', {})
+
+        for i in range(25):
+            models.intern_flags(['flag%d' % i])
+            assert len(models._interned_flags) <= 10
+
+        assert models.intern_flags(['flag24']) is models.intern_flags(['flag24'])
+
+    def test_parse_extended_attr_flags(self):
+        task = models.CompactTask(self.schedule)
+        task.parse_extended_attr('flags: pm, qe')
+
+        assert task.flags == ('pm', 'qe')
+        assert {'pm', 'qe'} <= self.schedule.used_flags
+
+    def test_make_compact(self):
+        reference = self.schedule.dump_as_dict()
+        hash_fields = ('name', 'dStart', 'dFinish', 'flags')
+        reference_hash = self.schedule.tasks[0].get_subtree_hash(hash_fields)
+
+        self.schedule.make_compact()
+
+        assert isinstance(self.schedule.tasks[0], models.CompactTask)
+        assert isinstance(self.schedule.tasks[0].tasks[0], models.CompactTask)
+        assert self.schedule.tasks[0].get_subtree_hash(hash_fields) == reference_hash
+        assert self.schedule.dump_as_dict() == reference
+
+    def test_load_from_dict(self):
+        dumped = self.schedule.dump_as_dict()
+        schedule = models.Schedule.load_from_dict(dumped, compact=True)
+
+        assert schedule.task_cls is models.CompactTask
+        assert isinstance(schedule.tasks[0].tasks[0], models.CompactTask)
+        assert schedule.dump_as_dict() == dumped
+
+    def test_diff(self):
+        other = create_test_schedule()
+        other.make_compact()
+
+        assert self.schedule.diff(other) == ''
+
+    def test_import_compact(self):
+        regular = ScheduleConverter().import_schedule(MSP_FILE)
+        compact = ScheduleConverter().import_schedule(
+            MSP_FILE, options=dict(compact_tasks=True))
+
+        assert isinstance(compact.tasks[0], models.CompactTask)
+        assert compact.dump_as_dict() == regular.dump_as_dict()
+
+
+class TestSubtreeHash(object):
+    fields = ('name', 'dStart', 'dFinish', 'flags')
+
+    def test_leaf(self):
+        schedule = create_test_schedule()
+        leaf = schedule.tasks[0].tasks[0]
+
+        assert leaf.get_subtree_hash(self.fields) == ''
+
+    def test_fixed_size(self):
+        schedule = create_test_schedule()
+        subtree_hash = schedule.tasks[0].get_subtree_hash(self.fields)
+
+        assert len(subtree_hash) == 2 * models.SUBTREE_HASH_DIGEST_SIZE
+
+    def test_equal_subtrees(self):
+        schedule_a = create_test_schedule()
+        schedule_b = create_test_schedule()
+        schedule_b.make_compact()
+
+        assert (schedule_a.tasks[0].get_subtree_hash(self.fields)
+                == schedule_b.tasks[0].get_subtree_hash(self.fields))
+
+    def test_nested_change(self):
+        schedule_a = create_test_schedule()
+        schedule_b = create_test_schedule()
+        task = schedule_b.tasks[0].tasks[-1]
+        while task.tasks:
+            task = task.tasks[-1]
+        task.name = task.name + ' changed'
+
+        assert (schedule_a.tasks[0].get_subtree_hash(self.fields)
+                != schedule_b.tasks[0].get_subtree_hash(self.fields))
+        # name is not part of hashed fields
+        assert (schedule_a.tasks[0].get_subtree_hash(('dStart',))
+                == schedule_b.tasks[0].get_subtree_hash(('dStart',)))
+
+    def test_value_boundaries(self):
+        schedule_a = create_test_schedule()
+        schedule_b = create_test_schedule()
+        task_a, task_b = schedule_a.tasks[0].tasks[0], schedule_b.tasks[0].tasks[0]
+        task_a.name, task_a.note = 'ab', 'c'
+        task_b.name, task_b.note = 'a', 'bc'
+
+        assert (schedule_a.tasks[0].get_subtree_hash(('name', 'note'))
+                != schedule_b.tasks[0].get_subtree_hash(('name', 'note')))
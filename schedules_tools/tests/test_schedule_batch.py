@@ -0,0 +1,90 @@
+import pytest
+import yaml
+
+from schedules_tools.batches import schedule_batch
+from schedules_tools.batches.utils import load_template
+from schedules_tools.schedule_handlers.smart_sheet import ScheduleHandler_smartsheet
+from schedules_tools.tests.smartsheet_fake import FakeSmartsheet
+
+
+class TestAddBatch(object):
+    client = None
+    sheet = None
+    template_dir = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, monkeypatch, tmpdir):
+        self.client = FakeSmartsheet()
+        self.sheet = self.client.add_sheet('Release')
+        self.template_dir = tmpdir
+        monkeypatch.setenv('SMARTSHEET_TOKEN', 'fake')
+        monkeypatch.setenv('BATCHES_TEMPLATE_DIR', str(tmpdir))
+        monkeypatch.setattr(ScheduleHandler_smartsheet, '_client_instance',
+                            self.client)
+
+        release = self.add_row('Release')
+        self.add_row('Parent Task', release)
+        self.add_row('GA', release)
+
+    def add_row(self, name, parent_id=None):
+        row_id = next(self.client.ids)
+        self.sheet.rows.append({
+            'id': row_id,
+            'parent_id': parent_id,
+            'cells': {'Task Name': name},
+        })
+
+        return row_id
+
+    def write_template(self, name, tasks_count, **kwargs):
+        tasks = [{'id': 1, 'name': 'Task 1', 'duration': 5,
+                  'dependency': '{predecessor}'}]
+        tasks += [{'id': i, 'name': 'Task %d' % i, 'duration': i % 3,
+                   'dependency': '{%d}FS +1d' % (i - 1)}
+                  for i in range(2, tasks_count + 1)]
+        template = dict(parent='Parent Task', tasks=tasks, **kwargs)
+        self.template_dir.join('%s.yml' % name).write(yaml.safe_dump(template))
+
+    def row_by_name(self, name, parent_id=None):
+        for row in self.sheet.children(parent_id):
+            if row['cells']['Task Name'] == name:
+                return row
+
+    def predecessor_id(self, row):
+        return row['cells']['Predecessors'].predecessors[0].row_id
+
+    @pytest.mark.parametrize('tasks_count', [3, 40])
+    def test_first_batch(self, tasks_count):
+        self.write_template('batch', tasks_count, first=True)
+        schedule_batch.add_batch(self.sheet.id, load_template('batch'))
+
+        release = self.row_by_name('Release')
+        parent = self.row_by_name('Parent Task', release['id'])
+        batch = self.row_by_name('Batch update 1', parent['id'])
+        rows = self.sheet.children(batch['id'])
+
+        assert [row['cells']['Task Name'] for row in rows] == [
+            'Task %d' % i for i in range(1, tasks_count + 1)]
+        assert self.predecessor_id(rows[0]) == self.row_by_name('GA', release['id'])['id']
+        assert [self.predecessor_id(row) for row in rows[1:]] == [
+            row['id'] for row in rows[:-1]]
+
+        assert self.client.count('get_sheet') == 1
+        assert self.client.count('add_rows') == 2
+        assert self.client.count('update_rows') == 1
+
+    def test_next_batch(self):
+        self.write_template('first', 3, first=True)
+        self.write_template('next', 3, type='z-stream',
+                            **{'predecessor-task-name': 'Task 3'})
+        schedule_batch.add_batch(self.sheet.id, load_template('first'))
+        schedule_batch.add_batch(self.sheet.id, load_template('next'))
+
+        parent = self.row_by_name('Parent Task', self.row_by_name('Release')['id'])
+        first, following = self.sheet.children(parent['id'])
+        last_task = self.sheet.children(first['id'])[-1]
+
+        assert first['cells']['Task Name'] == 'Batch update 1'
+        assert following['cells']['Task Name'] == 'Batch update 2 z-stream'
+        assert self.predecessor_id(self.sheet.children(following['id'])[0]) == \
+            last_task['id']
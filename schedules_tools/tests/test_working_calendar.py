@@ -0,0 +1,48 @@
+import datetime
+import random
+import pytest
+
+from schedules_tools.working_calendar import WorkingCalendar
+
+
+class TestWorkingCalendar(object):
+    calendar = None
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.calendar = WorkingCalendar(
+            working_isoweekdays=[1, 2, 3, 4, 6],
+            holidays=[datetime.date(2020, 1, 1), datetime.datetime(2020, 12, 24, 8)])
+
+    def count_days(self, start, finish):
+        days = 0
+        while start <= finish:
+            days += self.calendar.is_working_day(start)
+            start += datetime.timedelta(days=1)
+
+        return days
+
+    def test_working_day(self):
+        assert not self.calendar.is_working_day(datetime.date(2020, 1, 1))
+        assert self.calendar.is_working_day(datetime.date(2020, 1, 2))
+        assert not self.calendar.is_working_day(datetime.date(2020, 1, 3))
+        assert self.calendar.is_working_day(datetime.date(2020, 1, 4))
+        assert not self.calendar.is_working_day(datetime.datetime(2020, 12, 24, 10))
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_same_as_counting(self, seed):
+        rand = random.Random(seed)
+        base = datetime.date(2020, 1, 1)
+
+        for _ in range(50):
+            start = base + datetime.timedelta(days=rand.randint(-2000, 2000))
+            finish = start + datetime.timedelta(days=rand.randint(-3, 900))
+
+            assert self.calendar.working_days(start, finish) == \
+                self.count_days(start, finish)
+
+    def test_datetimes(self):
+        start = datetime.datetime(2020, 1, 2, 17)
+        finish = datetime.datetime(2020, 1, 6, 8)
+
+        assert self.calendar.working_days(start, finish) == 3
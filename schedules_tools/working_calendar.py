@@ -0,0 +1,90 @@
+"""
+Calendar of working days
+
+Counts working days between two dates in O(1) - working day flags of
+a covered range of dates are turned into prefix sums, count is
+a difference of two of them. Covered range grows on demand.
+"""
+import datetime
+from itertools import accumulate
+
+# Monday to Friday
+DEFAULT_WORKING_ISOWEEKDAYS = frozenset(range(1, 6))
+# days added around requested dates when covered range grows
+RANGE_PADDING_DAYS = 366
+
+
+def _ordinal(date):
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+
+    return date.toordinal()
+
+
+class WorkingCalendar(object):
+    """
+    Working weekdays and holidays
+
+    Attributes:
+        working_isoweekdays: frozenset of working ISO weekdays (1 = Monday)
+        holidays: frozenset of non-working dates
+    """
+    working_isoweekdays = DEFAULT_WORKING_ISOWEEKDAYS
+    holidays = frozenset()
+    # (ordinal of first covered date, prefix sums) - replaced at once
+    _range = None
+
+    def __init__(self, working_isoweekdays=DEFAULT_WORKING_ISOWEEKDAYS,
+                 holidays=()):
+        self.working_isoweekdays = frozenset(working_isoweekdays)
+        self.holidays = frozenset(
+            holiday.date() if isinstance(holiday, datetime.datetime) else holiday
+            for holiday in holidays)
+        self._holiday_ordinals = frozenset(
+            holiday.toordinal() for holiday in self.holidays)
+
+    def _is_working_ordinal(self, ordinal):
+        # ordinal 1 (0001-01-01) is Monday
+        return ((ordinal - 1) % 7 + 1 in self.working_isoweekdays
+                and ordinal not in self._holiday_ordinals)
+
+    def is_working_day(self, date):
+        return self._is_working_ordinal(_ordinal(date))
+
+    def _covered_range(self, first, last):
+        """Prefix sums covering ordinals first..last, built if needed"""
+        covered = self._range
+        if covered is not None:
+            covered_first, prefix = covered
+            covered_last = covered_first + len(prefix) - 2
+            if covered_first <= first and last <= covered_last:
+                return covered
+
+            first = min(first, covered_first)
+            last = max(last, covered_last)
+
+        first -= RANGE_PADDING_DAYS
+        last += RANGE_PADDING_DAYS
+        # prefix[i] - number of working days before ordinal first + i
+        prefix = [0]
+        prefix.extend(accumulate(
+            1 if self._is_working_ordinal(ordinal) else 0
+            for ordinal in range(first, last + 1)))
+
+        self._range = first, prefix
+        return self._range
+
+    def working_days(self, start, finish):
+        """
+        Number of working days from start to finish, both included
+
+        Returns:
+            int, 0 if finish precedes start
+        """
+        start, finish = _ordinal(start), _ordinal(finish)
+        if finish < start:
+            return 0
+
+        first, prefix = self._covered_range(start, finish)
+
+        return prefix[finish - first + 1] - prefix[start - first]